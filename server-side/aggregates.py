@@ -0,0 +1,178 @@
+"""
+LIS Book Scanner - Incrementally maintained analytics aggregates
+Per-year, per-author and per-keyword book counts live in small summary
+tables that triggers on `books` keep up to date, so /analytics reads a few
+rows per distinct value instead of scanning the catalog.
+"""
+
+# Keyword lists are stored as "word, word, ..."; this turns one into a JSON
+# array that json_each can iterate inside a trigger (CTEs are not allowed
+# there). Values that still aren't valid JSON count as no keywords.
+_CONTROL_CHARS = (9, 10, 12, 13)
+
+
+def _keyword_json(column):
+    value = f"COALESCE({column}, '')"
+    for code in _CONTROL_CHARS:
+        value = f"replace({value}, char({code}), ' ')"
+    value = f"""replace(replace(replace({value}, '\\', '\\\\'), '"', '\\"'), ',', '","')"""
+    array = f"""'["' || {value} || '"]'"""
+    return f"(SELECT CASE WHEN json_valid(a) THEN a ELSE '[]' END FROM (SELECT {array} AS a))"
+
+
+def _keywords(column):
+    """SELECT of the distinct normalised keywords in a keywords column"""
+    return f'''
+        SELECT DISTINCT lower(trim(value)) AS keyword FROM json_each({_keyword_json(column)})
+        WHERE trim(value) != ''
+    '''
+
+
+# (summary table, key column, expression over a books row given its alias)
+DIMENSIONS = (
+    ('stats_years', 'year', lambda row: f'{row}.year', 'INTEGER'),
+    ('stats_authors', 'author', lambda row: f"NULLIF(trim({row}.author), '')", 'TEXT'),
+)
+
+
+def _add(table, key, value):
+    return f'''
+        INSERT INTO {table} ({key}, books) SELECT {value}, 1 WHERE {value} IS NOT NULL
+        ON CONFLICT ({key}) DO UPDATE SET books = books + 1;
+    '''
+
+
+def _remove(table, key, value):
+    return f'''
+        UPDATE {table} SET books = books - 1 WHERE {key} = {value};
+        DELETE FROM {table} WHERE {key} = {value} AND books <= 0;
+    '''
+
+
+def _add_keywords(row):
+    return f'''
+        INSERT INTO stats_keywords (keyword, books)
+        SELECT keyword, 1 FROM ({_keywords(f'{row}.keywords')}) WHERE true
+        ON CONFLICT (keyword) DO UPDATE SET books = books + 1;
+    '''
+
+
+def _remove_keywords(row):
+    return f'''
+        UPDATE stats_keywords SET books = books - 1 WHERE keyword IN ({_keywords(f'{row}.keywords')});
+        DELETE FROM stats_keywords WHERE books <= 0 AND keyword IN ({_keywords(f'{row}.keywords')});
+    '''
+
+
+def _schema():
+    statements = [
+        f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            {key} {type} PRIMARY KEY,
+            books INTEGER NOT NULL
+        )
+        ''' for table, key, _, type in DIMENSIONS
+    ]
+    statements.append('''
+        CREATE TABLE IF NOT EXISTS stats_keywords (
+            keyword TEXT PRIMARY KEY,
+            books INTEGER NOT NULL
+        )
+    ''')
+
+    on_insert = ''.join(_add(table, key, value('new')) for table, key, value, _ in DIMENSIONS)
+    on_delete = ''.join(_remove(table, key, value('old')) for table, key, value, _ in DIMENSIONS)
+    statements += [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS stats_insert AFTER INSERT ON books BEGIN
+            {on_insert}
+            {_add_keywords('new')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS stats_delete AFTER DELETE ON books BEGIN
+            {on_delete}
+            {_remove_keywords('old')}
+        END
+        ''',
+    ]
+    for table, key, value, _ in DIMENSIONS:
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {key} ON books
+            WHEN {value('old')} IS NOT {value('new')} BEGIN
+                {_remove(table, key, value('old'))}
+                {_add(table, key, value('new'))}
+            END
+        ''')
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_keywords_update AFTER UPDATE OF keywords ON books
+        WHEN old.keywords IS NOT new.keywords BEGIN
+            {_remove_keywords('old')}
+            {_add_keywords('new')}
+        END
+    ''')
+    return statements
+
+
+AGGREGATES_SCHEMA = _schema()
+
+
+def _seed(conn):
+    """Build the summary tables from the rows already in `books`"""
+    for table, key, value, _ in DIMENSIONS:
+        conn.execute(f'''
+            INSERT INTO {table} ({key}, books)
+            SELECT {value('b')}, COUNT(*) FROM books b
+            WHERE {value('b')} IS NOT NULL GROUP BY 1
+        ''')
+    conn.execute(f'''
+        INSERT INTO stats_keywords (keyword, books)
+        SELECT lower(trim(k.value)), COUNT(DISTINCT b.id)
+        FROM books b, json_each({_keyword_json('b.keywords')}) k
+        WHERE trim(k.value) != '' GROUP BY 1
+    ''')
+
+
+def init_aggregates(conn):
+    """Create the summary tables and triggers, seeding them the first time"""
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_keywords'"
+    ).fetchone()
+    for statement in AGGREGATES_SCHEMA:
+        conn.execute(statement)
+    if not existed:
+        _seed(conn)
+
+
+def year_counts(conn):
+    """[(year, books), ...] in year order"""
+    return [tuple(row) for row in conn.execute('SELECT year, books FROM stats_years ORDER BY year')]
+
+
+def top(conn, table, key, limit):
+    """[(value, books), ...] for the most common values of a dimension"""
+    return [tuple(row) for row in conn.execute(
+        f'SELECT {key}, books FROM {table} ORDER BY books DESC, {key} LIMIT ?', (limit,))]
+
+
+def summary(conn, limit=20):
+    """Catalog statistics for /analytics and /api/analytics
+
+    Reads O(distinct years + authors + keywords) rows, never `books`.
+    """
+    counts = conn.execute('SELECT books, enriched, version FROM catalog_counts WHERE id = 1').fetchone()
+    total, enriched, version = counts if counts else (0, 0, 0)
+    years = year_counts(conn)
+    with_year = sum(books for _, books in years)
+    return {
+        'version': version,
+        'total_books': total,
+        'enriched_books': enriched,
+        'unique_authors': conn.execute('SELECT COUNT(*) FROM stats_authors').fetchone()[0],
+        'avg_year': round(sum(year * books for year, books in years) / with_year) if with_year else None,
+        'years': [{'year': year, 'books': books} for year, books in years],
+        'top_authors': [{'author': author, 'books': books}
+                        for author, books in top(conn, 'stats_authors', 'author', limit)],
+        'top_keywords': [{'keyword': keyword, 'books': books}
+                         for keyword, books in top(conn, 'stats_keywords', 'keyword', limit)],
+    }
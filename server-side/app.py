@@ -1,12 +1,10 @@
-from flask import Flask, render_template, request, send_file, jsonify, redirect, url_for
-import os, cv2, pytesseract, easyocr, spacy, nltk, pandas as pd, requests, sqlite3
+from flask import Flask, Response, render_template, request, send_file, jsonify, redirect, url_for, stream_with_context
+import os
 from datetime import datetime
+from werkzeug.serving import is_running_from_reloader
 from werkzeug.utils import secure_filename
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use("Agg")  # Use non-GUI backend
-import io, base64
+import importlib.util
+import io, base64, threading, time, uuid
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import warnings
@@ -14,395 +12,604 @@ warnings.filterwarnings("ignore")
 
 app = Flask(__name__)
 app.config["UPLOAD_FOLDER"] = "uploads"
+app.config["DATABASE"] = os.environ.get("CATALOG_DB", "catalog.db")
+app.config["INGEST_WORKERS"] = int(os.environ.get("INGEST_WORKERS", "2"))
+app.config["PAGE_SIZE"] = int(os.environ.get("PAGE_SIZE", "50"))
+app.config["OCR_CACHE"] = os.environ.get("OCR_CACHE", "1") == "1"
+app.config["OCR_CACHE_MAX_BYTES"] = int(os.environ.get("OCR_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+app.config["KEYWORD_RANKING"] = os.environ.get("KEYWORD_RANKING", "1") == "1"
+app.config["CHART_CACHE_DIR"] = os.environ.get(
+    "CHART_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(app.config["DATABASE"])), "chart_cache"))
+# Models warmed in the background at startup; /health/ready waits for these
+app.config["WARMUP"] = [name.strip() for name in os.environ.get(
+    "WARMUP", "tesseract,tesseract_engine,spacy").split(",") if name.strip() not in ("", "0", "none")]
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
-# Load models
-nltk.download("punkt", quiet=True)
-nltk.download("averaged_perceptron_tagger", quiet=True)
+# OCR/NLP models (and NLTK data) are loaded once per worker through the shared
+# registry, on first use or by the warmup thread, never at import time
+from ocr_models import registry
+from preprocess import Preprocessor
+from cascade import Cascade
+import barcode
+import regions
+from jobs import JobQueue
+from openlibrary import OpenLibraryClient
+from enricher import Enricher
+from keywords import KeywordRanker, rank_records
+from metadata import extract_metadata
+from charts import ChartCache
+from ocr_cache import OCRCache, file_cache_key
+import aggregates
+import authors
+import export
+import metrics
+import search
+import storage
 
-# Load spaCy model with error handling
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("✓ spaCy English model loaded successfully")
-except OSError:
-    print("⚠ Warning: spaCy English model not found. Please install it:")
-    print("  python -m spacy download en_core_web_sm")
-    nlp = None
-
-reader = easyocr.Reader(["en"], gpu=False)
-
-# Set Tesseract path
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Every request is timed and traced; /metrics serves the counters and histograms
+metrics.instrument(app)
 
 
 class OCRProcessor:
-    def __init__(self):
-        self.reader = easyocr.Reader(["en"], gpu=False)
+    def __init__(self, models=registry):
+        self.models = models
+        # No denoise by default: fastNlMeansDenoising costs seconds per photo
+        # even after downscaling, threshold alone a fraction of a second
+        self.preprocessor = Preprocessor.from_env(default="normalize,threshold")
+        self.regions_method = regions.method_from_env()
+        self.barcode_mode = barcode.mode_from_env()
+        self._cascade = None
+        self._cascade_lock = threading.Lock()
         self.init_database()
+        # Re-uploads of the same photo are answered without running the cascade
+        self.cache = None
+        if app.config["OCR_CACHE"]:
+            self.cache = OCRCache(app.config["DATABASE"], max_bytes=app.config["OCR_CACHE_MAX_BYTES"])
+
+    @property
+    def cascade(self):
+        """OCR engine cascade, built on first use so importing the app loads no engine"""
+        # Built once: the ingest workers must share its escalation batcher
+        with self._cascade_lock:
+            if self._cascade is None:
+                # EasyOCR is only loaded once Tesseract is unsure of something; the
+                # unsure lines of images the ingest workers OCR at once are re-read together
+                self._cascade = Cascade.from_env(self.models.tesseract_engine,
+                                                 reader=lambda: self.models.easyocr_reader,
+                                                 tesseract_config=self.models.tesseract['config'],
+                                                 batch_images=app.config["INGEST_WORKERS"])
+        return self._cascade
+
+    @property
+    def reader(self):
+        return self.models.easyocr_reader
 
     def init_database(self):
         """Initialize SQLite database for catalog storage"""
-        conn = sqlite3.connect('catalog.db')
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                book_id TEXT UNIQUE,
-                title TEXT,
-                author TEXT,
-                year TEXT,
-                isbn TEXT,
-                publisher TEXT,
-                keywords TEXT,
-                enriched TEXT,
-                full_text TEXT,
-                cover_path TEXT,
-                timestamp TEXT,
-                confidence REAL
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        storage.init_database(app.config['DATABASE'])
 
     def preprocess_image(self, image_path):
-        """Enhanced image preprocessing with noise reduction"""
-        img = cv2.imread(image_path)
-        if img is None:
+        """Downscale, denoise and binarise a photo for OCR (see OCR_PREPROCESS)
+
+        With OCR_REGIONS enabled the result is cropped to its text regions.
+        """
+        try:
+            processed, timings = self.preprocessor.run(image_path)
+        except OSError:
             return None
-            
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Noise reduction
-        denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # Adaptive thresholding
-        thresh = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                     cv2.THRESH_BINARY, 11, 2)
-        
-        # Morphological operations to clean up
-        kernel = np.ones((1,1), np.uint8)
-        processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        return processed
+        if self.regions_method:
+            # Both OCR engines read a montage of the text regions, not the whole photo
+            start = time.perf_counter()
+            found = regions.find_regions(processed, self.regions_method)
+            if found is not None:
+                processed, _ = regions.montage(processed, found)
+            timings["regions"] = time.perf_counter() - start
+        for stage, seconds in timings.items():
+            metrics.record(stage, seconds)
+        print("Preprocessing " + ", ".join(f"{stage}={seconds * 1000:.0f}ms"
+                                           for stage, seconds in timings.items()))
+        return np.asarray(processed)
+
+    def read_barcode(self, image_path):
+        """ISBN-13 from the photo's EAN-13 barcode, or None (see OCR_BARCODE)"""
+        if self.barcode_mode == "off":
+            return None
+        try:
+            image = self.preprocessor.load(image_path)
+        except OSError:
+            return None
+        start = time.perf_counter()
+        try:
+            isbn = barcode.find_isbn(image)
+        except Exception as e:
+            # The fast path is optional: a decoder failure is a miss and OCR goes ahead
+            print(f"Barcode scan error: {e}")
+            isbn = None
+        elapsed = time.perf_counter() - start
+        metrics.record("barcode", elapsed)
+        print(f"Barcode scan {elapsed * 1000:.0f}ms: {isbn or 'no ISBN'}")
+        return isbn
 
     def process_book_image(self, image_path):
-        """Process a single book image with dual OCR engines"""
-        # Preprocess image
+        """OCR a book image with the engine cascade; returns (text, report)
+
+        The report says which engines ran, for how long and why; a result
+        from the OCR cache reports stopped='cache' and no engines.
+        """
+        key = None
+        if self.cache is not None:
+            try:
+                with metrics.stage("cache"):
+                    key = file_cache_key(image_path, "cascade", self.ocr_config())
+                    cached = self.cache.get(key)
+            except OSError:
+                cached = None
+            if cached is not None:
+                return cached, {"engines": [], "confidence": None, "stopped": "cache", "ms": 0.0}
+
         processed_img = self.preprocess_image(image_path)
-        
         if processed_img is None:
-            return "Error: Could not process image"
-        
-        # Try Tesseract first
-        try:
-            tesseract_text = pytesseract.image_to_string(processed_img, config='--psm 6')
-        except:
-            tesseract_text = ""
-        
-        # Try EasyOCR if Tesseract fails or produces little text
-        easyocr_text = ""
-        if len(tesseract_text.strip()) < 50:
-            try:
-                results = self.reader.readtext(processed_img, detail=0, paragraph=True)
-                easyocr_text = " ".join(results)
-            except:
-                easyocr_text = ""
-        
-        # Use the better result
-        if len(easyocr_text) > len(tesseract_text):
-            return easyocr_text
-        else:
-            return tesseract_text
+            return "Error: Could not process image", None
+
+        text, report = self.cascade.run(processed_img)
+        for step in report["engines"]:
+            metrics.record(step["engine"], step["ms"] / 1000)
+        print("OCR " + ", ".join(f"{step['engine']}={step['ms']:.0f}ms" for step in report["engines"])
+              + f" ({report['stopped']}, confidence {report['confidence']:.0f})")
+        # A failed fallback or a budget stop may read better next time; only settled results are kept
+        if key is not None and report["stopped"] not in ("fallback failed", "budget"):
+            self.cache.put(key, "cascade", text)
+        return text, report
+
+    def ocr_config(self):
+        """Preprocessing, region and cascade part of the OCR cache key"""
+        easyocr = "easyocr" if importlib.util.find_spec("easyocr") else "no-easyocr"
+        return (f"{self.preprocessor.signature}|regions:{self.regions_method or 'off'}"
+                f"|{self.cascade.signature}|{easyocr}")
 
     def save_to_database(self, metadata, full_text):
-        """Save extracted metadata to database"""
-        conn = sqlite3.connect('catalog.db')
-        c = conn.cursor()
-        
+        """Save extracted metadata to database (enrichment happens later)"""
         try:
-            c.execute('''
-                INSERT OR REPLACE INTO books 
-                (book_id, title, author, year, isbn, publisher, keywords, 
-                 enriched, full_text, cover_path, timestamp, confidence)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                metadata.get("book_id", ""), metadata.get("title", ""),
-                metadata.get("author", ""), metadata.get("year", ""),
-                metadata.get("isbn", ""), metadata.get("publisher", ""),
-                metadata.get("keywords", ""), metadata.get("enriched", ""),
-                full_text, metadata.get("cover_path", ""),
-                datetime.now().isoformat(), 0.95
-            ))
-            conn.commit()
+            with storage.transaction(app.config['DATABASE']) as conn:
+                storage.insert_book(conn, *catalog_record(metadata, full_text))
         except Exception as e:
             print(f"Database save error: {e}")
-        finally:
-            conn.close()
 
 
-def enhanced_extract_metadata(full_text, image_path):
-    """Extract comprehensive metadata using multiple techniques from notebook"""
-    import re
-    
-    # Basic regex extraction
-    title = "Unknown Title"
-    author = "Unknown Author"
-    year = "Unknown"
-    isbn = None
-    publisher = "Unknown"
-    
-    # Enhanced title extraction from first meaningful line
-    lines = full_text.split('\n')
-    for line in lines[:5]:  # Check first 5 lines
-        line = line.strip()
-        if len(line) > 10 and not line.isdigit():
-            title = line
-            break
-    
-    # Extract publication year with multiple patterns
-    year_patterns = [
-        r'\b(19|20)\d{2}\b',
-        r'Copyright.*?(19|20)\d{2}',
-        r'©.*?(19|20)\d{2}'
-    ]
-    for pattern in year_patterns:
-        year_match = re.search(pattern, full_text)
-        if year_match:
-            year = re.search(r'(19|20)\d{2}', year_match.group(0)).group(0)
-            break
-    
-    # Extract ISBN with enhanced pattern
-    isbn_match = re.search(
-        r"(978|979)[- ]?\d{1,5}[- ]?\d{1,7}[- ]?\d{1,7}[- ]?\d", full_text
-    )
-    if isbn_match:
-        isbn = isbn_match.group(0).replace(" ", "").replace("-", "")
-
-    # Use spaCy for named entity recognition (if available)
-    if nlp:
-        try:
-            doc = nlp(full_text[:100000])  # Limit text length for performance
-            persons = [ent.text for ent in doc.ents if ent.label_ == "PERSON"]
-            if persons and author == "Unknown Author":
-                author = persons[0]
-        except Exception as e:
-            print(f"spaCy processing error: {e}")
+def catalog_record(metadata, full_text):
+    """(filename, fields, ocr_text) for storage from extracted metadata"""
+    year = metadata.get("year", "")
+    isbn = metadata.get("isbn")
+    return os.path.basename(metadata.get("cover_path", "")), {
+        "title": metadata.get("title", ""),
+        "author": metadata.get("author", ""),
+        "year": int(year) if str(year).isdigit() else None,
+        "isbn": isbn if isbn and isbn != "N/A" else None,
+        "publisher": metadata.get("publisher", ""),
+        "keywords": metadata.get("keywords", ""),
+    }, full_text
 
-    # Extract keywords using NLTK
-    words = nltk.word_tokenize(full_text.lower())
-    words = [w for w in words if w.isalpha() and len(w) > 4]
-    freq = nltk.FreqDist(words)
-    keywords = ", ".join([w for w, c in freq.most_common(8)])
 
-    # Open Library API enrichment
-    enriched = False
-    if isbn and len(isbn) >= 10:
-        try:
-            url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-            resp = requests.get(url, timeout=10)
-            data = resp.json()
-            key = f"ISBN:{isbn}"
-            if key in data:
-                ol = data[key]
-                title = ol.get("title", title)
-                if "authors" in ol:
-                    author = ol["authors"][0]["name"]
-                if "publish_date" in ol:
-                    year = ol["publish_date"][-4:]
-                publisher = ol.get("publishers", [{}])[0].get("name", publisher)
-                enriched = True
-        except:
-            pass
+# One processor per worker; its models come from the shared registry
+processor = OCRProcessor()
+
 
+# Rendered analytics charts, reused until the catalog changes
+chart_cache = ChartCache(app.config["DATABASE"], app.config["CHART_CACHE_DIR"], namespace="app")
+
+# Records are enriched from Open Library by a background stage, off the upload path
+enricher = Enricher(app.config["DATABASE"], OpenLibraryClient(cache_db=app.config["DATABASE"]))
+
+
+def enhanced_extract_metadata(full_text, image_path):
+    """Catalog fields of an upload's OCR text, as shown on the job page
+
+    The fields come from metadata.extract_metadata, like every other path;
+    authors it finds no byline for are named by NER once the upload is
+    complete (see name_authors).
+    """
+    fields = extract_metadata(full_text)
     return {
         "book_id": f"book_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-        "title": title,
-        "author": author,
-        "year": year,
-        "isbn": isbn or "N/A",
-        "publisher": publisher,
-        "keywords": keywords,
-        "enriched": "Yes (Open Library)" if enriched else "No",
+        "title": fields["title"],
+        "author": fields["author"],
+        "year": fields["year"] or "Unknown",
+        "isbn": fields["isbn"] or "N/A",
+        "publisher": fields["publisher"],
+        "keywords": fields["keywords"],
+        # Open Library enrichment runs in the background after the record is saved
+        "enriched": "Pending" if fields["isbn"] else "No",
         "cover_path": image_path
     }
 
 
+def process_upload(path, filename):
+    """Run OCR and metadata extraction for one saved upload"""
+    with metrics.trace(f"ocr {filename}"):
+        # A barcode ISBN is checksummed, so it beats one read by OCR; in skip mode
+        # the rest of the record comes from enrichment alone
+        isbn = processor.read_barcode(path)
+        if isbn and processor.barcode_mode == "skip":
+            full_text, report = "", None
+        else:
+            full_text, report = processor.process_book_image(path)
+        meta = enhanced_extract_metadata(full_text, path)
+    meta["ocr_report"] = report
+    if isbn:
+        meta.update(isbn=isbn, enriched="Pending")
+    meta["full_text"] = full_text
+    return meta
+
+
+def name_authors(results):
+    """Fill in authors by spaCy NER for the upload's records without one
+
+    The records' texts go through find_authors() together, so the model
+    runs once per upload in batches rather than once per image.
+    """
+    missing = [meta for meta in results if meta.get("author", "Unknown Author") == "Unknown Author"]
+    nlp = registry.nlp if missing else None
+    if not nlp:
+        return
+    try:
+        with metrics.stage("spacy"):
+            found = authors.find_authors(nlp, [meta["full_text"] for meta in missing])
+    except Exception as e:
+        print(f"spaCy processing error: {e}")
+        return
+    for meta, person in zip(missing, found):
+        if person:
+            meta["author"] = person
+
+
+def store_upload(conn, job_id, results):
+    """Name the authors of, and save, every record of a finished upload in one transaction"""
+    with metrics.trace(f"store job {job_id}"):
+        name_authors(results)
+        # Keywords are ranked by TF-IDF against the catalog, counting these records in
+        with metrics.stage("keywords"):
+            records = rank_records(conn, [catalog_record(meta, meta["full_text"]) for meta in results])
+        with metrics.stage("store"):
+            storage.insert_books(conn, records)
+    enricher.wake()
+
+
+# Uploads are processed by a bounded background worker pool
+job_queue = JobQueue(app.config["DATABASE"], process_upload,
+                     max_workers=app.config["INGEST_WORKERS"],
+                     on_complete=store_upload)
+# Keeps older records' keywords in step with the growing catalog
+keyword_ranker = KeywordRanker(app.config["DATABASE"])
+
+_background_started = False
+
+
+def start_background():
+    """Warm up this process's models and, in one process per catalog,
+    resume queued jobs and start the enricher and keyword ranker"""
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    # The app serves (and answers /health/live) while the models load behind it
+    registry.warmup(app.config["WARMUP"])
+    if not storage.claim_background(app.config["DATABASE"]):
+        print("ℹ️ Background jobs run in another process")
+        return
+    job_queue.resume()
+    enricher.start()
+    if app.config["KEYWORD_RANKING"]:
+        keyword_ranker.start()
+
+
+# Imported by a WSGI server every worker serves. Run directly, the debug
+# reloader's watcher process does not: only its child starts (see below)
+if __name__ != "__main__":
+    start_background()
+
+
+def wants_json():
+    """True when the client prefers a JSON response over HTML"""
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json'
+
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
         files = request.files.getlist('files')
-        results = []
+        batch = uuid.uuid4().hex[:8]
+        saved = []
         
         for file in files:
+            if not file or not file.filename:
+                continue
             filename = secure_filename(file.filename)
-            path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(path)
-            
-            # Enhanced OCR processing
-            processor = OCRProcessor()
-            full_text = processor.process_book_image(path)
-            meta = enhanced_extract_metadata(full_text, path)
-            
-            # Add image data for display
-            with open(path, 'rb') as img_file:
-                img_data = base64.b64encode(img_file.read()).decode()
-                meta["image"] = f"data:image/jpeg;base64,{img_data}"
-            
-            results.append(meta)
-            
-            # Save to database
-            processor.save_to_database(meta, full_text)
+            path = os.path.join(app.config['UPLOAD_FOLDER'], f"{batch}_{filename}")
+            with metrics.stage('save'):
+                file.save(path)
+            saved.append((filename, path))
         
-        return render_template('results.html', results=results)
+        with metrics.stage('enqueue'):
+            job_id = job_queue.submit(saved)
+        if wants_json():
+            return jsonify({
+                'job_id': job_id,
+                'status_url': url_for('job_status', job_id=job_id),
+                'total_files': len(saved)
+            }), 202
+        return redirect(url_for('job_status', job_id=job_id), code=303)
     
     return render_template('index.html')
 
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Per-file progress and results of an ingest job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if wants_json():
+        return jsonify(job)
+    
+    results = []
+    for item in job['files']:
+        if item['status'] == 'failed':
+            # Shown with their error, so a partly failed upload does not look complete
+            results.append({'filename': item['filename'], 'error': item['error'], 'status': 'error'})
+            continue
+        if item['status'] != 'done':
+            continue
+        meta = dict(item['result'])
+        # Add image data for display
+        try:
+            with open(meta['cover_path'], 'rb') as img_file:
+                img_data = base64.b64encode(img_file.read()).decode()
+                meta["image"] = f"data:image/jpeg;base64,{img_data}"
+        except (OSError, KeyError):
+            pass
+        results.append(meta)
+    
+    return render_template('results.html', results=results, job=job)
+
+
 @app.route('/analytics')
 def analytics():
     """Analytics dashboard with visualizations"""
     try:
-        # Get data from database
-        conn = sqlite3.connect('catalog.db')
-        df = pd.read_sql("SELECT * FROM books", conn)
-        conn.close()
-        
-        if len(df) == 0:
+        conn = storage.connection(app.config['DATABASE'])
+        with metrics.stage('aggregates'):
+            stats = aggregates.summary(conn)
+
+        if stats['total_books'] == 0:
             return render_template('analytics.html', 
                                  total_books=0, 
                                  enriched_books=0, 
                                  visualizations=None)
         
-        # Generate visualizations
-        visualizations = create_visualizations(df)
-        
-        # Calculate statistics
-        stats = {
-            'total_books': len(df),
-            'enriched_books': len(df[df['enriched'].str.contains('Yes', na=False)]),
-            'unique_authors': len(df['author'].unique()),
-            'avg_year': int(pd.to_numeric(df['year'], errors='coerce').mean()) if len(df) > 0 else 'N/A'
-        }
+        # Charts are only re-rendered after the catalog changes
+        visualizations = create_visualizations(stats['version'])
         
         return render_template('analytics.html', 
                              total_books=stats['total_books'],
                              enriched_books=stats['enriched_books'],
                              unique_authors=stats['unique_authors'],
-                             avg_year=stats['avg_year'],
+                             avg_year=stats['avg_year'] or 'N/A',
                              visualizations=visualizations)
     except Exception as e:
         return f"Error generating analytics: {str(e)}", 500
 
 
+@app.route('/api/analytics')
+def analytics_api():
+    """Catalog aggregates as JSON for external dashboards"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 1000))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(aggregates.summary(storage.connection(app.config['DATABASE']), limit=limit))
+
+
+@app.route('/charts/<digest>.png')
+def chart_image(digest):
+    """Cached chart image; the URL changes whenever the image does"""
+    path = chart_cache.path(digest)
+    if path is None:
+        return "Chart not found", 404
+    return send_file(path, mimetype='image/png', etag=digest, conditional=True,
+                     max_age=365 * 24 * 60 * 60)
+
+
 @app.route('/database')
 def database_view():
-    """Database management interface"""
+    """Database management interface, one keyset-paginated page at a time"""
     try:
-        conn = sqlite3.connect('catalog.db')
-        df = pd.read_sql("SELECT * FROM books ORDER BY timestamp DESC", conn)
-        conn.close()
-        
-        # Convert DataFrame to list of dictionaries for template
-        records = df.to_dict('records')
-        
-        return render_template('database.html', records=records, total=len(records))
+        conn = storage.connection(app.config['DATABASE'])
+        with metrics.stage('list'):
+            page = storage.list_books(conn,
+                                      after=request.args.get('after'),
+                                      before=request.args.get('before'),
+                                      limit=app.config['PAGE_SIZE'])
+    except ValueError:
+        return redirect(url_for('database_view'))
     except Exception as e:
         return f"Database error: {str(e)}", 500
 
+    return render_template('database.html', records=page['records'],
+                           counts=storage.catalog_counts(conn),
+                           next_cursor=page['next'], prev_cursor=page['prev'])
 
-def create_visualizations(df):
-    """Create data visualizations from the notebook"""
-    visualizations = {}
-    
+
+@app.route('/database/<int:book_id>')
+def book_detail(book_id):
+    """Full record of one book, including its OCR text"""
+    book = storage.get_book(storage.connection(app.config['DATABASE']), book_id)
+    if book is None:
+        return "Book not found", 404
+    return render_template('book.html', book=book)
+
+
+@app.route('/search')
+def search_catalog():
+    """Ranked full-text search over the catalog"""
     try:
-        # Publication year distribution
-        plt.figure(figsize=(10, 6))
-        years = pd.to_numeric(df['year'], errors='coerce').dropna()
-        if len(years) > 0:
-            plt.hist(years, bins=20, alpha=0.7, color='#1a5f3f', edgecolor='black')
-            plt.title('Publication Year Distribution')
-            plt.xlabel('Year')
-            plt.ylabel('Count')
-            plt.grid(True, alpha=0.3)
-            
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=150)
-            img_buffer.seek(0)
-            year_chart = base64.b64encode(img_buffer.getvalue()).decode()
-            visualizations['year_distribution'] = year_chart
-            plt.close()
-        
-        # Enrichment status pie chart
-        plt.figure(figsize=(8, 8))
-        enriched_counts = df['enriched'].value_counts()
-        if len(enriched_counts) > 0:
-            colors = ['#1a5f3f', '#d32f2f']
-            plt.pie(enriched_counts.values, labels=enriched_counts.index, 
-                   autopct='%1.1f%%', colors=colors, startangle=90)
-            plt.title('API Enrichment Status')
-            
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=150)
-            img_buffer.seek(0)
-            enrichment_chart = base64.b64encode(img_buffer.getvalue()).decode()
-            visualizations['enrichment_status'] = enrichment_chart
-            plt.close()
-        
-        # Keywords word cloud
-        all_keywords = ' '.join(df['keywords'].fillna('').astype(str))
-        if len(all_keywords.strip()) > 0:
-            wordcloud = WordCloud(width=800, height=400, 
-                                background_color='white',
-                                colormap='Greens').generate(all_keywords)
-            
-            plt.figure(figsize=(12, 6))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis('off')
-            plt.title('Most Common Keywords')
-            
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=150)
-            img_buffer.seek(0)
-            wordcloud_chart = base64.b64encode(img_buffer.getvalue()).decode()
-            visualizations['wordcloud'] = wordcloud_chart
-            plt.close()
-            
-    except Exception as e:
-        print(f"Visualization error: {e}")
-    
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+
+    conn = storage.connection(app.config['DATABASE'])
+    with metrics.stage('search'):
+        results = search.search(conn, request.args.get('q', ''), page=page, per_page=per_page)
+    return jsonify(results)
+
+
+def pyplot():
+    """matplotlib.pyplot on the non-GUI backend, imported on the first chart render"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def figure_png():
+    """Current matplotlib figure as PNG bytes"""
+    plt = pyplot()
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=150)
+    plt.close()
+    return img_buffer.getvalue()
+
+
+def render_year_distribution():
+    """Publication year distribution"""
+    year_counts = aggregates.year_counts(storage.connection(app.config['DATABASE']))
+    if len(year_counts) == 0:
+        return None
+    years, counts = zip(*year_counts)
+    plt = pyplot()
+    plt.figure(figsize=(10, 6))
+    plt.hist(years, weights=counts, bins=20, alpha=0.7, color='#1a5f3f', edgecolor='black')
+    plt.title('Publication Year Distribution')
+    plt.xlabel('Year')
+    plt.ylabel('Count')
+    plt.grid(True, alpha=0.3)
+    return figure_png()
+
+
+def render_enrichment_status():
+    """Enrichment status pie chart"""
+    import pandas as pd
+    counts = storage.catalog_counts(storage.connection(app.config['DATABASE']))
+    enriched_counts = pd.Series({'Yes (Open Library)': counts['enriched'],
+                                 'No': counts['books'] - counts['enriched']})
+    enriched_counts = enriched_counts[enriched_counts > 0]
+    if len(enriched_counts) == 0:
+        return None
+    plt = pyplot()
+    plt.figure(figsize=(8, 8))
+    colors = ['#1a5f3f', '#d32f2f']
+    plt.pie(enriched_counts.values, labels=enriched_counts.index, 
+           autopct='%1.1f%%', colors=colors, startangle=90)
+    plt.title('API Enrichment Status')
+    return figure_png()
+
+
+def render_wordcloud():
+    """Keywords word cloud"""
+    frequencies = dict(aggregates.top(storage.connection(app.config['DATABASE']),
+                                      'stats_keywords', 'keyword', 200))
+    if len(frequencies) == 0:
+        return None
+    from wordcloud import WordCloud
+    wordcloud = WordCloud(width=800, height=400, 
+                        background_color='white',
+                        colormap='Greens').generate_from_frequencies(frequencies)
+    plt = pyplot()
+    plt.figure(figsize=(12, 6))
+    plt.imshow(wordcloud, interpolation='bilinear')
+    plt.axis('off')
+    plt.title('Most Common Keywords')
+    return figure_png()
+
+
+CHARTS = {
+    'year_distribution': render_year_distribution,
+    'enrichment_status': render_enrichment_status,
+    'wordcloud': render_wordcloud,
+}
+
+
+def create_visualizations(version):
+    """Chart URLs for the catalog at `version`, rendering only stale charts"""
+    visualizations = {}
+    for name, render in CHARTS.items():
+        try:
+            with metrics.stage('chart'):
+                digest = chart_cache.get(name, version, render)
+            if digest:
+                visualizations[name] = url_for('chart_image', digest=digest)
+        except Exception as e:
+            pyplot().close('all')
+            print(f"Visualization error ({name}): {e}")
     return visualizations
 
 
 @app.route('/download/<format>')
 def download(format):
-    """Enhanced download with multiple formats"""
+    """Stream the catalog as csv, jsonl, json or marcxml"""
+    if format not in export.FORMATS:
+        return f"Format not supported. Available: {', '.join(export.FORMATS)}", 400
+
+    _, mimetype, extension = export.FORMATS[format]
+    filename = f'catalog_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    return Response(stream_with_context(export.stream(app.config['DATABASE'], format)),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@app.route('/health')
+def health_check():
+    """Health check with model load times and memory footprint"""
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'models': registry.stats(),
+        'ocr_cache': processor.cache.stats() if processor.cache else None,
+        'enrichment': enricher.stats(),
+        'keyword_ranking': keyword_ranker.stats()
+    })
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request and per-stage counters and latency histograms for Prometheus"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/health/live')
+def health_live():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness: the catalog is reachable and the warmup models are loaded (503 until then)"""
+    ready, models = registry.readiness(app.config["WARMUP"])
     try:
-        conn = sqlite3.connect('catalog.db')
-        df = pd.read_sql("SELECT * FROM books", conn)
-        conn.close()
-        
-        if format == 'csv':
-            csv_data = df.to_csv(index=False)
-            return send_file(
-                io.BytesIO(csv_data.encode()),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'catalog_{datetime.now().strftime("%Y%m%d")}.csv'
-            )
-        elif format == 'json':
-            json_data = df.to_json(orient='records', indent=2)
-            return send_file(
-                io.BytesIO(json_data.encode()),
-                mimetype='application/json',
-                as_attachment=True,
-                download_name=f'catalog_{datetime.now().strftime("%Y%m%d")}.json'
-            )
-        else:
-            return "Format not supported. Available: csv, json", 400
+        storage.connection(app.config['DATABASE']).execute('SELECT 1')
+        database = 'ok'
     except Exception as e:
-        return f"Download error: {str(e)}", 500
+        database, ready = str(e), False
+    return jsonify({
+        'status': 'ready' if ready else 'starting',
+        'models': models,
+        'database': database,
+    }), 200 if ready else 503
 
 
 if __name__ == '__main__':
+    if is_running_from_reloader():
+        start_background()
     app.run(debug=True)
\ No newline at end of file
@@ -6,20 +6,40 @@ A mobile-optimized OCR web application for library cataloging
 
 import os
 import sys
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, send_file, flash, redirect, url_for, stream_with_context
+from werkzeug.serving import is_running_from_reloader
 from werkzeug.utils import secure_filename
-import sqlite3
-import pandas as pd
+import importlib.util
+import io
 import json
 from datetime import datetime
-import re
+import uuid
+
+from jobs import JobQueue
+from metadata import simulate_ocr, extract_metadata  # noqa: F401 (re-exported)
+from pipeline import PipelineExecutor, default_workers
+from ocr_cache import OCRCache
+from openlibrary import OpenLibraryClient
+from enricher import Enricher
+from charts import ChartCache
+import aggregates
+import barcode
+import export
+import keywords
+import metrics
+import search
+import storage
 
 # Try to import optional dependencies gracefully
 try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
+    from tesseract_engine import TESSERACT_AVAILABLE, parse_backend
 except ImportError:
     TESSERACT_AVAILABLE = False
+
+    def parse_backend(spec):
+        """No Tesseract backend without tesseract_engine"""
+        return None
+if not TESSERACT_AVAILABLE:
     print("⚠️ Tesseract not available - OCR will be simulated")
 
 try:
@@ -29,133 +49,139 @@ except ImportError:
     PIL_AVAILABLE = False
     print("⚠️ PIL not available - using basic image handling")
 
-try:
+# matplotlib takes half a second to import, so it is only loaded for the first chart
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+if not MATPLOTLIB_AVAILABLE:
+    print("⚠️ Matplotlib not available - charts will be simulated")
+
+def pyplot():
+    """matplotlib.pyplot on the non-interactive backend"""
     import matplotlib
-    matplotlib.use('Agg')  # Non-interactive backend
+    matplotlib.use('Agg')
     import matplotlib.pyplot as plt
-    import numpy as np
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("⚠️ Matplotlib not available - charts will be simulated")
+    return plt
 
 # Configure Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'lis-book-scanner-secret-key-2024'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['DATABASE'] = os.environ.get('CATALOG_DB', 'catalog.db')
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', default_workers()))
+app.config['OCR_EXECUTOR'] = os.environ.get('OCR_EXECUTOR', 'process')  # process, thread or serial
+app.config['OCR_THREADS'] = int(os.environ.get('OCR_THREADS', '1'))  # threads per Tesseract call
+app.config['INGEST_WORKERS'] = int(os.environ.get('INGEST_WORKERS', app.config['OCR_WORKERS']))
+app.config['OCR_CACHE'] = os.environ.get('OCR_CACHE', '1') == '1'
+app.config['OCR_CACHE_MAX_BYTES'] = int(os.environ.get('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['ENRICHMENT'] = os.environ.get('ENRICHMENT', '1') == '1'
+app.config['KEYWORD_RANKING'] = os.environ.get('KEYWORD_RANKING', '1') == '1'  # background TF-IDF re-ranking
+app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', '50'))  # records per /database page
+app.config['WARMUP'] = os.environ.get('WARMUP', '1') not in ('0', 'none')  # start OCR workers at boot
+app.config['CHART_CACHE_DIR'] = os.environ.get(
+    'CHART_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(app.config['DATABASE'])), 'chart_cache'))
+
+# Every request is timed and traced; /metrics serves the counters and histograms
+metrics.instrument(app)
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('static/temp_uploads', exist_ok=True)
 
 # Database initialization
 def init_database():
     """Initialize SQLite database with books table"""
     try:
-        conn = sqlite3.connect('catalog.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL,
-                title TEXT,
-                author TEXT,
-                year INTEGER,
-                isbn TEXT,
-                publisher TEXT,
-                keywords TEXT,
-                ocr_text TEXT,
-                processing_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                api_enriched BOOLEAN DEFAULT FALSE
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        storage.init_database(app.config['DATABASE'])
         return True
     except Exception as e:
         print(f"Database error: {e}")
         return False
 
-# Simple OCR simulation for when Tesseract isn't available
-def simulate_ocr(filename):
-    """Simulate OCR results for demo purposes"""
-    sample_texts = [
-        "The Great Gatsby\nBy F. Scott Fitzgerald\nCopyright 1925\nISBN 978-0-7432-7356-5\nScribner Publishing",
-        "To Kill a Mockingbird\nBy Harper Lee\nCopyright 1960\nISBN 978-0-06-112008-4\nHarper & Row Publishers",
-        "1984\nBy George Orwell\nCopyright 1949\nISBN 978-0-452-28423-4\nSecker & Warburg",
-        "Pride and Prejudice\nBy Jane Austen\nCopyright 1813\nISBN 978-0-14-143951-8\nT. Egerton Publishers"
-    ]
-    
-    # Use filename to determine which sample to return
-    index = abs(hash(filename)) % len(sample_texts)
-    return sample_texts[index]
-
-# Enhanced metadata extraction
-def extract_metadata(text, filename):
-    """Extract book metadata from OCR text"""
-    metadata = {
-        'title': 'Unknown Title',
-        'author': 'Unknown Author',
-        'year': None,
-        'isbn': None,
-        'publisher': 'Unknown Publisher',
-        'keywords': ''
-    }
-    
-    if not text:
-        return metadata
-    
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    # Extract title (usually first meaningful line)
-    for line in lines:
-        if len(line) > 3 and not line.lower().startswith(('by', 'copyright', 'isbn', 'published')):
-            metadata['title'] = line
-            break
-    
-    # Extract author
-    for line in lines:
-        if line.lower().startswith('by '):
-            metadata['author'] = line[3:].strip()
-            break
-    
-    # Extract year
-    year_match = re.search(r'\b(19|20)\d{2}\b', text)
-    if year_match:
-        metadata['year'] = int(year_match.group())
-    
-    # Extract ISBN
-    isbn_match = re.search(r'ISBN[\s:-]*(\d{1,5}[-\s]?\d{1,7}[-\s]?\d{1,7}[-\s]?[\dX])', text, re.IGNORECASE)
-    if isbn_match:
-        metadata['isbn'] = isbn_match.group(1).replace(' ', '').replace('-', '')
-    
-    # Extract publisher
-    for line in lines:
-        if any(word in line.lower() for word in ['publisher', 'publishing', 'press', 'books']):
-            metadata['publisher'] = line.strip()
-            break
-    
-    # Generate keywords
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-    common_words = {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'man', 'may', 'she', 'use', 'your', 'been', 'from', 'have', 'they', 'know', 'want', 'were', 'what', 'when', 'with', 'would', 'make', 'time', 'very', 'will', 'into', 'said', 'each', 'which', 'their', 'called', 'other', 'many', 'after', 'first', 'well', 'water'}
-    
-    keywords = [word for word in set(words) if word not in common_words and len(word) > 4]
-    metadata['keywords'] = ', '.join(keywords[:10])  # Top 10 keywords
-    
-    return metadata
-
 # Routes
 @app.route('/')
 def index():
     """Main upload page"""
     return render_template('index.html')
 
+# Records are enriched from Open Library by a background stage, off the upload path
+enricher = Enricher(app.config['DATABASE'], OpenLibraryClient(cache_db=app.config['DATABASE']))
+
+# Per-image OCR runs on a pool of worker processes; repeat uploads of the
+# same photo are answered from the OCR cache
+ocr_cache = None
+if app.config['OCR_CACHE']:
+    ocr_cache = OCRCache(app.config['DATABASE'], max_bytes=app.config['OCR_CACHE_MAX_BYTES'])
+ocr_executor = PipelineExecutor(workers=app.config['OCR_WORKERS'],
+                                mode=app.config['OCR_EXECUTOR'],
+                                ocr_threads=app.config['OCR_THREADS'],
+                                cache_db=app.config['DATABASE'] if ocr_cache else None,
+                                cache_max_bytes=app.config['OCR_CACHE_MAX_BYTES'])
+
+def process_upload(filepath, filename):
+    """OCR one saved upload and extract its metadata"""
+    with metrics.trace(f"ocr {filename}"):
+        result = ocr_executor.run(filepath, filename)
+        # Stages were timed in the worker process
+        metrics.record_timings(result['timings'])
+    return result
+
+def store_upload(conn, job_id, results):
+    """Save every record of a finished upload in one transaction"""
+    with metrics.trace(f"store job {job_id}"):
+        # Keywords are ranked by TF-IDF against the catalog, counting these records in
+        with metrics.stage('keywords'):
+            records = keywords.rank_records(conn, [(r['filename'], r['metadata'], r['ocr_text'])
+                                                   for r in results])
+        with metrics.stage('store'):
+            storage.insert_books(conn, records)
+    # Open Library enrichment happens in the background
+    enricher.wake()
+
+# Uploads are processed by a bounded background worker pool
+init_database()
+chart_cache = ChartCache(app.config['DATABASE'], app.config['CHART_CACHE_DIR'], namespace='prod')
+job_queue = JobQueue(app.config['DATABASE'], process_upload,
+                     max_workers=app.config['INGEST_WORKERS'],
+                     on_complete=store_upload)
+# Keeps older records' keywords in step with the growing catalog
+keyword_ranker = keywords.KeywordRanker(app.config['DATABASE'])
+
+_background_started = False
+
+def start_background():
+    """Warm up this process's OCR workers and, in one process per catalog,
+    resume queued jobs and start the enricher and keyword ranker"""
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    if app.config['WARMUP']:
+        # Workers start in the background; /health/ready reports when they are up
+        ocr_executor.warmup()
+    if not storage.claim_background(app.config['DATABASE']):
+        print("ℹ️ Background jobs run in another process")
+        return
+    job_queue.resume()
+    if app.config['ENRICHMENT']:
+        enricher.start()
+    if app.config['KEYWORD_RANKING']:
+        keyword_ranker.start()
+
+# Imported by gunicorn or `flask run`, every worker serves. Run directly, the
+# debug reloader's watcher process does not: only its child starts (see below)
+if __name__ != '__main__':
+    start_background()
+
+# Chart URLs are content-addressed, so browsers may keep them for a year
+CHART_MAX_AGE = 365 * 24 * 60 * 60
+
+def wants_json():
+    """True when the client prefers a JSON response over HTML"""
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json'
+
 @app.route('/', methods=['POST'])
 def upload_files():
-    """Handle file upload and OCR processing"""
+    """Save uploaded files and queue them for OCR processing"""
     print("📤 Upload request received")
     print(f"Files in request: {list(request.files.keys())}")
     
@@ -172,113 +198,100 @@ def upload_files():
         flash('No files selected', 'error')
         return redirect(url_for('index'))
     
-    results = []
+    # Prefix stored files so concurrent uploads with the same name don't clash
+    batch = uuid.uuid4().hex[:8]
+    saved = []
     
     for i, file in enumerate(files):
         if file and file.filename:
-            print(f"📷 Processing file {i+1}: {file.filename}")
-            try:
-                # Secure filename
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            print(f"📷 Saving file {i+1}: {file.filename}")
+            filename = secure_filename(file.filename)
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{batch}_{filename}")
+            with metrics.stage('save'):
                 file.save(filepath)
-                
-                # Perform OCR
-                if TESSERACT_AVAILABLE and PIL_AVAILABLE:
-                    try:
-                        image = Image.open(filepath)
-                        ocr_text = pytesseract.image_to_string(image)
-                    except Exception as e:
-                        print(f"OCR error: {e}")
-                        ocr_text = simulate_ocr(filename)
-                else:
-                    ocr_text = simulate_ocr(filename)
-                
-                # Extract metadata
-                metadata = extract_metadata(ocr_text, filename)
-                
-                # Save to database
-                try:
-                    conn = sqlite3.connect('catalog.db')
-                    cursor = conn.cursor()
-                    
-                    cursor.execute('''
-                        INSERT INTO books (filename, title, author, year, isbn, publisher, keywords, ocr_text)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        filename,
-                        metadata['title'],
-                        metadata['author'], 
-                        metadata['year'],
-                        metadata['isbn'],
-                        metadata['publisher'],
-                        metadata['keywords'],
-                        ocr_text
-                    ))
-                    
-                    conn.commit()
-                    conn.close()
-                    
-                except Exception as e:
-                    print(f"Database error: {e}")
-                
-                # Add to results
-                result = {
-                    'filename': filename,
-                    'ocr_text': ocr_text,
-                    'metadata': metadata,
-                    'status': 'success'
-                }
-                results.append(result)
-                
-            except Exception as e:
-                results.append({
-                    'filename': file.filename,
-                    'error': str(e),
-                    'status': 'error'
-                })
+            saved.append((filename, filepath))
     
-    return render_template('results.html', results=results)
+    with metrics.stage('enqueue'):
+        job_id = job_queue.submit(saved)
+    print(f"🧾 Queued job {job_id} with {len(saved)} file(s)")
+    
+    if wants_json():
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id),
+            'total_files': len(saved)
+        }), 202
+    return redirect(url_for('job_status', job_id=job_id), code=303)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Per-file progress and results of an ingest job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        if wants_json():
+            return jsonify({'error': 'Job not found'}), 404
+        flash('Job not found', 'error')
+        return redirect(url_for('index'))
+    
+    if wants_json():
+        return jsonify(job)
+    
+    results = []
+    for item in job['files']:
+        if item['status'] == 'done':
+            result = dict(item['result'])
+            result.update(result.get('metadata', {}))
+            results.append(result)
+        elif item['status'] == 'failed':
+            results.append({'filename': item['filename'], 'error': item['error'], 'status': 'error'})
+    return render_template('results.html', results=results, job=job)
+
+def render_year_chart():
+    """PNG of books per publication year, or None without data"""
+    conn = storage.connection(app.config['DATABASE'])
+    year_counts = aggregates.year_counts(conn)
+    if not year_counts:
+        return None
+    years, counts = zip(*year_counts)
+    
+    plt = pyplot()
+    plt.figure(figsize=(10, 6))
+    plt.bar(years, counts, color='#1a5f3f', alpha=0.7)
+    plt.title('Books by Publication Year', fontsize=16, color='#1a5f3f')
+    plt.xlabel('Year')
+    plt.ylabel('Number of Books')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    plt.close()
+    return buffer.getvalue()
 
 @app.route('/analytics')
 def analytics():
     """Analytics dashboard"""
     try:
-        conn = sqlite3.connect('catalog.db')
+        conn = storage.connection(app.config['DATABASE'])
+        with metrics.stage('aggregates'):
+            stats = aggregates.summary(conn)
         
-        # Get basic stats
-        total_books = pd.read_sql_query("SELECT COUNT(*) as count FROM books", conn).iloc[0]['count']
-        enriched_books = pd.read_sql_query("SELECT COUNT(*) as count FROM books WHERE api_enriched = 1", conn).iloc[0]['count']
-        
-        # Generate visualizations
+        # Charts are only re-rendered after the catalog changes
         visualizations = None
         if MATPLOTLIB_AVAILABLE:
             try:
-                # Year distribution
-                year_data = pd.read_sql_query("SELECT year, COUNT(*) as count FROM books WHERE year IS NOT NULL GROUP BY year ORDER BY year", conn)
-                
-                if not year_data.empty:
-                    plt.figure(figsize=(10, 6))
-                    plt.bar(year_data['year'], year_data['count'], color='#1a5f3f', alpha=0.7)
-                    plt.title('Books by Publication Year', fontsize=16, color='#1a5f3f')
-                    plt.xlabel('Year')
-                    plt.ylabel('Number of Books')
-                    plt.xticks(rotation=45)
-                    plt.tight_layout()
-                    
-                    chart_path = 'static/temp_uploads/year_distribution.png'
-                    plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-                    plt.close()
-                    
-                    visualizations = {'year_chart': 'temp_uploads/year_distribution.png'}
+                with metrics.stage('chart'):
+                    digest = chart_cache.get('year_distribution', stats['version'], render_year_chart)
+                if digest:
+                    visualizations = {'year_distribution': url_for('chart_image', digest=digest)}
             except Exception as e:
                 print(f"Visualization error: {e}")
         
-        conn.close()
-        
         return render_template('analytics.html', 
-                             total_books=total_books,
-                             enriched_books=enriched_books,
+                             total_books=stats['total_books'],
+                             enriched_books=stats['enriched_books'],
+                             unique_authors=stats['unique_authors'],
+                             avg_year=stats['avg_year'] or 'N/A',
                              visualizations=visualizations)
         
     except Exception as e:
@@ -288,51 +301,87 @@ def analytics():
                              enriched_books=0,
                              visualizations=None)
 
+@app.route('/api/analytics')
+def analytics_api():
+    """Catalog aggregates as JSON for external dashboards"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 1000))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(aggregates.summary(storage.connection(app.config['DATABASE']), limit=limit))
+
+@app.route('/charts/<digest>.png')
+def chart_image(digest):
+    """Cached chart image; the URL changes whenever the image does"""
+    path = chart_cache.path(digest)
+    if path is None:
+        return jsonify({'error': 'Chart not found'}), 404
+    return send_file(path, mimetype='image/png', etag=digest, conditional=True,
+                     max_age=CHART_MAX_AGE)
+
 @app.route('/database')
 def database():
-    """Database view"""
+    """Database view, one keyset-paginated page at a time"""
     try:
-        conn = sqlite3.connect('catalog.db')
-        df = pd.read_sql_query("SELECT * FROM books ORDER BY processing_date DESC", conn)
-        conn.close()
-        
-        records = df.to_dict('records') if not df.empty else []
-        total = len(records)
-        
-        return render_template('database.html', records=records, total=total)
-        
+        conn = storage.connection(app.config['DATABASE'])
+        with metrics.stage('list'):
+            page = storage.list_books(conn,
+                                      after=request.args.get('after'),
+                                      before=request.args.get('before'),
+                                      limit=app.config['PAGE_SIZE'])
+    except ValueError:
+        return redirect(url_for('database'))
     except Exception as e:
         print(f"Database view error: {e}")
-        return render_template('database.html', records=[], total=0)
+        return render_template('database.html', records=[], counts={'books': 0, 'enriched': 0})
+    
+    counts = storage.catalog_counts(conn)
+    if wants_json():
+        return jsonify(dict(page, total=counts['books']))
+    return render_template('database.html', records=page['records'], counts=counts,
+                           next_cursor=page['next'], prev_cursor=page['prev'])
+
+@app.route('/database/<int:book_id>')
+def book_detail(book_id):
+    """Full record of one book, including its OCR text"""
+    book = storage.get_book(storage.connection(app.config['DATABASE']), book_id)
+    if book is None:
+        if wants_json():
+            return jsonify({'error': 'Book not found'}), 404
+        flash('Book not found', 'error')
+        return redirect(url_for('database'))
+    
+    if wants_json():
+        return jsonify(book)
+    return render_template('book.html', book=book)
+
+@app.route('/search')
+def search_catalog():
+    """Ranked full-text search: /search?q=gatsby&page=1&per_page=20"""
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    
+    conn = storage.connection(app.config['DATABASE'])
+    with metrics.stage('search'):
+        results = search.search(conn, request.args.get('q', ''), page=page, per_page=per_page)
+    return jsonify(results)
 
 @app.route('/download/<format>')
 def download_data(format):
-    """Download data in specified format"""
-    try:
-        conn = sqlite3.connect('catalog.db')
-        df = pd.read_sql_query("SELECT * FROM books", conn)
-        conn.close()
-        
-        if format.lower() == 'csv':
-            filename = f'catalog_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            filepath = os.path.join('static/temp_uploads', filename)
-            df.to_csv(filepath, index=False)
-            return send_file(filepath, as_attachment=True, download_name=filename)
-            
-        elif format.lower() == 'json':
-            filename = f'catalog_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-            filepath = os.path.join('static/temp_uploads', filename)
-            df.to_json(filepath, orient='records', indent=2)
-            return send_file(filepath, as_attachment=True, download_name=filename)
-            
-        else:
-            flash('Invalid download format', 'error')
-            return redirect(url_for('database'))
-            
-    except Exception as e:
-        print(f"Download error: {e}")
-        flash('Export failed', 'error')
+    """Stream the catalog as csv, jsonl, json or marcxml"""
+    format = format.lower()
+    if format not in export.FORMATS:
+        flash('Invalid download format', 'error')
         return redirect(url_for('database'))
+    
+    _, mimetype, extension = export.FORMATS[format]
+    filename = f'catalog_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    return Response(stream_with_context(export.stream(app.config['DATABASE'], format)),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @app.route('/health')
 def health_check():
@@ -343,10 +392,42 @@ def health_check():
         'features': {
             'tesseract': TESSERACT_AVAILABLE,
             'pil': PIL_AVAILABLE,
-            'matplotlib': MATPLOTLIB_AVAILABLE
-        }
+            'matplotlib': MATPLOTLIB_AVAILABLE,
+            'barcode': barcode.BARCODE_AVAILABLE,
+            'tesseract_backend': parse_backend(os.environ.get('TESSERACT_BACKEND')) if TESSERACT_AVAILABLE else None
+        },
+        'pipeline': ocr_executor.stats(),
+        'ocr_cache': ocr_cache.stats() if ocr_cache else None,
+        'enrichment': enricher.stats(),
+        'keyword_ranking': keyword_ranker.stats()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request and per-stage counters and latency histograms for Prometheus"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/health/live')
+def health_live():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness probe: database reachable and OCR workers warm (503 until then)"""
+    ocr_workers = 'warm' if ocr_executor.warm or not app.config['WARMUP'] else 'starting'
+    try:
+        storage.connection(app.config['DATABASE']).execute('SELECT 1')
+        database = 'ok'
+    except Exception as e:
+        database = str(e)
+    ready = database == 'ok' and ocr_workers == 'warm'
+    return jsonify({
+        'status': 'ready' if ready else 'starting',
+        'ocr_workers': ocr_workers,
+        'database': database
+    }), 200 if ready else 503
+
 if __name__ == '__main__':
     print("🚀 Starting LIS Book Scanner...")
     
@@ -364,4 +445,6 @@ if __name__ == '__main__':
     print("📱 Mobile-optimized interface ready!")
     print("🔗 Access at: http://localhost:5000")
     
+    if is_running_from_reloader():
+        start_background()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+LIS Book Scanner - Author detection with spaCy NER
+Only PERSON entities are needed, so the pipeline keeps just the entity
+recognizer (the tagger, parser, lemmatizer etc. are never loaded), and it
+reads only the short lines where a name can appear - bylines and
+capitalised lines near the top of the page - rather than the whole OCR
+text. Many documents go through nlp.pipe() in batches, optionally over
+several processes.
+"""
+
+import re
+
+DEFAULT_MODEL = 'en_core_web_sm'
+
+# Documents per nlp.pipe() batch
+DEFAULT_BATCH_SIZE = 64
+
+# Lines of a document passed to NER
+MAX_LINES = 12
+
+# Names on a cover or title page are short lines
+MAX_LINE_LENGTH = 80
+
+BYLINE = re.compile(r'^\s*(?:by|edited by|written by|translated by)\b', re.IGNORECASE)
+CAPITALISED = re.compile(r"\b[A-Z][A-Za-z'-]+\b")
+
+
+def load_ner(model=DEFAULT_MODEL):
+    """spaCy pipeline with only the components PERSON detection needs"""
+    import spacy
+    nlp = spacy.load(model, exclude=['tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter',
+                                     'morphologizer'])
+    # In the packaged small models NER has its own embedding layer, so the
+    # shared tok2vec would only feed the components just excluded
+    if 'tok2vec' in nlp.pipe_names and 'ner' not in nlp.get_pipe('tok2vec').listening_components:
+        nlp.remove_pipe('tok2vec')
+    return nlp
+
+
+def candidate_lines(text, max_lines=MAX_LINES):
+    """The lines of an OCR text worth running NER on, joined one per line
+
+    Bylines come first, then short lines with two or more capitalised
+    words, in page order.
+    """
+    bylines, named = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or len(line) > MAX_LINE_LENGTH:
+            continue
+        if BYLINE.match(line):
+            bylines.append(line)
+        elif len(CAPITALISED.findall(line)) >= 2:
+            named.append(line)
+    return '\n'.join((bylines + named)[:max_lines])
+
+
+def first_person(doc):
+    """Text of the first PERSON entity of a spaCy doc, or None"""
+    for ent in doc.ents:
+        if ent.label_ == 'PERSON':
+            return ent.text
+    return None
+
+
+def find_authors(nlp, texts, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """First PERSON named in each OCR text (None where there is none)
+
+    n_process > 1 spreads the batches over worker processes, which only
+    pays off for hundreds of documents.
+    """
+    snippets = [candidate_lines(text) for text in texts]
+    authors = [None] * len(texts)
+    todo = [i for i, snippet in enumerate(snippets) if snippet]
+    docs = nlp.pipe((snippets[i] for i in todo), batch_size=batch_size, n_process=n_process)
+    for i, doc in zip(todo, docs):
+        authors[i] = first_person(doc)
+    return authors
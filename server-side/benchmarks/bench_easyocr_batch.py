@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: EasyOCR throughput, per-image readtext vs batched line recognition
+
+Detects the text lines of each preprocessed sample with the gradient region
+detector and re-reads them with EasyOCR the way the OCR cascade escalates
+unsure lines: first with one readtext() call per crop (the recognizer sees
+one box at a time on CPU), then as batched recognition over the crops of
+--images images at a time for each batch size. Reports images/min and how
+often the batched readings match the per-crop ones.
+
+    python benchmarks/bench_easyocr_batch.py
+    python benchmarks/bench_easyocr_batch.py --batch-sizes 1,8,32 --images 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import regions  # noqa: E402
+from easyocr_batch import can_batch, recognize_crops  # noqa: E402
+from preprocess import Preprocessor, parse_stages  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'ml-research', 'samples')
+
+
+def line_crops(image, limit):
+    """Crops of up to `limit` detected text lines of a PIL image"""
+    found = regions.find_regions(image, regions.DEFAULT_METHOD) or []
+    array = np.asarray(image)
+    return [array[y:y + h, x:x + w] for x, y, w, h in (r.box for r in found[:limit])]
+
+
+def per_crop(reader, crops_per_image):
+    start = time.perf_counter()
+    texts = []
+    for crops in crops_per_image:
+        for crop in crops:
+            texts.append(' '.join(text for _, text, _ in reader.readtext(crop, detail=1)).strip())
+    return time.perf_counter() - start, texts
+
+
+def batched(reader, crops_per_image, batch_size, images_per_job):
+    start = time.perf_counter()
+    texts = []
+    for first in range(0, len(crops_per_image), images_per_job):
+        crops = [crop for crops in crops_per_image[first:first + images_per_job] for crop in crops]
+        texts += [reading[0] if reading else '' for reading in recognize_crops(reader, crops, batch_size)]
+    return time.perf_counter() - start, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--samples', default=SAMPLES)
+    parser.add_argument('--preprocess', default='normalize,threshold')
+    parser.add_argument('--batch-sizes', default='1,4,8,16,32')
+    parser.add_argument('--images', type=int, default=4, help='images whose lines are batched together')
+    parser.add_argument('--lines', type=int, default=40, help='lines re-read per image')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    try:
+        import easyocr
+    except ImportError:
+        sys.exit("EasyOCR is not installed")
+    paths = sorted(p for p in glob.glob(os.path.join(args.samples, '*'))
+                   if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not paths:
+        sys.exit(f"No images found in {args.samples}")
+
+    reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+    if not can_batch(reader):
+        sys.exit("This EasyOCR version does not expose its recognizer; batching would fall back to readtext")
+    preprocessor = Preprocessor(stages=parse_stages(args.preprocess))
+    crops_per_image = [line_crops(preprocessor.run(p)[0], args.lines) for p in paths]
+    images, lines = len(paths), sum(len(crops) for crops in crops_per_image)
+
+    seconds, reference = per_crop(reader, crops_per_image)
+    rows = [{'mode': 'readtext per crop', 'batch_size': 1, 'seconds': round(seconds, 2),
+             'images_per_min': round(images / seconds * 60, 1), 'same_text': 1.0}]
+    for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+        seconds, texts = batched(reader, crops_per_image, batch_size, args.images)
+        rows.append({'mode': 'batched', 'batch_size': batch_size, 'seconds': round(seconds, 2),
+                     'images_per_min': round(images / seconds * 60, 1),
+                     'same_text': round(sum(a == b for a, b in zip(reference, texts)) / max(lines, 1), 3)})
+
+    if args.json:
+        print(json.dumps({'images': images, 'lines': lines, 'images_per_job': args.images, 'runs': rows},
+                         indent=2))
+        return
+    print(f"{images} images, {lines} lines, lines of {args.images} images per batched job")
+    for row in rows:
+        print(f"  {row['mode']:<18} batch {row['batch_size']:>3}   {row['seconds']:>7.2f} s   "
+              f"{row['images_per_min']:>7.1f} images/min   same text {row['same_text']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
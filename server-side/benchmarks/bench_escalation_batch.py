@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cascade images/min with ingest workers escalating alone vs batched
+
+app.py's ingest workers OCR one image each through Cascade.run(). Alone,
+every worker sends its unsure lines to EasyOCR on its own; batched, the
+escalations of images being OCRed at the same time are re-read in shared
+recognizer passes, optionally after waiting OCR_BATCH_WINDOW_MS for more. Tesseract and the
+recognizer are modelled by sleeps (--tesseract-ms per image, --pass-ms per
+recognizer pass plus --crop-ms per line, one pass at a time as on a CPU),
+so the run needs neither engine and measures the batching itself.
+
+    python benchmarks/bench_escalation_batch.py
+    python benchmarks/bench_escalation_batch.py --workers 4 --windows 0,20,50
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cascade  # noqa: E402
+from cascade import Cascade  # noqa: E402
+
+
+class ModelTesseract:
+    """First pass finding `lines` lines, half of them unsure"""
+
+    name = 'model'
+    version = '0'
+
+    def __init__(self, seconds, lines):
+        self.seconds = seconds
+        self.lines = lines
+
+    def image_to_data(self, image, config=''):
+        time.sleep(self.seconds)
+        return {'text': [f'word{i}' for i in range(self.lines)],
+                'conf': [90 if i % 2 else 30 for i in range(self.lines)],
+                'left': [10] * self.lines, 'top': [10 + 30 * i for i in range(self.lines)],
+                'width': [100] * self.lines, 'height': [20] * self.lines}
+
+
+def model_recognizer(pass_seconds, crop_seconds):
+    """recognize_crops stand-in costing one pass per batch plus a share per crop
+
+    The recognizer uses every core on CPU, so passes from different threads
+    run one after another.
+    """
+    busy = threading.Lock()
+
+    def recognize(reader, crops, batch_size=cascade.DEFAULT_BATCH_SIZE):
+        passes = -(-len(crops) // batch_size)
+        with busy:
+            time.sleep(passes * pass_seconds + len(crops) * crop_seconds)
+        return [('reread', 0.95)] * len(crops)
+    return recognize
+
+
+def run(workers, images, batched, window, args):
+    tesseract = ModelTesseract(args.tesseract_ms / 1000, args.lines)
+    ocr = Cascade(tesseract, lambda: object(), batch_size=args.batch_size,
+                  batch_images=workers if batched else 1, batch_window=window / 1000)
+    image = np.zeros((40 + 30 * args.lines, 200), np.uint8)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        reports = [report for _, report in pool.map(lambda _: ocr.run(image), range(images))]
+    seconds = time.perf_counter() - start
+    batches = [step['batch'] for report in reports for step in report['engines'][1:]]
+    return {'workers': workers, 'batched': batched, 'window_ms': window, 'seconds': round(seconds, 2),
+            'images_per_min': round(images / seconds * 60, 1),
+            'mean_ms': round(sum(report['ms'] for report in reports) / len(reports), 1),
+            'mean_batch': round(sum(batches) / len(batches), 1) if batches else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--images', type=int, default=64)
+    parser.add_argument('--workers', default='2,4', help='comma-separated ingest worker counts')
+    parser.add_argument('--windows', default='0,50',
+                        help='comma-separated OCR_BATCH_WINDOW_MS values to batch with')
+    parser.add_argument('--lines', type=int, default=8, help='lines per image, half of them unsure')
+    parser.add_argument('--batch-size', type=int, default=cascade.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--tesseract-ms', type=float, default=150)
+    parser.add_argument('--pass-ms', type=float, default=120, help='fixed cost of a recognizer pass')
+    parser.add_argument('--crop-ms', type=float, default=10, help='added cost per line in a pass')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    cascade.recognize_crops = model_recognizer(args.pass_ms / 1000, args.crop_ms / 1000)
+    rows = []
+    for workers in (int(n) for n in args.workers.split(',')):
+        rows.append(run(workers, args.images, False, 0, args))
+        rows += [run(workers, args.images, True, window, args)
+                 for window in (float(ms) for ms in args.windows.split(','))]
+
+    if args.json:
+        print(json.dumps({'images': args.images, 'runs': rows}, indent=2))
+        return
+    print(f"{args.images} images, {args.lines} lines each, recognizer {args.pass_ms:g} ms/pass "
+          f"+ {args.crop_ms:g} ms/line")
+    for row in rows:
+        setup = f"batched, window {row['window_ms']:g} ms" if row['batched'] else 'each image alone'
+        print(f"  {row['workers']} workers, {setup:<22} {row['seconds']:>6.2f} s  "
+              f"{row['images_per_min']:>7.1f} images/min  {row['mean_ms']:>7.1f} ms/image  "
+              f"{row['mean_batch']:>4.1f} lines/pass")
+
+
+if __name__ == '__main__':
+    main()
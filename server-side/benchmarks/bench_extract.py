@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: metadata extraction records/sec, multi-pass vs single-pass
+
+Generates a synthetic OCR corpus (cover/title-page text with a byline,
+copyright year, ISBN, publisher and a few paragraphs) and times the
+previous extractor - one walk over the lines per field, regexes compiled
+on the fly and the stopword set rebuilt per call - against
+metadata.extract_many(). Also checks both return the same title, author,
+year, ISBN and publisher (keyword order used to depend on set iteration).
+
+    python benchmarks/bench_extract.py --records 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metadata  # noqa: E402
+
+WORDS = ('library catalog history science novel poetry river garden war peace the and with from '
+         'mathematics chemistry ocean mountain journey letters empire music which their other '
+         'philosophy economics children stories introduction handbook').split()
+
+PUBLISHERS = ['Penguin Books', 'Oxford University Press', 'Scribner Publishing', 'Vintage', 'Harper & Row']
+
+FIELDS = ('title', 'author', 'year', 'isbn', 'publisher')
+
+
+def synthetic_corpus(count, seed=1):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        paragraphs = '\n'.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 12)))
+                               for _ in range(rng.randint(3, 15)))
+        texts.append('\n'.join([
+            ' '.join(rng.choice(WORDS) for _ in range(3)).title(),
+            f"By {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            paragraphs,
+            f"Copyright {rng.randint(1900, 2024)}",
+            f"ISBN 978-{rng.randint(0, 9)}-{rng.randint(100, 999)}-{rng.randint(10000, 99999)}-{rng.randint(0, 9)}",
+            rng.choice(PUBLISHERS),
+        ]))
+    return texts
+
+
+def legacy_extract_metadata(text, filename):
+    """The extractor as it was before the single-pass rewrite"""
+    metadata = {'title': 'Unknown Title', 'author': 'Unknown Author', 'year': None, 'isbn': None,
+                'publisher': 'Unknown Publisher', 'keywords': ''}
+    if not text:
+        return metadata
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    for line in lines:
+        if len(line) > 3 and not line.lower().startswith(('by', 'copyright', 'isbn', 'published')):
+            metadata['title'] = line
+            break
+    for line in lines:
+        if line.lower().startswith('by '):
+            metadata['author'] = line[3:].strip()
+            break
+    year_match = re.search(r'\b(19|20)\d{2}\b', text)
+    if year_match:
+        metadata['year'] = int(year_match.group())
+    isbn_match = re.search(r'ISBN[\s:-]*(\d{1,5}[-\s]?\d{1,7}[-\s]?\d{1,7}[-\s]?[\dX])', text, re.IGNORECASE)
+    if isbn_match:
+        metadata['isbn'] = isbn_match.group(1).replace(' ', '').replace('-', '')
+    for line in lines:
+        if any(word in line.lower() for word in ['publisher', 'publishing', 'press', 'books']):
+            metadata['publisher'] = line.strip()
+            break
+    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
+    common_words = {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one',
+                    'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'new', 'now', 'old', 'see',
+                    'two', 'way', 'who', 'boy', 'did', 'man', 'may', 'she', 'use', 'your', 'been', 'from',
+                    'have', 'they', 'know', 'want', 'were', 'what', 'when', 'with', 'would', 'make', 'time',
+                    'very', 'will', 'into', 'said', 'each', 'which', 'their', 'called', 'other', 'many',
+                    'after', 'first', 'well', 'water'}
+    keywords = [word for word in set(words) if word not in common_words and len(word) > 4]
+    metadata['keywords'] = ', '.join(keywords[:10])
+    return metadata
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.records)
+    old, old_seconds = timed(lambda: [legacy_extract_metadata(text, None) for text in texts])
+    new, new_seconds = timed(metadata.extract_many, texts)
+    same = sum(all(a[f] == b[f] for f in FIELDS) for a, b in zip(old, new)) / len(texts)
+
+    result = {
+        'records': len(texts),
+        'legacy_records_per_sec': round(len(texts) / old_seconds),
+        'single_pass_records_per_sec': round(len(texts) / new_seconds),
+        'speedup': round(old_seconds / new_seconds, 2),
+        'same_fields': round(same, 4),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['records']} records")
+    print(f"  multi-pass   {result['legacy_records_per_sec']:>9} records/s")
+    print(f"  single-pass  {result['single_pass_records_per_sec']:>9} records/s   "
+          f"x{result['speedup']}   same fields {same:.2%}")
+
+
+if __name__ == '__main__':
+    main()
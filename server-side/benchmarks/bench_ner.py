@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: author detection docs/sec, full spaCy pipeline vs trimmed NER
+
+The old path runs the whole en_core_web_sm pipeline over up to 100k
+characters of each OCR text, one document at a time. The new path loads
+only the NER component, reads only the candidate name lines and batches
+documents through nlp.pipe(), optionally over several processes. Texts are
+the OCR text of a catalog database (--db) or synthetic pages; the report
+includes how often both paths name the same author.
+
+    python benchmarks/bench_ner.py --docs 500
+    python benchmarks/bench_ner.py --db catalog.db --processes 1,2
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import authors  # noqa: E402
+
+NAMES = ['Herman Melville', 'Toni Morrison', 'Chinua Achebe', 'Virginia Woolf', 'Gabriel Garcia Marquez',
+         'Ursula K. Le Guin', 'James Baldwin', 'Jane Austen', 'Haruki Murakami', 'Zadie Smith']
+
+FILLER = ('the of library history and a river in garden war peace to science was with journey '
+          'letters empire music for stories children ocean mountain introduction').split()
+
+
+def synthetic_texts(count, seed=1):
+    """OCR-like pages: a title, a byline, a publisher line and a few paragraphs"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        body = '\n'.join(' '.join(rng.choice(FILLER) for _ in range(rng.randint(8, 14)))
+                         for _ in range(rng.randint(20, 60)))
+        texts.append(f"{' '.join(rng.choice(FILLER) for _ in range(3)).title()}\n"
+                     f"by {rng.choice(NAMES)}\n{body}\nPenguin Books London {rng.randint(1950, 2023)}")
+    return texts
+
+
+def catalog_texts(db_path, count):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT ocr_text FROM books WHERE ocr_text != '' LIMIT ?", (count,)).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def old_path(nlp, texts):
+    found = []
+    for text in texts:
+        doc = nlp(text[:100000])
+        persons = [ent.text for ent in doc.ents if ent.label_ == "PERSON"]
+        found.append(persons[0] if persons else None)
+    return found
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--docs', type=int, default=300)
+    parser.add_argument('--db', help='catalog database whose OCR text to use')
+    parser.add_argument('--batch-size', type=int, default=authors.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--processes', default='1,2', help='comma-separated nlp.pipe n_process values')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    try:
+        import spacy
+        full = spacy.load(authors.DEFAULT_MODEL)
+        trimmed = authors.load_ner()
+    except (ImportError, OSError) as e:
+        sys.exit(f"spaCy or {authors.DEFAULT_MODEL} is not installed: {e}")
+    texts = catalog_texts(args.db, args.docs) if args.db else synthetic_texts(args.docs)
+    if not texts:
+        sys.exit("No OCR text found")
+
+    reference, seconds = timed(old_path, full, texts)
+    rows = [{'path': 'full pipeline, per doc', 'pipes': full.pipe_names, 'processes': 1,
+             'seconds': round(seconds, 2), 'docs_per_sec': round(len(texts) / seconds, 1), 'same_author': 1.0}]
+    for processes in (int(n) for n in args.processes.split(',')):
+        found, seconds = timed(authors.find_authors, trimmed, texts, batch_size=args.batch_size,
+                               n_process=processes)
+        rows.append({'path': 'NER only, name lines, nlp.pipe', 'pipes': trimmed.pipe_names,
+                     'processes': processes, 'seconds': round(seconds, 2),
+                     'docs_per_sec': round(len(texts) / seconds, 1),
+                     'same_author': round(sum(a == b for a, b in zip(reference, found)) / len(texts), 3)})
+
+    if args.json:
+        print(json.dumps({'docs': len(texts), 'batch_size': args.batch_size, 'runs': rows}, indent=2))
+        return
+    print(f"{len(texts)} documents, batch size {args.batch_size}")
+    for row in rows:
+        print(f"  {row['path']:<32} x{row['processes']}  {row['seconds']:>7.2f} s  "
+              f"{row['docs_per_sec']:>8.1f} docs/s  same author {row['same_author']:.0%}  "
+              f"[{', '.join(row['pipes'])}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batch OCR throughput with 1..N worker processes
+
+Runs the per-image pipeline over ml-research/samples (repeated to make a
+batch) and prints images/sec and speedup for each worker count.
+
+    python benchmarks/bench_parallel_ocr.py --max-workers 8 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pipeline import PipelineExecutor, TESSERACT_AVAILABLE, default_workers  # noqa: E402
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'ml-research', 'samples')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_batch(samples_dir, repeat):
+    files = sorted(f for f in os.listdir(samples_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    items = [(os.path.join(samples_dir, f), f) for f in files]
+    return items * repeat
+
+
+def run(items, workers, mode, ocr_threads):
+    with PipelineExecutor(workers=workers, mode=mode, ocr_threads=ocr_threads) as executor:
+        # Warm the pool so process start-up isn't counted
+        executor.map(items[:workers])
+        start = time.perf_counter()
+        results = executor.map(items)
+        elapsed = time.perf_counter() - start
+    assert [r['filename'] for r in results] == [name for _, name in items], "Results out of order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--samples', default=SAMPLES_DIR)
+    parser.add_argument('--repeat', type=int, default=2, help='copies of the sample set per batch')
+    parser.add_argument('--max-workers', type=int, default=default_workers())
+    parser.add_argument('--mode', default='process', choices=['process', 'thread'])
+    parser.add_argument('--ocr-threads', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    items = load_batch(args.samples, args.repeat)
+    if not TESSERACT_AVAILABLE:
+        print("⚠️ pytesseract not installed - timings cover simulated OCR only", file=sys.stderr)
+
+    counts = sorted({1, args.max_workers} | {2 ** i for i in range(8) if 2 ** i < args.max_workers})
+    rows = []
+    baseline = None
+    for workers in counts:
+        elapsed = run(items, workers, args.mode, args.ocr_threads)
+        baseline = baseline or elapsed
+        rows.append({
+            'workers': workers,
+            'images': len(items),
+            'seconds': round(elapsed, 3),
+            'images_per_sec': round(len(items) / elapsed, 2),
+            'speedup': round(baseline / elapsed, 2),
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'workers':>8} {'images':>7} {'seconds':>8} {'img/s':>8} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['images']:>7} {row['seconds']:>8} "
+              f"{row['images_per_sec']:>8} {row['speedup']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full per-image pipeline latency, throughput, memory and accuracy
+
+Runs pipeline.process_image() - barcode scan, preprocessing, text regions,
+Tesseract and metadata extraction, as configured by the OCR_* variables or
+the flags below - over ml-research/samples plus rendered title-page
+fixtures, one image at a time. Reports p50/p95 milliseconds per stage and
+for the whole image, images/sec, the peak RSS of the process, and per-field
+accuracy against the ground truth CSV (empty cells are not scored; the
+fixtures carry their own). Every run is written to --output-dir as JSON so
+runs can be compared; --baseline prints the change from an earlier one.
+
+    python benchmarks/bench_pipeline.py --repeat 3
+    python benchmarks/bench_pipeline.py --baseline benchmarks/results/pipeline-20240101-120000-abc1234.json
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pipeline  # noqa: E402
+
+HERE = os.path.dirname(__file__)
+SAMPLES_DIR = os.path.join(HERE, '..', '..', 'ml-research', 'samples')
+GROUND_TRUTH = os.path.join(HERE, '..', '..', 'ml-research', 'ground_truth_template.csv')
+RESULTS_DIR = os.path.join(HERE, 'results')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+FIELDS = ('title', 'author', 'year', 'isbn', 'publisher')
+
+TITLES = ['The Silent River', 'A History of Libraries', 'Gardens of the North', 'Letters from the Coast',
+          'The Clockmaker', 'Principles of Cataloging', 'Winter in the Mountains', 'The Paper Empire']
+AUTHORS = ['Margaret Ellison', 'Thomas Okafor', 'Lena Hartmann', 'David Morales', 'Priya Raman', 'John Whitfield']
+PUBLISHERS = ['Penguin Books', 'Oxford University Press', 'Harbor Publishing', 'Riverside Press']
+
+
+def load_images(samples_dir):
+    if not os.path.isdir(samples_dir):
+        return []
+    files = sorted(f for f in os.listdir(samples_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return [(os.path.join(samples_dir, f), f) for f in files]
+
+
+def load_ground_truth(path):
+    """{filename: {field: expected value}} for the fields filled in"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['filename']: {field: row[field] for field in FIELDS if (row.get(field) or '').strip()}
+                for row in csv.DictReader(f) if row.get('filename')}
+
+
+def isbn13(rng):
+    digits = [9, 7, 8] + [rng.randint(0, 9) for _ in range(9)]
+    check = (10 - sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    d = ''.join(map(str, digits + [check]))
+    return f'{d[:3]}-{d[3]}-{d[4:7]}-{d[7:12]}-{d[12]}'
+
+
+def render_fixtures(count, directory, seed=1):
+    """Clean title pages with every field printed; returns (items, truth)"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    def font(size):
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:  # Pillow < 10.1 has one bitmap size
+            return ImageFont.load_default()
+
+    rng = random.Random(seed)
+    items, truth = [], {}
+    for n in range(1, count + 1):
+        fields = {'title': rng.choice(TITLES), 'author': rng.choice(AUTHORS), 'year': str(rng.randint(1950, 2023)),
+                  'isbn': isbn13(rng), 'publisher': rng.choice(PUBLISHERS)}
+        lines = [(fields['title'], 56), (f"By {fields['author']}", 40), (f"Copyright {fields['year']}", 32),
+                 (f"ISBN {fields['isbn']}", 32), (fields['publisher'], 32)]
+        image = Image.new('L', (1200, 1700), 255)
+        draw = ImageDraw.Draw(image)
+        y = 150
+        for text, size in lines:
+            draw.text((120, y), text, fill=0, font=font(size))
+            y += size * 3
+        filename = f'fixture_{n:03d}.png'
+        image.save(os.path.join(directory, filename))
+        items.append((os.path.join(directory, filename), filename))
+        truth[filename] = fields
+    return items, truth
+
+
+def normalise(field, value):
+    """Comparable form of a field: ISBN digits, the year, or folded words"""
+    if value is None:
+        return ''
+    value = str(value)
+    if field == 'isbn':
+        return re.sub(r'[^0-9X]', '', value.upper())
+    if field == 'year':
+        return value.strip()
+    return ' '.join(re.findall(r'\w+', value.casefold()))
+
+
+def score(results, truth):
+    """Per-field {'labelled', 'correct', 'accuracy'} over the labelled images"""
+    fields = {field: {'labelled': 0, 'correct': 0} for field in FIELDS}
+    for result in results:
+        expected = truth.get(result['filename'], {})
+        for field, value in expected.items():
+            fields[field]['labelled'] += 1
+            fields[field]['correct'] += normalise(field, result['metadata'].get(field)) == normalise(field, value)
+    for counts in fields.values():
+        counts['accuracy'] = round(counts['correct'] / counts['labelled'], 3) if counts['labelled'] else None
+    return fields
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+    return round((peak if sys.platform == 'darwin' else peak * 1024) / 2 ** 20, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(items, repeat):
+    """(results of the last pass, {stage: [ms, ...]}, wall seconds)"""
+    stage_ms = {}
+    seconds = 0.0
+    for _ in range(repeat):
+        results = []
+        for filepath, filename in items:
+            start = time.perf_counter()
+            result = pipeline.process_image(filepath, filename)
+            elapsed = time.perf_counter() - start
+            seconds += elapsed
+            for stage, ms in result['timings'].items():
+                stage_ms.setdefault(stage, []).append(ms)
+            stage_ms.setdefault('total', []).append(elapsed * 1000)
+            results.append(result)
+    return results, stage_ms, seconds
+
+
+def report(items, truth, repeat, args):
+    pipeline.warm_worker()
+    # One untimed pass so lazy imports and first-call setup are not counted
+    pipeline.process_image(*items[0])
+    results, stage_ms, seconds = run(items, repeat)
+
+    sources = {}
+    for result in results:
+        sources[result['ocr_source']] = sources.get(result['ocr_source'], 0) + 1
+    accuracy = score(results, truth)
+    labelled = sum(counts['labelled'] for counts in accuracy.values())
+    return {
+        'run': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'tesseract': pipeline.TESSERACT_AVAILABLE,
+            'ocr_config': pipeline.ocr_config() if pipeline.PIL_AVAILABLE else None,
+            'barcode': args.barcode or os.environ.get('OCR_BARCODE', 'default'),
+        },
+        'images': len(items),
+        'repeat': repeat,
+        'images_per_sec': round(len(items) * repeat / seconds, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'ocr_sources': sources,
+        'stages': {stage: {'runs': len(values), 'mean_ms': round(sum(values) / len(values), 1),
+                           'p50_ms': round(percentile(values, 0.5), 1), 'p95_ms': round(percentile(values, 0.95), 1)}
+                   for stage, values in stage_ms.items()},
+        'accuracy': accuracy,
+        'overall_accuracy': round(sum(counts['correct'] for counts in accuracy.values()) / labelled, 3)
+        if labelled else None,
+    }
+
+
+def compare(result, baseline):
+    """Lines describing the change from a previous run"""
+    lines = [f"vs {baseline['run'].get('commit')} ({baseline['run'].get('timestamp')})",
+             f"  images/sec  {baseline['images_per_sec']:>8} -> {result['images_per_sec']:<8}",
+             f"  peak RSS    {baseline['peak_rss_mb']:>8} -> {result['peak_rss_mb']:<8} MB"]
+    for stage, row in result['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before:
+            lines.append(f"  {stage:<10}  p50 {before['p50_ms']:>8} -> {row['p50_ms']:<8}  "
+                         f"p95 {before['p95_ms']:>8} -> {row['p95_ms']:<8} ms")
+    for field, row in result['accuracy'].items():
+        before = baseline['accuracy'].get(field, {}).get('accuracy')
+        if row['accuracy'] is not None and before is not None:
+            lines.append(f"  {field:<10}  accuracy {before:.1%} -> {row['accuracy']:.1%}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--samples', default=SAMPLES_DIR)
+    parser.add_argument('--ground-truth', default=GROUND_TRUTH, help='CSV with filename and field columns')
+    parser.add_argument('--fixtures', type=int, default=10, help='rendered title pages to add (0 for none)')
+    parser.add_argument('--repeat', type=int, default=1, help='timed passes over the images')
+    parser.add_argument('--preprocess', help='preprocessing stages (default: OCR_PREPROCESS)')
+    parser.add_argument('--regions', help='text-region method or off (default: OCR_REGIONS)')
+    parser.add_argument('--barcode', help='off, hint or skip (default: OCR_BARCODE)')
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help="where to write the run's JSON ('' to skip)")
+    parser.add_argument('--baseline', help='JSON of an earlier run to compare with')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    pipeline.limit_native_threads(1)
+    if args.preprocess:
+        pipeline.configure_preprocessing(args.preprocess)
+    if args.regions:
+        pipeline.configure_regions(args.regions)
+    if args.barcode:
+        pipeline.configure_barcode(args.barcode)
+    if not pipeline.TESSERACT_AVAILABLE:
+        print("⚠️ pytesseract not installed - OCR is simulated, so accuracy is meaningless", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        items = load_images(args.samples)
+        truth = load_ground_truth(args.ground_truth)
+        fixture_items, fixture_truth = render_fixtures(args.fixtures, fixtures_dir)
+        items += fixture_items
+        truth.update(fixture_truth)
+        if not items:
+            sys.exit(f"No images found in {args.samples} and no fixtures requested")
+        result = report(items, truth, args.repeat, args)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(args.output_dir, f"pipeline-{stamp}-{result['run']['commit'] or 'local'}.json")
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {path}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['images']} images x {result['repeat']}   {result['images_per_sec']} images/s   "
+          f"peak RSS {result['peak_rss_mb']} MB   OCR {result['ocr_sources']}")
+    print(f"  {'stage':<10} {'runs':>5} {'mean':>9} {'p50':>9} {'p95':>9}  ms")
+    for stage, row in result['stages'].items():
+        print(f"  {stage:<10} {row['runs']:>5} {row['mean_ms']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9}")
+    for field, row in result['accuracy'].items():
+        if row['accuracy'] is not None:
+            print(f"  {field:<10} {row['correct']:>3}/{row['labelled']:<3} {row['accuracy']:.1%}")
+    if result['overall_accuracy'] is not None:
+        print(f"  {'overall':<10} {result['overall_accuracy']:.1%}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            print('\n'.join(compare(result, json.load(f))))
+
+
+if __name__ == '__main__':
+    main()
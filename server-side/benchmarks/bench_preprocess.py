@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: preprocessing stage choices, speed and OCR quality
+
+Runs each preset of stages over the images in ml-research/samples and
+reports the mean time per stage. When Tesseract is installed it also OCRs
+the result and reports OCR time, mean word confidence and, given a ground
+truth CSV (filename,text), the share of ground-truth words recognised.
+
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --presets none,normalize "denoise,threshold"
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from preprocess import Preprocessor, parse_stages  # noqa: E402
+
+try:
+    import pytesseract
+    pytesseract.get_tesseract_version()
+    TESSERACT_AVAILABLE = True
+except Exception:
+    TESSERACT_AVAILABLE = False
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'ml-research', 'samples')
+
+PRESETS = [
+    'none',
+    'normalize',
+    'normalize,threshold',
+    'normalize,deskew,threshold',
+    'normalize,denoise,threshold',
+    'denoise,threshold',  # the original full-resolution path
+]
+
+
+def load_ground_truth(path):
+    if not path:
+        return {}
+    with open(path, newline='') as f:
+        return {row['filename']: row['text'] for row in csv.DictReader(f) if row.get('text')}
+
+
+def words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def ocr_quality(image, truth):
+    """(seconds, mean word confidence, word recall or None)"""
+    start = time.perf_counter()
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    elapsed = time.perf_counter() - start
+    confidences = [float(c) for c, w in zip(data['conf'], data['text']) if w.strip() and float(c) >= 0]
+    recall = None
+    if truth is not None:
+        expected = words(truth)
+        found = set(words(' '.join(data['text'])))
+        recall = sum(1 for w in expected if w in found) / len(expected) if expected else None
+    return elapsed, statistics.mean(confidences) if confidences else 0.0, recall
+
+
+def run_preset(spec, images, truth, target_dpi, ocr):
+    preprocessor = Preprocessor(stages=parse_stages(spec), target_dpi=target_dpi)
+    stage_times = {}
+    ocr_times, confidences, recalls = [], [], []
+    for path in images:
+        image, timings = preprocessor.run(path)
+        for stage, seconds in timings.items():
+            stage_times.setdefault(stage, []).append(seconds * 1000)
+        if ocr:
+            seconds, confidence, recall = ocr_quality(image, truth.get(os.path.basename(path)))
+            ocr_times.append(seconds * 1000)
+            confidences.append(confidence)
+            if recall is not None:
+                recalls.append(recall)
+
+    row = {
+        'preset': spec,
+        'signature': preprocessor.signature,
+        'stage_ms': {stage: round(statistics.mean(ms), 1) for stage, ms in stage_times.items()},
+    }
+    row['preprocess_ms'] = round(sum(row['stage_ms'].values()), 1)
+    if ocr:
+        row['ocr_ms'] = round(statistics.mean(ocr_times), 1)
+        row['mean_confidence'] = round(statistics.mean(confidences), 1)
+        row['word_recall'] = round(statistics.mean(recalls), 3) if recalls else None
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--presets', nargs='+', help='comma-separated stage lists (default: all presets)')
+    parser.add_argument('--samples', default=SAMPLES)
+    parser.add_argument('--target-dpi', type=int, default=300)
+    parser.add_argument('--ground-truth', help='CSV with filename,text columns')
+    parser.add_argument('--no-ocr', action='store_true', help='time preprocessing only')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    images = sorted(p for p in glob.glob(os.path.join(args.samples, '*'))
+                    if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not images:
+        sys.exit(f"No images found in {args.samples}")
+    ocr = TESSERACT_AVAILABLE and not args.no_ocr
+    truth = load_ground_truth(args.ground_truth)
+
+    rows = [run_preset(spec, images, truth, args.target_dpi, ocr) for spec in (args.presets or PRESETS)]
+
+    if args.json:
+        print(json.dumps({'images': len(images), 'ocr': ocr, 'presets': rows}, indent=2))
+        return
+    print(f"{len(images)} images, target {args.target_dpi} DPI"
+          + ("" if ocr else " (Tesseract not available: timing preprocessing only)"))
+    for row in rows:
+        stages = ', '.join(f'{stage} {ms:.0f}' for stage, ms in row['stage_ms'].items())
+        line = f"  {row['preset']:<30} {row['preprocess_ms']:>9.0f} ms  [{stages}]"
+        if ocr:
+            line += f"  ocr {row['ocr_ms']:.0f} ms  conf {row['mean_confidence']:.1f}"
+            if row['word_recall'] is not None:
+                line += f"  recall {row['word_recall']:.1%}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
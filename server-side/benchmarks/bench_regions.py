@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: text-region detection, pixels kept and OCR time saved
+
+Preprocesses each image in ml-research/samples, detects its text regions
+with every method and reports detection time, region count and the share of
+pixels left for OCR. When Tesseract is installed it also times whole-image
+OCR against one call over the region montage and, given a ground truth CSV
+(filename,text), the share of ground-truth words each recognises.
+
+    python benchmarks/bench_regions.py
+    python benchmarks/bench_regions.py --methods gradient --preprocess normalize,threshold
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import regions  # noqa: E402
+from preprocess import Preprocessor, parse_stages  # noqa: E402
+
+try:
+    import pytesseract
+    pytesseract.get_tesseract_version()
+    TESSERACT_AVAILABLE = True
+except Exception:
+    TESSERACT_AVAILABLE = False
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'ml-research', 'samples')
+
+
+def load_ground_truth(path):
+    if not path:
+        return {}
+    with open(path, newline='') as f:
+        return {row['filename']: row['text'] for row in csv.DictReader(f) if row.get('text')}
+
+
+def recall(text, truth):
+    if truth is None:
+        return None
+    expected = re.findall(r'\w+', truth.lower())
+    found = set(re.findall(r'\w+', text.lower()))
+    return sum(1 for w in expected if w in found) / len(expected) if expected else None
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def measure(image, method, truth, ocr):
+    gray = image if image.mode == 'L' else image.convert('L')
+    found, detect_ms = timed(regions.detect_text_regions, np.asarray(gray), method)
+    row = {
+        'detect_ms': detect_ms,
+        'regions': len(found),
+        'coverage': regions.coverage(found, image.size),
+        'fallback': regions.find_regions(image, method) is None,
+    }
+    if ocr:
+        full_text, row['full_ocr_ms'] = timed(pytesseract.image_to_string, image)
+        row['full_recall'] = recall(full_text, truth)
+        if row['fallback']:
+            row['region_ocr_ms'], row['region_recall'] = row['full_ocr_ms'], row['full_recall']
+        else:
+            canvas, bands = regions.montage(image, found)
+            data, row['region_ocr_ms'] = timed(pytesseract.image_to_data, canvas, config='--psm 4',
+                                               output_type=pytesseract.Output.DICT)
+            regions.assign_words(data, found, bands)
+            row['region_recall'] = recall('\n'.join(r.text for r in found), truth)
+    return row
+
+
+def summarise(method, rows, ocr):
+    summary = {
+        'method': method,
+        'detect_ms': round(statistics.mean(r['detect_ms'] for r in rows), 1),
+        'regions': round(statistics.mean(r['regions'] for r in rows), 1),
+        'pixels_kept': round(statistics.mean(1.0 if r['fallback'] else r['coverage'] for r in rows), 3),
+        'fallbacks': sum(r['fallback'] for r in rows),
+    }
+    if ocr:
+        summary['full_ocr_ms'] = round(statistics.mean(r['full_ocr_ms'] for r in rows), 1)
+        summary['region_ocr_ms'] = round(statistics.mean(r['region_ocr_ms'] + r['detect_ms'] for r in rows), 1)
+        for key in ('full_recall', 'region_recall'):
+            values = [r[key] for r in rows if r[key] is not None]
+            summary[key] = round(statistics.mean(values), 3) if values else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--methods', default=','.join(regions.METHODS))
+    parser.add_argument('--preprocess', default='normalize', help='stages applied before detection')
+    parser.add_argument('--samples', default=SAMPLES)
+    parser.add_argument('--ground-truth', help='CSV with filename,text columns')
+    parser.add_argument('--no-ocr', action='store_true', help='time detection only')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    paths = sorted(p for p in glob.glob(os.path.join(args.samples, '*'))
+                   if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not paths:
+        sys.exit(f"No images found in {args.samples}")
+    ocr = TESSERACT_AVAILABLE and not args.no_ocr
+    truth = load_ground_truth(args.ground_truth)
+    preprocessor = Preprocessor(stages=parse_stages(args.preprocess))
+    images = [(os.path.basename(p), preprocessor.run(p)[0]) for p in paths]
+
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    per_image = {m: [dict(measure(image, m, truth.get(name), ocr), image=name) for name, image in images]
+                 for m in methods}
+    summaries = [summarise(m, per_image[m], ocr) for m in methods]
+
+    if args.json:
+        print(json.dumps({'images': len(images), 'ocr': ocr, 'preprocess': args.preprocess,
+                          'methods': summaries, 'per_image': per_image}, indent=2))
+        return
+    print(f"{len(images)} images, preprocess {args.preprocess}"
+          + ("" if ocr else " (Tesseract not available: timing detection only)"))
+    for summary in summaries:
+        line = (f"  {summary['method']:<9} detect {summary['detect_ms']:>6.1f} ms  "
+                f"{summary['regions']:>5.1f} regions  {summary['pixels_kept']:>6.1%} of pixels kept  "
+                f"{summary['fallbacks']} whole-image fallbacks")
+        if ocr:
+            line += f"  ocr {summary['full_ocr_ms']:.0f} -> {summary['region_ocr_ms']:.0f} ms"
+            if summary['full_recall'] is not None:
+                line += f"  recall {summary['full_recall']:.1%} -> {summary['region_recall']:.1%}"
+        print(line)
+        for row in per_image[summary['method']]:
+            print(f"      {row['image']:<16} {row['detect_ms']:>6.1f} ms  {row['regions']:>3} regions  "
+                  f"{row['coverage']:>6.1%}" + ("  (whole image)" if row['fallback'] else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: catalog search latency, FTS5 vs a LIKE scan
+
+Fills a temporary catalog with synthetic records and times the /search
+query for a handful of terms against the equivalent LIKE query.
+
+    python benchmarks/bench_search.py --records 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import search  # noqa: E402
+import storage  # noqa: E402
+
+WORDS = ('library catalog history science novel poetry river garden war peace '
+         'mathematics chemistry ocean mountain journey letters empire music '
+         'philosophy economics children stories introduction handbook').split()
+
+QUERIES = ['gatsby', 'river garden', 'philos', 'economics handbook', 'zzzz']
+
+# Filler vocabulary so each of WORDS appears in a few percent of records
+VOCAB = WORDS + [f'term{n}' for n in range(5000)]
+
+
+def fill(db_path, count, seed=1):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(3)).title()
+        if i % 1000 == 0:
+            title = 'The Great Gatsby'
+        text = ' '.join(rng.choice(VOCAB) for _ in range(300))
+        records.append((f'book_{i}.jpg', {'title': title, 'author': f'Author {i % 500}'}, text))
+    with storage.transaction(db_path) as conn:
+        storage.insert_books(conn, records)
+
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='lis-bench-'), 'search.db')
+    storage.init_database(db_path)
+    fill(db_path, args.records)
+    conn = storage.connection(db_path)
+
+    rows = []
+    for q in QUERIES:
+        fts_ms = time_query(lambda: search.search(conn, q), args.repeat)
+        like_ms = time_query(lambda: search._search_like(
+            conn, q, {'query': q, 'total': 0, 'page': 1, 'per_page': 20, 'results': []}), args.repeat)
+        rows.append({'query': q, 'hits': search.search(conn, q)['total'],
+                     'fts_ms': fts_ms, 'like_ms': like_ms})
+
+    if args.json:
+        print(json.dumps({'records': args.records, 'queries': rows}, indent=2))
+        return
+    print(f"{args.records} records, median of {args.repeat} runs")
+    for row in rows:
+        print(f"  {row['query']!r:22} {row['hits']:>7} hits   "
+              f"FTS5 {row['fts_ms']:>8} ms   LIKE {row['like_ms']:>8} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start of the Flask apps
+
+Imports each app in a fresh interpreter (against a throwaway catalog, with
+background enrichment and model warmup off) and reports the wall time to a
+serving app object, the slowest imports from `python -X importtime`, and any
+heavy library that got imported although nothing has used it yet. With
+--max-seconds it exits non-zero when an app starts slower than that, so a
+regression fails CI.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --apps app_production --repeats 5 --max-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVER_SIDE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Libraries that should only be imported by the first request needing them
+HEAVY_MODULES = ('matplotlib', 'pandas', 'wordcloud', 'easyocr', 'torch', 'spacy', 'nltk', 'tesserocr')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {app}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds,
+                   'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def environment(tmp):
+    env = dict(os.environ, CATALOG_DB=os.path.join(tmp, 'catalog.db'), ENRICHMENT='0', WARMUP='none')
+    env.setdefault('OCR_WORKERS', '1')
+    return env
+
+
+def probe(app, env, importtime=False):
+    """(probe output, stderr) of importing `app` in a new interpreter"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    command += ['-c', PROBE.format(app=app, heavy=HEAVY_MODULES)]
+    proc = subprocess.run(command, cwd=SERVER_SIDE, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {app} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_log, top):
+    """[(module, cumulative ms)] of the top-level imports that took longest"""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only direct imports of the app, not everything they pull in
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((name.strip(), round(int(cumulative) / 1000, 1)))
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def bench(app, repeats, top):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = environment(tmp)
+        runs = [probe(app, env)[0] for _ in range(repeats)]
+        _, log = probe(app, env, importtime=True)
+    seconds = [run['seconds'] for run in runs]
+    return {
+        'app': app,
+        'repeats': repeats,
+        'median_s': round(statistics.median(seconds), 3),
+        'max_s': round(max(seconds), 3),
+        'heavy_imports': runs[-1]['heavy'],
+        'slowest_imports': slowest_imports(log, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--apps', default='app_production,app', help='comma-separated app modules')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to list')
+    parser.add_argument('--max-seconds', type=float, help='fail when the median start is slower')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    rows = []
+    for app in args.apps.split(','):
+        try:
+            rows.append(bench(app, args.repeats, args.top))
+        except RuntimeError as e:
+            print(f"⚠️ {e}", file=sys.stderr)
+    slow = [row['app'] for row in rows if args.max_seconds and row['median_s'] > args.max_seconds]
+
+    if args.json:
+        print(json.dumps({'apps': rows, 'max_seconds': args.max_seconds, 'too_slow': slow}, indent=2))
+    else:
+        for row in rows:
+            print(f"{row['app']}: median {row['median_s']:.2f} s, max {row['max_s']:.2f} s "
+                  f"over {row['repeats']} starts")
+            if row['heavy_imports']:
+                print(f"  ⚠️ imported before first use: {', '.join(row['heavy_imports'])}")
+            for module, ms in row['slowest_imports']:
+                print(f"  {module:<24} {ms:>7.1f} ms")
+        for app in slow:
+            print(f"❌ {app} starts slower than {args.max_seconds:.2f} s")
+    if slow:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
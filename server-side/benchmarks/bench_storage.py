@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: catalog inserts/sec before and after the storage layer
+
+"before" opens a connection, inserts one row and commits for every record in
+the default rollback-journal mode, as the upload loop used to. "after" uses
+the pooled WAL connection and one executemany per upload. A reader thread
+runs SELECTs against the table during both runs to show whether readers
+stall the writer.
+
+    python benchmarks/bench_storage.py --records 2000 --upload-size 20
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import storage  # noqa: E402
+
+
+def make_records(count):
+    text = "The Great Gatsby\nBy F. Scott Fitzgerald\nCopyright 1925\n" * 20
+    return [(f'book_{i}.jpg', {
+        'title': f'Title {i}', 'author': f'Author {i % 97}', 'year': 1900 + i % 120,
+        'isbn': f'978{i:010d}', 'publisher': 'Scribner', 'keywords': 'gatsby, fitzgerald',
+    }, text) for i in range(count)]
+
+
+class Reader(threading.Thread):
+    """Keeps querying the catalog while the writer runs"""
+
+    def __init__(self, db_path, connect):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.connect = connect
+        self.queries = 0
+        self.errors = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = self.connect(self.db_path)
+        while not self.stop.is_set():
+            try:
+                conn.execute('SELECT COUNT(*), MAX(year) FROM books').fetchone()
+                self.queries += 1
+            except sqlite3.OperationalError:
+                self.errors += 1
+
+
+def legacy_connect(db_path):
+    return sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+
+
+def run_before(db_path, records):
+    for filename, metadata, ocr_text in records:
+        conn = sqlite3.connect(db_path)
+        storage.insert_book(conn, filename, metadata, ocr_text)
+        conn.commit()
+        conn.close()
+
+
+def run_after(db_path, records, upload_size):
+    for start in range(0, len(records), upload_size):
+        with storage.transaction(db_path) as conn:
+            storage.insert_books(conn, records[start:start + upload_size])
+
+
+def measure(label, db_path, connect, work, count):
+    reader = Reader(db_path, connect)
+    reader.start()
+    start = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - start
+    reader.stop.set()
+    reader.join()
+    return {
+        'mode': label,
+        'records': count,
+        'seconds': round(elapsed, 3),
+        'inserts_per_sec': round(count / elapsed, 1),
+        'reader_queries_per_sec': round(reader.queries / elapsed, 1),
+        'reader_errors': reader.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--upload-size', type=int, default=20, help='records per upload/transaction')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    workdir = tempfile.mkdtemp(prefix='lis-bench-')
+
+    before_db = os.path.join(workdir, 'before.db')
+    conn = sqlite3.connect(before_db)
+    conn.execute(storage.BOOKS_TABLE)
+    conn.commit()
+    conn.close()
+
+    after_db = os.path.join(workdir, 'after.db')
+    storage.init_database(after_db)
+
+    rows = [
+        measure('before (connect+commit per row, rollback journal)', before_db, legacy_connect,
+                lambda: run_before(before_db, records), len(records)),
+        measure(f'after (pooled WAL, executemany x{args.upload_size})', after_db, storage.connect,
+                lambda: run_after(after_db, records, args.upload_size), len(records)),
+    ]
+    rows[1]['speedup'] = round(rows[1]['inserts_per_sec'] / rows[0]['inserts_per_sec'], 1)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    for row in rows:
+        print(f"{row['mode']}")
+        print(f"  {row['inserts_per_sec']:>10} inserts/s   "
+              f"{row['reader_queries_per_sec']:>10} reader queries/s   "
+              f"{row['reader_errors']} reader errors")
+    print(f"speedup: {rows[1]['speedup']}x")
+
+
+if __name__ == '__main__':
+    main()
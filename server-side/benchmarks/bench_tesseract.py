@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Tesseract per-call latency, subprocess vs in-process API
+
+OCRs the preprocessed images in ml-research/samples with each installed
+backend and reports the first call (which for tesserocr includes loading
+the model) separately from steady-state per-call latency, plus whether the
+backends produced the same text.
+
+    python benchmarks/bench_tesseract.py
+    python benchmarks/bench_tesseract.py --repeats 5 --config "--psm 6"
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import tesseract_engine  # noqa: E402
+from preprocess import Preprocessor, parse_stages  # noqa: E402
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'ml-research', 'samples')
+
+
+def available_backends():
+    backends = []
+    if tesseract_engine.TESSEROCR_AVAILABLE:
+        backends.append('tesserocr')
+    if tesseract_engine.PYTESSERACT_AVAILABLE:
+        try:
+            tesseract_engine.load_pytesseract().get_tesseract_version()
+            backends.append('subprocess')
+        except Exception:
+            pass
+    return backends
+
+
+def run_backend(backend, images, repeats, config):
+    engine = tesseract_engine.create_engine(backend, config=config)
+    start = time.perf_counter()
+    texts = [engine.image_to_string(images[0])]
+    first_call_ms = (time.perf_counter() - start) * 1000
+
+    # Steady state: a fresh latency window without the first call
+    engine.reset_latency()
+    for _ in range(repeats):
+        texts = [engine.image_to_string(image) for image in images]
+    row = engine.latency()
+    row['first_call_ms'] = round(first_call_ms, 1)
+    engine.close()
+    return row, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--backends', help='comma-separated (default: every installed backend)')
+    parser.add_argument('--samples', default=SAMPLES)
+    parser.add_argument('--preprocess', default='normalize,threshold')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--config', default='', help='Tesseract options, e.g. "--psm 6"')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    backends = args.backends.split(',') if args.backends else available_backends()
+    if not backends:
+        sys.exit("Neither tesserocr nor the tesseract binary is installed")
+    paths = sorted(p for p in glob.glob(os.path.join(args.samples, '*'))
+                   if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not paths:
+        sys.exit(f"No images found in {args.samples}")
+    preprocessor = Preprocessor(stages=parse_stages(args.preprocess))
+    images = [preprocessor.run(p)[0] for p in paths]
+
+    rows, outputs = [], {}
+    for backend in backends:
+        row, outputs[backend] = run_backend(backend, images, args.repeats, args.config)
+        rows.append(row)
+    if len(outputs) > 1:
+        reference, *others = outputs.values()
+        for row, texts in zip(rows[1:], others):
+            row['same_text'] = sum(a.strip() == b.strip() for a, b in zip(reference, texts)) / len(images)
+
+    if args.json:
+        print(json.dumps({'images': len(images), 'repeats': args.repeats, 'backends': rows}, indent=2))
+        return
+    print(f"{len(images)} images x {args.repeats} repeats, preprocess {args.preprocess}")
+    for row in rows:
+        line = (f"  {row['backend']:<11} first call {row['first_call_ms']:>7.0f} ms   per call "
+                f"mean {row['mean_ms']:>6.0f}  p50 {row['p50_ms']:>6.0f}  p95 {row['p95_ms']:>6.0f} ms")
+        if 'same_text' in row:
+            line += f"   same text as {rows[0]['backend']}: {row['same_text']:.0%}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
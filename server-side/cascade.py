@@ -0,0 +1,412 @@
+"""
+LIS Book Scanner - Confidence-driven OCR engine cascade
+Tesseract reads the whole image first. If its mean word confidence is high
+enough the result is accepted as is; otherwise only the lines it was unsure
+of are cropped and re-read by EasyOCR (in batches, across images when given
+several), whose reading replaces a line when it is more confident. A
+per-image time budget stops escalation early. Every result carries a report
+of which engines ran and why. Images OCRed one per thread can have their
+escalations batched together too, through an EscalationBatcher.
+"""
+
+import os
+import threading
+import time
+
+from easyocr_batch import DEFAULT_BATCH_SIZE, batch_size_from_env, recognize_crops
+
+# Mean Tesseract word confidence (0-100) at which the first pass is accepted
+DEFAULT_MIN_CONFIDENCE = 70.0
+
+# Lines below this mean confidence are escalated to EasyOCR
+DEFAULT_LINE_CONFIDENCE = 60.0
+
+# Pixels of context kept around an escalated line
+LINE_PADDING = 4
+
+# How long an escalating run() waits for other threads' escalations to batch with
+DEFAULT_BATCH_WINDOW_MS = 0
+
+# Images whose escalations are re-read together at most
+DEFAULT_BATCH_IMAGES = 8
+
+
+class Word:
+    __slots__ = ('text', 'confidence', 'box')
+
+    def __init__(self, text, confidence, box):
+        self.text = text
+        self.confidence = confidence
+        self.box = box  # (left, top, width, height)
+
+
+class Line:
+    """Words sharing a baseline band, left to right"""
+
+    def __init__(self, words, engine='tesseract'):
+        self.words = sorted(words, key=lambda w: w.box[0])
+        self.engine = engine
+
+    @property
+    def text(self):
+        return ' '.join(w.text for w in self.words)
+
+    @property
+    def confidence(self):
+        return mean_confidence(self.words)
+
+    @property
+    def box(self):
+        left = min(w.box[0] for w in self.words)
+        top = min(w.box[1] for w in self.words)
+        right = max(w.box[0] + w.box[2] for w in self.words)
+        bottom = max(w.box[1] + w.box[3] for w in self.words)
+        return left, top, right - left, bottom - top
+
+
+def mean_confidence(words):
+    return sum(w.confidence for w in words) / len(words) if words else 0.0
+
+
+def words_from_data(data):
+    """Recognised words of image_to_data output (pytesseract Output.DICT keys)"""
+    words = []
+    for text, conf, left, top, width, height in zip(data['text'], data['conf'], data['left'],
+                                                    data['top'], data['width'], data['height']):
+        if text.strip() and float(conf) >= 0:
+            words.append(Word(text.strip(), float(conf), (left, top, width, height)))
+    return words
+
+
+def group_lines(words):
+    """Lines of words in reading order; a word joins a line its middle falls in"""
+    lines = []
+    for word in sorted(words, key=lambda w: w.box[1]):
+        middle = word.box[1] + word.box[3] / 2
+        for line in lines:
+            top, bottom = line[0].box[1], line[0].box[1] + line[0].box[3]
+            if top <= middle <= bottom:
+                line.append(word)
+                break
+        else:
+            lines.append([word])
+    return [Line(line) for line in lines]
+
+
+def easyocr_words(results, offset=(0, 0)):
+    """Words of EasyOCR readtext(detail=1) output, confidences scaled to 0-100"""
+    words = []
+    for points, text, confidence in results:
+        if not text.strip():
+            continue
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        box = (int(min(xs)) + offset[0], int(min(ys)) + offset[1],
+               int(max(xs) - min(xs)), int(max(ys) - min(ys)))
+        words.append(Word(text.strip(), float(confidence) * 100, box))
+    return words
+
+
+class Cascade:
+    """Tesseract first, EasyOCR only for what Tesseract was unsure of
+
+    `reader` is a zero-argument callable returning the EasyOCR reader (or
+    None), so the model is only loaded once something needs escalating.
+    `budget` is seconds per image; None means no limit. Unsure lines are
+    re-read in recognizer batches of `batch_size` crops. With `batch_images`
+    above one, run() calls from concurrent threads re-read their escalations
+    together, that many images at a time, optionally waiting `batch_window`
+    seconds for each other.
+    """
+
+    def __init__(self, tesseract, reader=None, tesseract_config='',
+                 min_confidence=DEFAULT_MIN_CONFIDENCE, line_confidence=DEFAULT_LINE_CONFIDENCE,
+                 budget=None, batch_size=DEFAULT_BATCH_SIZE, batch_images=1, batch_window=0):
+        self.tesseract = tesseract
+        self.reader = reader
+        self.tesseract_config = tesseract_config
+        self.min_confidence = min_confidence
+        self.line_confidence = line_confidence
+        self.budget = budget
+        self.batch_size = batch_size
+        self.batcher = EscalationBatcher(self, batch_window, batch_images) if batch_images > 1 else None
+
+    @property
+    def signature(self):
+        """Everything in the cascade's setup that changes the text it returns (for cache keys)"""
+        engine = f'{self.tesseract.name}:{self.tesseract.version}' if self.tesseract is not None else 'none'
+        budget = f'{self.budget * 1000:g}ms' if self.budget is not None else 'none'
+        return (f'{engine}|{self.tesseract_config}|min:{self.min_confidence:g}|line:{self.line_confidence:g}'
+                f'|budget:{budget}')
+
+    @classmethod
+    def from_env(cls, tesseract, reader=None, tesseract_config='', batch_images=1):
+        """Thresholds from OCR_MIN_CONFIDENCE / OCR_LINE_CONFIDENCE, budget from OCR_BUDGET_MS,
+        recognizer batch size from OCR_BATCH_SIZE, cross-thread batching window from
+        OCR_BATCH_WINDOW_MS"""
+        budget_ms = float(os.environ.get('OCR_BUDGET_MS', '0'))
+        window_ms = float(os.environ.get('OCR_BATCH_WINDOW_MS', DEFAULT_BATCH_WINDOW_MS))
+        return cls(tesseract, reader, tesseract_config,
+                   min_confidence=float(os.environ.get('OCR_MIN_CONFIDENCE', DEFAULT_MIN_CONFIDENCE)),
+                   line_confidence=float(os.environ.get('OCR_LINE_CONFIDENCE', DEFAULT_LINE_CONFIDENCE)),
+                   budget=budget_ms / 1000 if budget_ms > 0 else None,
+                   batch_size=batch_size_from_env(),
+                   batch_images=batch_images, batch_window=window_ms / 1000)
+
+    def run(self, image):
+        """(text, report) for a preprocessed image (numpy array)
+
+        report = {'engines': [{'engine', 'ms', 'reason', ...}, ...],
+                  'confidence': final mean word confidence, 'stopped': why}
+        """
+        if self.batcher is None:
+            return self.run_many([image])[0]
+        job = self._first_pass(image)
+        if job['stopped'] is None:
+            self.batcher.escalate(job)
+        return self._result(job)
+
+    def run_many(self, images):
+        """[(text, report)] for several images, their unsure lines re-read together
+
+        Each image gets its own Tesseract pass and time budget; the lines to
+        escalate from all of them then go through EasyOCR as one batched job,
+        whose time is shared out by the number of lines each image sent.
+        """
+        jobs = [self._first_pass(image) for image in images]
+        self._escalate([job for job in jobs if job['stopped'] is None])
+        return [self._result(job) for job in jobs]
+
+    def _escalate(self, jobs):
+        """Run EasyOCR over the jobs Tesseract left unsure, as one batched job"""
+        if not jobs:
+            return
+        started = time.perf_counter()
+        reader = self.reader() if self.reader else None
+        # Every escalated image waited for the (lazily loaded) reader
+        for job in jobs:
+            job['seconds'] += time.perf_counter() - started
+        if reader is None:
+            for job in jobs:
+                job['stopped'] = 'no fallback engine'
+            return
+        for job in jobs:
+            if self._remaining(job) <= 0:
+                job['stopped'] = 'budget'
+        jobs = [job for job in jobs if job['stopped'] is None]
+        self._reread_lines(reader, [job for job in jobs if job['lines']])
+        for job in jobs:
+            if not job['lines']:
+                self._read_whole(reader, job)
+
+    @staticmethod
+    def _result(job):
+        report = job['report']
+        words = [w for line in job['lines'] for w in line.words]
+        report['stopped'] = job['stopped']
+        report['confidence'] = round(mean_confidence(words), 1)
+        report['ms'] = round(job['seconds'] * 1000, 1)
+        return '\n'.join(line.text for line in job['lines']), report
+
+    def _first_pass(self, image):
+        """Tesseract reading of one image, and whether (and why) to escalate it"""
+        start = time.perf_counter()
+        report = {'engines': [], 'confidence': 0.0, 'stopped': None}
+        job = {'image': image, 'lines': [], 'unsure': [], 'report': report, 'stopped': None}
+
+        if self.tesseract is not None:
+            try:
+                data = self.tesseract.image_to_data(image, config=self.tesseract_config)
+                job['lines'] = group_lines(words_from_data(data))
+            except Exception as e:
+                print(f"Tesseract error: {e}")
+            report['engines'].append({
+                'engine': 'tesseract', 'ms': round((time.perf_counter() - start) * 1000, 1),
+                'reason': 'first pass',
+                'confidence': round(mean_confidence([w for line in job['lines'] for w in line.words]), 1),
+            })
+
+        lines = job['lines']
+        first_confidence = report['engines'][0]['confidence'] if report['engines'] else 0.0
+        job['unsure'] = [line for line in lines if line.confidence < self.line_confidence]
+        if lines and first_confidence >= self.min_confidence:
+            job['stopped'] = 'confident'
+        elif lines and not job['unsure']:
+            job['stopped'] = 'no unsure lines'
+        elif self.budget is not None and time.perf_counter() - start >= self.budget:
+            job['stopped'] = 'budget'
+        elif self.tesseract is None:
+            job['reason'] = 'tesseract not available'
+        elif not lines:
+            job['reason'] = 'tesseract found no text'
+        else:
+            job['reason'] = (f'mean confidence {first_confidence:.0f} < {self.min_confidence:.0f}; '
+                             f'{len(job["unsure"])} of {len(lines)} lines < {self.line_confidence:.0f}')
+        job['seconds'] = time.perf_counter() - start
+        return job
+
+    def _remaining(self, job):
+        """Seconds left of a job's budget (infinite without one)"""
+        return float('inf') if self.budget is None else self.budget - job['seconds']
+
+    def _crop(self, image, line):
+        height, width = image.shape[:2]
+        left, top, w, h = line.box
+        x0, y0 = max(left - LINE_PADDING, 0), max(top - LINE_PADDING, 0)
+        x1, y1 = min(left + w + LINE_PADDING, width), min(top + h + LINE_PADDING, height)
+        return image[y0:y1, x0:x1]
+
+    def _next_round(self, jobs, queues, per_crop):
+        """[(job, line)] to recognise next: at most a batch, none past an image's budget
+
+        Without a time per crop yet, a budgeted run first probes with one
+        line per image; after that an image sends only as many lines as its
+        remaining budget covers at the measured rate. Images with lines left
+        but no time are stopped for the budget.
+        """
+        batch = []
+        for job in jobs:
+            queue = queues[id(job)]
+            if not queue or job['stopped'] is not None:
+                continue
+            if self.budget is None:
+                allowed = len(queue)
+            elif per_crop is None:
+                allowed = 1
+            else:
+                allowed = int(self._remaining(job) / per_crop) if per_crop > 0 else len(queue)
+            if allowed <= 0 or self._remaining(job) <= 0:
+                job['stopped'] = 'budget'
+                continue
+            take = min(allowed, len(queue), self.batch_size - len(batch))
+            batch.extend((job, line) for line in queue[:take])
+            del queue[:take]
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    def _reread_lines(self, reader, jobs):
+        """Re-read the unsure lines of every job in batched recognition rounds
+
+        Each round's time is shared out by the number of lines each image
+        sent, and no image is given a round its remaining budget cannot
+        cover; lines left over are reported as skipped.
+        """
+        if not jobs:
+            return
+        queues = {id(job): list(job['unsure']) for job in jobs}
+        steps = {}
+        for job in jobs:
+            steps[id(job)] = {'engine': 'easyocr', 'reason': job['reason'], 'lines': 0,
+                              'replaced': 0, 'skipped': 0, 'batch': 0, 'ms': 0.0}
+            job['report']['engines'].append(steps[id(job)])
+
+        per_crop = None
+        while True:
+            round_lines = self._next_round(jobs, queues, per_crop)
+            if not round_lines:
+                break
+            started = time.perf_counter()
+            try:
+                readings = recognize_crops(reader, [self._crop(job['image'], line) for job, line in round_lines],
+                                           self.batch_size)
+            except Exception as e:
+                print(f"EasyOCR error: {e}")
+                for job in jobs:
+                    job['stopped'] = 'fallback failed'
+                    queues[id(job)] = []
+                readings = [None] * len(round_lines)
+            seconds = time.perf_counter() - started
+            per_crop = seconds / len(round_lines)
+
+            for (job, line), reading in zip(round_lines, readings):
+                step = steps[id(job)]
+                step['lines'] += 1
+                step['batch'] = max(step['batch'], len(round_lines))
+                step['ms'] += per_crop * 1000
+                job['seconds'] += per_crop
+                if reading is None:
+                    continue
+                text, confidence = reading
+                if confidence * 100 > line.confidence:
+                    line.words, line.engine = [Word(text, confidence * 100, line.box)], 'easyocr'
+                    step['replaced'] += 1
+
+        for job in jobs:
+            step = steps[id(job)]
+            step['ms'] = round(step['ms'], 1)
+            step['skipped'] = len(job['unsure']) - step['lines']
+            if job['stopped'] is None:
+                job['stopped'] = 'budget' if step['skipped'] else 'escalated'
+
+    def _read_whole(self, reader, job):
+        """EasyOCR detection and recognition of an image Tesseract found nothing in"""
+        step = {'engine': 'easyocr', 'reason': job['reason'], 'lines': 0, 'replaced': 0}
+        job['report']['engines'].append(step)
+        started = time.perf_counter()
+        try:
+            words = easyocr_words(reader.readtext(job['image'], detail=1, batch_size=self.batch_size))
+            job['lines'] = [Line(line.words, 'easyocr') for line in group_lines(words)]
+            step['lines'] = step['replaced'] = len(job['lines'])
+            job['stopped'] = 'escalated'
+        except Exception as e:
+            print(f"EasyOCR error: {e}")
+            job['stopped'] = 'fallback failed'
+        step['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        job['seconds'] += time.perf_counter() - started
+
+
+class EscalationBatcher:
+    """Gathers the escalations of concurrent Cascade.run() calls into batches
+
+    One batch is re-read at a time, by the thread whose image has waited
+    longest; escalations arriving meanwhile queue up and go together in the
+    next batch, up to `max_images` images. The leading thread can also wait
+    up to `window` seconds for more images to join. There is no thread of
+    its own, and the waiting counts against each image's budget.
+    """
+
+    def __init__(self, cascade, window=0, max_images=DEFAULT_BATCH_IMAGES):
+        self.cascade = cascade
+        self.window = window
+        self.max_images = max_images
+        self._pending = []
+        self._running = False
+        self._changed = threading.Condition()
+        self.batches = 0
+        self.images = 0
+
+    def escalate(self, job):
+        """Escalate a first-pass job, batched with whatever other threads send meanwhile"""
+        job['queued'] = time.perf_counter()
+        with self._changed:
+            self._pending.append(job)
+            self._changed.notify_all()
+            while 'done' not in job and (self._running or self._pending[0] is not job):
+                self._changed.wait()
+            if 'done' in job:
+                if job['done'] is not None:
+                    raise job['done']
+                return
+            self._running = True
+            if self.window:
+                self._changed.wait_for(lambda: len(self._pending) >= self.max_images, self.window)
+            batch, self._pending = self._pending[:self.max_images], self._pending[self.max_images:]
+            self.batches += 1
+            self.images += len(batch)
+
+        started = time.perf_counter()
+        for waiting in batch:
+            waiting['seconds'] += started - waiting['queued']
+        error = None
+        try:
+            self.cascade._escalate(batch)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._changed:
+                for waiting in batch:
+                    waiting['done'] = error
+                self._running = False
+                self._changed.notify_all()
@@ -0,0 +1,122 @@
+"""
+LIS Book Scanner - Versioned chart cache
+Analytics charts are rendered once per catalog version and stored on disk
+under the hash of their PNG bytes. Pages link to /charts/<digest>.png, which
+can be cached by browsers forever and revalidated with the digest as ETag.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+import storage
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChartCache:
+    """Content-addressed PNG store keyed by (chart name, catalog version)
+
+    Names are stored under `namespace`, so apps that draw the same chart
+    differently can share one catalog and cache directory.
+    """
+
+    def __init__(self, db_path, cache_dir, grace=600, namespace=''):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        self.grace = grace  # seconds a replaced image stays servable
+        self.renders = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        with storage.transaction(db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chart_cache (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    digest TEXT,
+                    rendered_at REAL NOT NULL
+                )
+            ''')
+
+    def path(self, digest):
+        """File for a digest, or None if it is malformed or gone"""
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        path = os.path.join(self.cache_dir, f'{digest}.png')
+        return path if os.path.exists(path) else None
+
+    def _current(self, name, version):
+        row = storage.connection(self.db_path).execute(
+            'SELECT version, digest FROM chart_cache WHERE name = ?', (name,)
+        ).fetchone()
+        if row is None or row['version'] != version:
+            return False, None
+        if row['digest'] is not None and self.path(row['digest']) is None:
+            return False, None
+        return True, row['digest']
+
+    def get(self, name, version, render):
+        """Digest of chart `name` at catalog `version`, rendering if stale
+
+        render() returns PNG bytes, or None when there is nothing to plot.
+        """
+        if self.namespace:
+            name = f'{self.namespace}/{name}'
+        fresh, digest = self._current(name, version)
+        if fresh:
+            self.hits += 1
+            return digest
+
+        # Concurrent viewers of a stale chart wait for one render
+        with self._lock:
+            fresh, digest = self._current(name, version)
+            if fresh:
+                self.hits += 1
+                return digest
+
+            data = render()
+            self.renders += 1
+            digest = None
+            if data:
+                digest = hashlib.sha256(data).hexdigest()[:32]
+                self._write(digest, data)
+
+            with storage.transaction(self.db_path) as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO chart_cache (name, version, digest, rendered_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (name, version, digest, time.time()))
+            self._prune()
+        return digest
+
+    def _write(self, digest, data):
+        path = os.path.join(self.cache_dir, f'{digest}.png')
+        if os.path.exists(path):
+            # Same image as an earlier version; keep it servable
+            os.utime(path)
+            return
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _prune(self):
+        """Remove images no chart points at any more, after a grace period"""
+        live = {row[0] for row in storage.connection(self.db_path).execute(
+            'SELECT digest FROM chart_cache WHERE digest IS NOT NULL')}
+        cutoff = time.time() - self.grace
+        for entry in os.scandir(self.cache_dir):
+            digest = entry.name.split('.')[0]
+            if digest not in live and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {'renders': self.renders, 'hits': self.hits}
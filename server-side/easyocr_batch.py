@@ -0,0 +1,91 @@
+"""
+LIS Book Scanner - Batched EasyOCR recognition
+On CPU, EasyOCR's Reader.recognize() (and so readtext()) runs the recognizer
+on one text box at a time whatever batch_size says. This module feeds the
+recognizer crops that are already known - lines Tesseract was unsure of, from
+one image or many - in real batches, and scatters the readings back to the
+crops they came from.
+"""
+
+import math
+import os
+
+import numpy as np
+
+# Crops per recognizer forward pass (OCR_BATCH_SIZE)
+DEFAULT_BATCH_SIZE = 16
+
+# Height EasyOCR's recognition models take their input at
+MODEL_HEIGHT = 64
+
+
+def batch_size_from_env():
+    """Recognizer batch size configured by OCR_BATCH_SIZE (default 16)"""
+    return max(int(os.environ.get('OCR_BATCH_SIZE', DEFAULT_BATCH_SIZE)), 1)
+
+
+def _gray(crop):
+    if crop.ndim == 2:
+        return crop
+    import cv2
+    return cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY if crop.shape[2] == 3 else cv2.COLOR_RGBA2GRAY)
+
+
+def can_batch(reader):
+    """True when `reader` is an EasyOCR Reader whose recognizer can be fed directly"""
+    if not all(hasattr(reader, name) for name in ('recognizer', 'converter', 'character', 'lang_char')):
+        return False
+    try:
+        from easyocr.recognition import get_text  # noqa: F401
+        from easyocr.utils import compute_ratio_and_resize  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def recognize_crops(reader, crops, batch_size=DEFAULT_BATCH_SIZE):
+    """[(text, confidence 0-1) or None] for each crop (numpy array), in order
+
+    Crops are sorted by aspect ratio before batching, so each batch is padded
+    to the width of its own widest crop rather than the widest overall.
+    Readers without a directly usable recognizer (and tests) fall back to
+    one readtext() call per crop.
+    """
+    results = [None] * len(crops)
+    if not crops:
+        return results
+    if not can_batch(reader):
+        for i, crop in enumerate(crops):
+            if not crop.size:
+                continue
+            read = [(text, confidence) for _, text, confidence in reader.readtext(crop, detail=1)
+                    if text.strip()]
+            if read:
+                results[i] = (' '.join(text.strip() for text, _ in read),
+                              sum(confidence for _, confidence in read) / len(read))
+        return results
+
+    from easyocr.recognition import get_text
+    from easyocr.utils import compute_ratio_and_resize
+
+    resized = []
+    for i, crop in enumerate(crops):
+        gray = _gray(np.asarray(crop))
+        height, width = gray.shape[:2]
+        if height and width:
+            image, ratio = compute_ratio_and_resize(gray, width, height, MODEL_HEIGHT)
+            resized.append((ratio, i, image))
+    resized.sort(key=lambda item: item[0])
+
+    ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+    for start in range(0, len(resized), batch_size):
+        batch = resized[start:start + batch_size]
+        width = int(math.ceil(max(ratio for ratio, _, _ in batch))) * MODEL_HEIGHT
+        # get_text hands back the first item of each pair untouched: the crop index
+        for i, text, confidence in get_text(reader.character, MODEL_HEIGHT, width, reader.recognizer,
+                                            reader.converter, [(i, image) for _, i, image in batch],
+                                            ignore_char=ignore_char, batch_size=batch_size,
+                                            workers=0, device=reader.device):
+            if text.strip():
+                results[i] = (text.strip(), float(confidence))
+    return results
@@ -0,0 +1,140 @@
+"""
+LIS Book Scanner - Background Open Library enrichment
+Ingest stores records with api_enriched = FALSE and returns immediately; this
+stage drains un-enriched records with an ISBN in batches, updates them in
+place and backs off while the remote API is failing.
+"""
+
+import threading
+import time
+
+from openlibrary import EnrichmentError, normalize_isbn, to_metadata
+import metrics
+import storage
+
+DAY = 24 * 60 * 60
+
+
+class Enricher:
+    """Drains the enrichment backlog on a daemon thread"""
+
+    def __init__(self, db_path, client, batch_size=50, interval=5.0,
+                 max_backoff=300.0, max_attempts=5, retry_delay=DAY):
+        self.db_path = db_path
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self.failures = 0
+        self.enriched_total = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pending(self, conn):
+        """Next batch of records that still need an Open Library lookup"""
+        return conn.execute('''
+            SELECT id, isbn FROM books
+            WHERE api_enriched = 0 AND isbn IS NOT NULL
+              AND enrich_attempts < ?
+              AND (enrich_after IS NULL OR enrich_after <= ?)
+            ORDER BY id LIMIT ?
+        ''', (self.max_attempts, time.time(), self.batch_size)).fetchall()
+
+    def run_once(self):
+        """Enrich one batch; returns the number of records looked up
+
+        Raises EnrichmentError if Open Library could not be reached.
+        """
+        rows = self.pending(storage.connection(self.db_path))
+        if not rows:
+            return 0
+
+        # No transaction is held while waiting on the network
+        found = self.client.lookup_many([row['isbn'] for row in rows])
+        now = time.time()
+        with storage.transaction(self.db_path) as conn:
+            for row in rows:
+                record = found.get(normalize_isbn(row['isbn']))
+                fields = to_metadata(record) if record else {}
+                if fields:
+                    conn.execute('''
+                        UPDATE books SET
+                            title = COALESCE(?, title),
+                            author = COALESCE(?, author),
+                            year = COALESCE(?, year),
+                            publisher = COALESCE(?, publisher),
+                            api_enriched = TRUE,
+                            enrich_attempts = enrich_attempts + 1
+                        WHERE id = ?
+                    ''', (fields.get('title'), fields.get('author'), fields.get('year'),
+                          fields.get('publisher'), row['id']))
+                    self.enriched_total += 1
+                else:
+                    # Unknown to Open Library (or not an ISBN); try again later
+                    conn.execute('''
+                        UPDATE books SET enrich_attempts = enrich_attempts + 1, enrich_after = ?
+                        WHERE id = ?
+                    ''', (now + self.retry_delay, row['id']))
+        return len(rows)
+
+    def backoff(self):
+        """Seconds to wait after `failures` consecutive API errors"""
+        return min(self.interval * (2 ** self.failures), self.max_backoff)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                # Logs a timing line whenever a batch went to Open Library
+                with metrics.trace('enrich'):
+                    processed = self.run_once()
+                self.failures = 0
+                self.last_error = None
+                # A full batch means there is more backlog; keep draining
+                if processed >= self.batch_size:
+                    continue
+                delay = self.interval
+            except EnrichmentError as e:
+                self.failures += 1
+                self.last_error = str(e)
+                delay = self.backoff()
+                print(f"⚠️ Enrichment failed ({self.failures}x), retrying in {delay:.0f}s: {e}")
+            except Exception as e:
+                self.last_error = str(e)
+                delay = self.interval
+                print(f"Enrichment error: {e}")
+
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def wake(self):
+        """Check for new records now instead of at the next interval"""
+        # While the API is failing, new records wait for the backoff to end
+        if not self.failures:
+            self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='enricher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'enriched_total': self.enriched_total,
+            'consecutive_failures': self.failures,
+            'last_error': self.last_error,
+        }
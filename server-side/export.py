@@ -0,0 +1,103 @@
+"""
+LIS Book Scanner - Streaming catalog export
+Rows are read from a cursor in small batches and serialised one at a time,
+so exporting the whole catalog as CSV, JSON lines, a JSON array or MARCXML
+uses constant memory and never touches the disk.
+"""
+
+import csv
+import json
+from xml.sax.saxutils import escape
+
+import storage
+
+EXPORT_COLUMNS = ('id', 'filename', 'title', 'author', 'year', 'isbn', 'publisher',
+                  'keywords', 'ocr_text', 'processing_date', 'api_enriched')
+
+# MARC 21 datafields written for each record: (tag, ((subfield code, column), ...)),
+# one <datafield> per tag holding the subfields that have a value
+MARC_FIELDS = (
+    ('020', (('a', 'isbn'),)),
+    ('100', (('a', 'author'),)),
+    ('245', (('a', 'title'),)),
+    ('260', (('b', 'publisher'), ('c', 'year'))),
+    ('653', (('a', 'keywords'),)),
+)
+
+
+def iter_rows(db_path, batch_size=500):
+    """Yield catalog rows as dicts, oldest first, batch_size at a time"""
+    # A private connection: the response may outlive the request's pooled one
+    conn = storage.connect(db_path, check_same_thread=False)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM books ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+class _Line:
+    """File-like sink that hands back whatever csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+def to_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def to_json(rows):
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(row, ensure_ascii=False, indent=2)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def marc_record(row):
+    """One MARCXML <record> line for a catalog row"""
+    fields = []
+    for tag, subfields in MARC_FIELDS:
+        values = [(code, row.get(column)) for code, column in subfields]
+        present = ''.join(f'<subfield code="{code}">{escape(str(value))}</subfield>'
+                          for code, value in values if value is not None and value != '')
+        if present:
+            fields.append(f'<datafield tag="{tag}">{present}</datafield>')
+    return f"  <record>{''.join(fields)}</record>\n"
+
+
+def to_marcxml(rows):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<collection>\n'
+    for row in rows:
+        yield marc_record(row)
+    yield '</collection>\n'
+
+
+# format -> (writer, mimetype, file extension)
+FORMATS = {
+    'csv': (to_csv, 'text/csv', 'csv'),
+    'jsonl': (to_jsonl, 'application/x-ndjson', 'jsonl'),
+    'json': (to_json, 'application/json', 'json'),
+    'marcxml': (to_marcxml, 'application/marcxml+xml', 'marcxml'),
+}
+
+
+def stream(db_path, format):
+    """Chunks of the whole catalog in `format`; raises KeyError if unknown"""
+    writer = FORMATS[format][0]
+    return writer(iter_rows(db_path))
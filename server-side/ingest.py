@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+LIS Book Scanner - Bulk ingest of a folder of scans
+The server-side counterpart of the research notebook's process_dataset():
+walks a directory tree, groups book_<id>_<page type> images
+(book_07_cover.jpg, book_07_title.jpg, book_07_copyright.jpg) into one
+catalog record - any other image is a record of its own - and runs the
+pages through the OCR pipeline on a pool of worker processes. Records are
+committed in batches together with a checkpoint row each in catalog.db, so
+a run that is interrupted resumes at the first uncommitted record; pages
+OCRed but not yet committed come back from the OCR cache. Open Library
+enrichment is left to the server's background enricher, as for uploads.
+
+    python ingest.py /mnt/scans --workers 8 --batch-size 200
+    python ingest.py /mnt/scans --dry-run
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from keywords import rank_records
+from metadata import extract_metadata
+from pipeline import EXECUTOR_MODES, PipelineExecutor, default_workers
+import storage
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+
+# Pages of a record in reading order; other page types follow alphabetically
+PAGE_ORDER = ('cover', 'title', 'copyright', 'back')
+
+# Fields taken from one page type when the record has it, as in the notebook
+FIELD_PAGES = {'title': 'title', 'year': 'copyright', 'isbn': 'copyright'}
+
+DEFAULT_BATCH_SIZE = 200
+
+# Field values extract_metadata() returns when it finds nothing
+UNKNOWN = extract_metadata('')
+
+CHECKPOINT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS bulk_ingest_records (
+        record_key TEXT PRIMARY KEY,
+        pages INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+'''
+
+
+class Record:
+    """One book: its checkpoint key and its (page type, path) pages in reading order"""
+
+    def __init__(self, key, pages):
+        self.key = key
+        self.pages = pages
+
+
+def page_key(filename):
+    """(book id, page type) of a book_<id>_<page type> file name, or None"""
+    parts = filename.lower().split('_')
+    if len(parts) < 3 or not parts[0].startswith('book'):
+        return None
+    return f'{parts[0]}_{parts[1]}', parts[-1].split('.')[0]
+
+
+def _page_rank(page):
+    page_type, path = page
+    return (PAGE_ORDER.index(page_type) if page_type in PAGE_ORDER else len(PAGE_ORDER), page_type, path)
+
+
+def find_records(root):
+    """Records under `root`, directory by directory in sorted order
+
+    Keys are absolute paths (of the image, or of the directory plus book
+    id), so the same book is never ingested twice from one location.
+    """
+    records = []
+    for dirpath, dirnames, filenames in os.walk(os.path.abspath(root)):
+        dirnames.sort()
+        books = {}
+        for name in sorted(filenames):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            key = page_key(name)
+            if key is None:
+                records.append(Record(path, [('page', path)]))
+            else:
+                books.setdefault(key[0], []).append((key[1], path))
+        records.extend(Record(os.path.join(dirpath, book_id), sorted(pages, key=_page_rank))
+                       for book_id, pages in books.items())
+    return records
+
+
+def merge_pages(record, results):
+    """(filename, metadata, ocr_text) of a record from its pages' pipeline results
+
+    Metadata is extracted from all pages' text together; a title page's
+    title and a copyright page's year and ISBN take precedence, and a
+    barcode ISBN wins over all of them.
+    """
+    ocr_text = '\n\n'.join(result['ocr_text'] for result in results if result['ocr_text'])
+    filename = os.path.basename(record.pages[0][1])
+    metadata = extract_metadata(ocr_text, filename)
+
+    by_type = {}
+    for (page_type, _), result in zip(record.pages, results):
+        by_type.setdefault(page_type, result)
+    for field, page_type in FIELD_PAGES.items():
+        value = by_type[page_type]['metadata'].get(field) if page_type in by_type else None
+        if value and value != UNKNOWN[field]:
+            metadata[field] = value
+    for result in results:
+        if result.get('isbn_source') == 'barcode':
+            metadata['isbn'] = result['metadata']['isbn']
+            break
+    return filename, metadata, ocr_text
+
+
+def init_checkpoint_table(conn):
+    conn.execute(CHECKPOINT_TABLE)
+
+
+def committed_keys(conn):
+    """Keys of the records already stored by earlier runs"""
+    try:
+        return {row[0] for row in conn.execute("SELECT record_key FROM bulk_ingest_records WHERE status = 'done'")}
+    except sqlite3.OperationalError:  # no run yet
+        return set()
+
+
+def commit_batch(db_path, batch):
+    """Store a batch's records and their checkpoint rows in one transaction
+
+    `batch` is [(record, (filename, metadata, ocr_text) or None, error)];
+    failed records are checkpointed as such and retried by the next run.
+    """
+    stored = [merged for _, merged, error in batch if error is None]
+    with storage.transaction(db_path) as conn:
+        if stored:
+            # Keywords are ranked by TF-IDF against the catalog, counting these records in
+            storage.insert_books(conn, rank_records(conn, stored))
+        conn.executemany('''
+            INSERT INTO bulk_ingest_records (record_key, pages, status, error) VALUES (?, ?, ?, ?)
+            ON CONFLICT (record_key) DO UPDATE SET
+                pages = excluded.pages, status = excluded.status, error = excluded.error,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(record.key, len(record.pages), 'failed' if error else 'done', error)
+              for record, _, error in batch])
+    return len(stored)
+
+
+def ingest(root, db_path, executor, batch_size=DEFAULT_BATCH_SIZE, limit=None, allow_simulated=False):
+    """Ingest every record under `root` not yet committed; returns a summary dict
+
+    Pages whose OCR fell back to simulated text fail their record unless
+    `allow_simulated` (for demo catalogs without Tesseract).
+    """
+    storage.init_database(db_path)
+    with storage.transaction(db_path) as conn:
+        init_checkpoint_table(conn)
+        done = committed_keys(conn)
+    records = find_records(root)
+    todo = [record for record in records if record.key not in done]
+    summary = {'records': len(records), 'skipped': len(records) - len(todo), 'stored': 0, 'failed': 0,
+               'images': 0, 'seconds': 0.0}
+    todo = todo[:limit]
+    print(f"📚 {len(records)} records under {root}: {summary['skipped']} already ingested, "
+          f"{len(todo)} to go ({sum(len(r.pages) for r in todo)} images)")
+
+    results = executor.imap(((path, os.path.basename(path)) for record in todo for _, path in record.pages),
+                            return_exceptions=True)
+    start = time.perf_counter()
+    batch = []
+    try:
+        for record in todo:
+            pages = [next(results) for _ in record.pages]
+            summary['images'] += len(pages)
+            error = next((f"{os.path.basename(path)}: {page}" for (_, path), page in zip(record.pages, pages)
+                          if isinstance(page, Exception)), None)
+            if error is None and not allow_simulated and any(p['ocr_source'] == 'simulated' for p in pages):
+                error = 'OCR unavailable (simulated text)'
+            batch.append((record, None if error else merge_pages(record, pages), error))
+
+            if len(batch) >= batch_size:
+                summary['stored'] += commit_batch(db_path, batch)
+                summary['failed'] += sum(1 for _, _, error in batch if error)
+                batch = []
+                elapsed = time.perf_counter() - start
+                print(f"💾 {summary['stored'] + summary['failed']}/{len(todo)} records committed "
+                      f"({summary['images'] / elapsed:.1f} images/s, {summary['failed']} failed)")
+        if batch:
+            summary['stored'] += commit_batch(db_path, batch)
+            summary['failed'] += sum(1 for _, _, error in batch if error)
+    finally:
+        results.close()
+        summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('root', help='directory of scans (searched recursively)')
+    parser.add_argument('--db', default=os.environ.get('CATALOG_DB', 'catalog.db'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('OCR_WORKERS', default_workers())))
+    parser.add_argument('--executor', default='process', choices=EXECUTOR_MODES)
+    parser.add_argument('--ocr-threads', type=int, default=1, help='threads per Tesseract call')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='records per commit')
+    parser.add_argument('--limit', type=int, help='ingest at most this many records this run')
+    parser.add_argument('--no-cache', action='store_true', help='do not use the OCR result cache')
+    parser.add_argument('--allow-simulated', action='store_true',
+                        help='store records whose OCR fell back to simulated text')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be ingested')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        sys.exit(f"Not a directory: {args.root}")
+    if args.dry_run:
+        records = find_records(args.root)
+        done = set()
+        if os.path.exists(args.db):
+            done = committed_keys(storage.connection(args.db))
+        todo = [record for record in records if record.key not in done]
+        grouped = sum(1 for record in records if len(record.pages) > 1)
+        print(f"{len(records)} records ({grouped} multi-page), {len(records) - len(todo)} already ingested, "
+              f"{sum(len(record.pages) for record in todo)} images to process")
+        return
+
+    with PipelineExecutor(workers=args.workers, mode=args.executor, ocr_threads=args.ocr_threads,
+                          cache_db=None if args.no_cache else args.db) as executor:
+        try:
+            summary = ingest(args.root, args.db, executor, batch_size=args.batch_size, limit=args.limit,
+                             allow_simulated=args.allow_simulated)
+        except KeyboardInterrupt:
+            sys.exit("⏹️ Interrupted - committed batches are kept; run again to resume")
+        stages = executor.stats()['stages']
+
+    print(f"✅ {summary['stored']} records stored, {summary['failed']} failed, {summary['skipped']} skipped; "
+          f"{summary['images']} images in {summary['seconds']}s")
+    if stages:
+        print("   mean ms per image: " + ", ".join(f"{stage}={row['mean_ms']}" for stage, row in stages.items()))
+    if summary['failed']:
+        print("   failed records are retried on the next run")
+
+
+if __name__ == '__main__':
+    main()
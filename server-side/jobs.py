@@ -0,0 +1,266 @@
+"""
+LIS Book Scanner - Background ingest jobs
+An upload becomes one job with one work item per image. Items are processed by
+a bounded worker pool and their state lives in catalog.db, so work that was
+still pending when the server stopped is picked up again on the next start.
+"""
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+# Item states; a job is finished once none of its items are pending/running
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def init_job_tables(conn):
+    """Create the job tables if they don't exist yet"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            total_files INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_job_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL REFERENCES ingest_jobs(id),
+            position INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            filepath TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            result TEXT,
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Databases created before jobs could fail as a whole
+    if 'error' not in {row[1] for row in conn.execute('PRAGMA table_info(ingest_jobs)')}:
+        conn.execute('ALTER TABLE ingest_jobs ADD COLUMN error TEXT')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ingest_job_files_job
+        ON ingest_job_files (job_id, position)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ingest_job_files_status
+        ON ingest_job_files (status)
+    ''')
+
+
+class JobQueue:
+    """Persistent ingest queue drained by a bounded pool of worker threads
+
+    `process_file(filepath, filename)` does the actual work for one image and
+    returns a JSON-serialisable result dict; exceptions mark the item failed.
+    `on_complete(conn, job_id, results)` runs once per job, inside the
+    transaction that finishes its last item, with the successful results in
+    upload order - so a whole upload can be stored with one commit. Changes
+    it makes to those result dicts are saved with the job. If it raises, that transaction is rolled back and the job is marked failed
+    with the error instead.
+    Items run in a copy of the submitting thread's context, so a request's
+    trace ID follows its work onto the pool.
+    """
+
+    def __init__(self, db_path, process_file, max_workers=2, on_complete=None):
+        self.db_path = db_path
+        self.process_file = process_file
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self._executor = None
+        self._lock = threading.Lock()
+
+        with storage.transaction(self.db_path) as conn:
+            init_job_tables(conn)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='ingest'
+                )
+            return self._executor
+
+    def submit(self, files):
+        """Persist a new job for [(filename, filepath), ...] and start it"""
+        job_id = uuid.uuid4().hex
+        with storage.transaction(self.db_path) as conn:
+            conn.execute(
+                'INSERT INTO ingest_jobs (id, status, total_files) VALUES (?, ?, ?)',
+                (job_id, PENDING if files else DONE, len(files))
+            )
+            conn.executemany('''
+                INSERT INTO ingest_job_files (job_id, position, filename, filepath)
+                VALUES (?, ?, ?, ?)
+            ''', [(job_id, i, filename, filepath)
+                  for i, (filename, filepath) in enumerate(files)])
+            item_ids = [row['id'] for row in conn.execute(
+                'SELECT id FROM ingest_job_files WHERE job_id = ? ORDER BY position',
+                (job_id,)
+            )]
+
+        for item_id in item_ids:
+            # One copy per item: a context can only be entered by one thread at a time
+            self._pool().submit(contextvars.copy_context().run, self._run_item, item_id)
+        return job_id
+
+    def resume(self):
+        """Re-enqueue items left pending or running by a previous process"""
+        with storage.transaction(self.db_path) as conn:
+            conn.execute(
+                'UPDATE ingest_job_files SET status = ? WHERE status = ?',
+                (PENDING, RUNNING)
+            )
+            item_ids = [row['id'] for row in conn.execute(
+                'SELECT id FROM ingest_job_files WHERE status = ? ORDER BY id',
+                (PENDING,)
+            )]
+
+        for item_id in item_ids:
+            self._pool().submit(self._run_item, item_id)
+        if item_ids:
+            print(f"🔁 Resumed {len(item_ids)} pending ingest item(s)")
+        return len(item_ids)
+
+    def _run_item(self, item_id):
+        # Claim the item; another worker may already have picked it up.
+        # The write lock is released before the file is processed.
+        with storage.transaction(self.db_path) as conn:
+            claimed = conn.execute('''
+                UPDATE ingest_job_files
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = ?
+            ''', (RUNNING, item_id, PENDING)).rowcount
+            if not claimed:
+                return
+            item = conn.execute(
+                'SELECT * FROM ingest_job_files WHERE id = ?', (item_id,)
+            ).fetchone()
+            self._update_job(conn, item['job_id'])
+
+        try:
+            result = self.process_file(item['filepath'], item['filename'])
+            status, error = DONE, None
+        except Exception as e:
+            print(f"Ingest error for {item['filename']}: {e}")
+            result, status, error = None, FAILED, str(e)
+
+        outcome = (status, json.dumps(result, default=str) if result is not None else None, error, item_id)
+        try:
+            with storage.transaction(self.db_path) as conn:
+                self._finish_item(conn, outcome)
+                if self._update_job(conn, item['job_id']) and self.on_complete:
+                    rows = conn.execute('''
+                        SELECT id, result FROM ingest_job_files
+                        WHERE job_id = ? AND status = ? ORDER BY position
+                    ''', (item['job_id'], DONE)).fetchall()
+                    results = [json.loads(row['result']) for row in rows]
+                    self.on_complete(conn, item['job_id'], results)
+                    conn.executemany('UPDATE ingest_job_files SET result = ? WHERE id = ?',
+                                     [(json.dumps(result, default=str), row['id'])
+                                      for row, result in zip(rows, results)])
+        except Exception as e:
+            # Nothing of the rolled-back transaction was kept: record the item
+            # again, and fail the job if it finished without its results stored
+            print(f"Ingest completion error for job {item['job_id']}: {e}")
+            with storage.transaction(self.db_path) as conn:
+                self._finish_item(conn, outcome)
+                if self._update_job(conn, item['job_id']) and self.on_complete:
+                    conn.execute('''
+                        UPDATE ingest_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (FAILED, str(e), item['job_id']))
+
+    def _finish_item(self, conn, outcome):
+        conn.execute('''
+            UPDATE ingest_job_files
+            SET status = ?, result = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', outcome)
+
+    def _update_job(self, conn, job_id):
+        """Recompute a job's status; True if this call finished the job"""
+        counts = dict(conn.execute('''
+            SELECT status, COUNT(*) FROM ingest_job_files
+            WHERE job_id = ? GROUP BY status
+        ''', (job_id,)).fetchall())
+
+        if counts.get(PENDING, 0) + counts.get(RUNNING, 0) > 0:
+            status = PENDING if set(counts) == {PENDING} else RUNNING
+        elif counts.get(DONE):
+            status = DONE
+        else:
+            status = FAILED
+
+        changed = conn.execute('''
+            UPDATE ingest_jobs SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status NOT IN (?, ?)
+        ''', (status, job_id, DONE, FAILED)).rowcount
+        return bool(changed) and status in (DONE, FAILED)
+
+    def get(self, job_id):
+        """Job status with per-file progress and results, or None"""
+        conn = storage.connection(self.db_path)
+        job = conn.execute(
+            'SELECT * FROM ingest_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+        items = conn.execute('''
+            SELECT position, filename, status, result, error, updated_at
+            FROM ingest_job_files WHERE job_id = ? ORDER BY position
+        ''', (job_id,)).fetchall()
+
+        files = []
+        for item in items:
+            files.append({
+                'position': item['position'],
+                'filename': item['filename'],
+                'status': item['status'],
+                'result': json.loads(item['result']) if item['result'] else None,
+                'error': item['error'],
+                'updated_at': item['updated_at'],
+            })
+
+        finished = sum(1 for f in files if f['status'] in (DONE, FAILED))
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'total_files': job['total_files'],
+            'error': job['error'],
+            'completed_files': finished,
+            'progress': round(finished / job['total_files'], 3) if job['total_files'] else 1.0,
+            'finished': finished == job['total_files'],
+            'files': files,
+        }
+
+    def wait(self, job_id, timeout=None, poll=0.1):
+        """Block until a job has finished (mainly for tests and scripts)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['finished']:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(poll)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -0,0 +1,267 @@
+"""
+LIS Book Scanner - TF-IDF keywords against the whole catalog
+A record's keywords are the terms of its OCR text that are frequent in it
+and rare in the catalog. Document frequencies live in `term_df` and are
+updated as records are stored, never recomputed. A counted record keeps the
+terms it added (`books.keyword_terms`), so triggers can take them back out
+when it is deleted or its OCR text changes. Each record remembers how many
+documents the catalog had when its keywords were ranked
+(`books.keywords_corpus`); a background ranker counts records stored
+without ranking into the table and re-ranks records whose corpus has since
+grown, a batch at a time.
+"""
+
+import json
+import math
+import re
+import threading
+from collections import Counter
+
+import storage
+from metadata import STOPWORDS
+
+TERM_PATTERN = re.compile(r'\b[a-z]{4,}\b')  # run on lowercased text
+
+# Front-matter boilerplate and short function words that TERM_PATTERN lets through
+TERM_STOPWORDS = STOPWORDS | frozenset({
+    'isbn', 'copyright', 'rights', 'reserved', 'edition', 'published', 'publisher', 'publishers',
+    'publishing', 'publication', 'printed', 'reprinted', 'press', 'library', 'congress', 'cataloging',
+    'cataloguing', 'data', 'this', 'that', 'than', 'then', 'them', 'there', 'these', 'those', 'some',
+    'more', 'also', 'only', 'such', 'upon', 'over',
+})
+
+MAX_KEYWORDS = 10
+
+# Re-rank a record once the catalog has grown by this factor since it was ranked
+DEFAULT_GROWTH = 1.25
+
+# Terms per IN (...) lookup, well under SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+def _uncount(column):
+    """Trigger statements taking a counted record's terms (a JSON array column) out of the frequencies"""
+    return f'''
+        UPDATE term_df SET docs = docs - 1 WHERE term IN (SELECT value FROM json_each({column}));
+        DELETE FROM term_df WHERE docs <= 0 AND term IN (SELECT value FROM json_each({column}));
+        UPDATE keyword_corpus SET docs = docs - 1 WHERE id = 1;
+    '''
+
+
+KEYWORD_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS term_df (
+        term TEXT PRIMARY KEY,
+        docs INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS keyword_corpus (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        docs INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    'INSERT OR IGNORE INTO keyword_corpus (id, docs) VALUES (1, 0)',
+    # Records not yet counted (NULL) and the ones ranked against the smallest corpus
+    'CREATE INDEX IF NOT EXISTS idx_books_keywords_corpus ON books (keywords_corpus)',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS term_df_delete AFTER DELETE ON books
+    WHEN old.keyword_terms IS NOT NULL BEGIN
+        {_uncount('old.keyword_terms')}
+    END
+    ''',
+    # New OCR text is counted again by the ranker
+    f'''
+    CREATE TRIGGER IF NOT EXISTS term_df_update AFTER UPDATE OF ocr_text ON books
+    WHEN old.keyword_terms IS NOT NULL AND old.ocr_text IS NOT new.ocr_text BEGIN
+        {_uncount('old.keyword_terms')}
+        UPDATE books SET keyword_terms = NULL, keywords_corpus = NULL WHERE id = new.id;
+    END
+    ''',
+]
+
+
+def init_keyword_tables(conn, recount=False):
+    """Create the document-frequency tables (records are counted by the ranker)
+
+    With `recount`, the frequencies are started over and every record is
+    left for the ranker to count again: for catalogs counted before records
+    kept their terms, which could not be taken back out.
+    """
+    for statement in KEYWORD_SCHEMA:
+        conn.execute(statement)
+    if recount:
+        conn.execute('DELETE FROM term_df')
+        conn.execute('UPDATE keyword_corpus SET docs = 0 WHERE id = 1')
+        conn.execute('UPDATE books SET keywords_corpus = NULL, keyword_terms = NULL WHERE keywords_corpus IS NOT NULL')
+
+
+def terms(text):
+    """Counter of the candidate terms of an OCR text"""
+    return Counter(term for term in TERM_PATTERN.findall((text or '').lower()) if term not in TERM_STOPWORDS)
+
+
+def counted_terms(counts):
+    """books.keyword_terms value of a document counted into the frequencies"""
+    return json.dumps(sorted(counts))
+
+
+def corpus_size(conn):
+    row = conn.execute('SELECT docs FROM keyword_corpus WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def add_documents(conn, documents):
+    """Count documents (term Counters) into the catalog's document frequencies
+
+    Returns the new corpus size. Run it in the transaction that stores or
+    marks the documents (with their counted_terms), so a document is counted
+    exactly once.
+    """
+    df = Counter()
+    for counts in documents:
+        df.update(counts.keys())
+    conn.executemany('''
+        INSERT INTO term_df (term, docs) VALUES (?, ?)
+        ON CONFLICT (term) DO UPDATE SET docs = docs + excluded.docs
+    ''', df.items())
+    conn.execute('UPDATE keyword_corpus SET docs = docs + ? WHERE id = 1', (len(documents),))
+    return corpus_size(conn)
+
+
+def document_frequencies(conn, wanted):
+    """{term: documents containing it} for the given terms"""
+    wanted = list(wanted)
+    df = {}
+    for start in range(0, len(wanted), LOOKUP_CHUNK):
+        chunk = wanted[start:start + LOOKUP_CHUNK]
+        df.update(conn.execute(
+            f'SELECT term, docs FROM term_df WHERE term IN ({", ".join("?" * len(chunk))})', chunk
+        ).fetchall())
+    return df
+
+
+def rank(counts, df, docs, limit=MAX_KEYWORDS):
+    """Top terms of one document by TF-IDF, best first (ties in reading order)
+
+    tf is the term's share of the document, idf the smoothed
+    log((1 + docs) / (1 + df)) + 1, so a term in every record still counts a
+    little and an unseen one is not infinitely rare.
+    """
+    total = sum(counts.values())
+    if not total:
+        return []
+    scores = {term: count / total * (math.log((1 + docs) / (1 + df.get(term, 0))) + 1)
+              for term, count in counts.items()}
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def _ranked(conn, documents, docs):
+    """Keyword string of each document (None when it has no terms)"""
+    df = document_frequencies(conn, set().union(*documents) if documents else ())
+    return [', '.join(rank(counts, df, docs)) or None for counts in documents]
+
+
+def rank_records(conn, records):
+    """Records [(filename, metadata, ocr_text)] with TF-IDF keywords, counted into the corpus
+
+    For the upload path: run in the transaction that inserts the returned
+    records. Records without usable OCR text keep their extracted keywords.
+    """
+    documents = [terms(ocr_text) for _, _, ocr_text in records]
+    docs = add_documents(conn, documents)
+    ranked = []
+    for (filename, metadata, ocr_text), counts, keywords in zip(records, documents,
+                                                                _ranked(conn, documents, docs)):
+        metadata = dict(metadata, keywords_corpus=docs, keyword_terms=counted_terms(counts))
+        if keywords:
+            metadata['keywords'] = keywords
+        ranked.append((filename, metadata, ocr_text))
+    return ranked
+
+
+class KeywordRanker:
+    """Counts unranked records into the corpus and re-ranks stale ones on a daemon thread"""
+
+    def __init__(self, db_path, batch_size=200, interval=60.0, growth=DEFAULT_GROWTH):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.growth = growth
+
+        self.counted_total = 0
+        self.reranked_total = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Rank one batch; returns the number of records updated
+
+        Records never counted into the document frequencies come first;
+        then those ranked when the catalog was `growth` times smaller.
+        """
+        with storage.transaction(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT id, keywords, ocr_text, keyword_terms FROM books WHERE keywords_corpus IS NULL
+                ORDER BY id LIMIT ?
+            ''', (self.batch_size,)).fetchall()
+            documents = [terms(row['ocr_text']) for row in rows]
+            if rows:
+                # A record whose terms are still in the frequencies is only re-ranked
+                uncounted = [(row, counts) for row, counts in zip(rows, documents) if row['keyword_terms'] is None]
+                docs = add_documents(conn, [counts for _, counts in uncounted])
+                conn.executemany('UPDATE books SET keyword_terms = ? WHERE id = ?',
+                                 [(counted_terms(counts), row['id']) for row, counts in uncounted])
+                self.counted_total += len(uncounted)
+            else:
+                docs = corpus_size(conn)
+                rows = conn.execute('''
+                    SELECT id, keywords, ocr_text FROM books WHERE keywords_corpus <= ?
+                    ORDER BY keywords_corpus LIMIT ?
+                ''', (docs / self.growth, self.batch_size)).fetchall()
+                documents = [terms(row['ocr_text']) for row in rows]
+                self.reranked_total += len(rows)
+
+            ranked = list(zip(rows, _ranked(conn, documents, docs)))
+            conn.executemany('UPDATE books SET keywords_corpus = ? WHERE id = ?',
+                             [(docs, row['id']) for row, _ in ranked])
+            # Writing keywords re-indexes the record for search and bumps the
+            # catalog version (dropping cached charts), so only when they change
+            conn.executemany('''
+                UPDATE books SET keywords = ? WHERE id = ? AND keywords IS NOT ?
+            ''', [(keywords, row['id'], keywords) for row, keywords in ranked if keywords is not None])
+        return len(rows)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                # A full batch means there is more to do; keep going
+                if self.run_once() >= self.batch_size:
+                    continue
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Keyword ranking error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='keyword-ranker', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'corpus_docs': corpus_size(storage.connection(self.db_path)),
+            'counted_total': self.counted_total,
+            'reranked_total': self.reranked_total,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,123 @@
+"""
+LIS Book Scanner - Metadata extraction
+Turns raw OCR text into catalog fields (title, author, year, ISBN, publisher,
+keywords). Kept free of Flask so OCR worker processes can import it cheaply.
+"""
+
+import re
+
+# Simple OCR simulation for when Tesseract isn't available
+def simulate_ocr(filename):
+    """Simulate OCR results for demo purposes"""
+    sample_texts = [
+        "The Great Gatsby\nBy F. Scott Fitzgerald\nCopyright 1925\nISBN 978-0-7432-7356-5\nScribner Publishing",
+        "To Kill a Mockingbird\nBy Harper Lee\nCopyright 1960\nISBN 978-0-06-112008-4\nHarper & Row Publishers",
+        "1984\nBy George Orwell\nCopyright 1949\nISBN 978-0-452-28423-4\nSecker & Warburg",
+        "Pride and Prejudice\nBy Jane Austen\nCopyright 1813\nISBN 978-0-14-143951-8\nT. Egerton Publishers"
+    ]
+    
+    # Use filename to determine which sample to return
+    index = abs(hash(filename)) % len(sample_texts)
+    return sample_texts[index]
+
+# Patterns and word lists are built once, not per record. Case-insensitive
+# ones run on the lowercased text: re can then skip ahead to the first
+# letter of a literal instead of trying every position.
+LINE_PATTERN = re.compile(r'[^\n]+')
+AUTHOR_PATTERN = re.compile(r'^[^\S\n]*by (.*)$', re.MULTILINE)
+PUBLISHER_PATTERN = re.compile(r'publisher|publishing|press|books')
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+ISBN_PATTERN = re.compile(r'isbn[\s:-]*(\d{1,5}[-\s]?\d{1,7}[-\s]?\d{1,7}[-\s]?[\dx])')
+KEYWORD_PATTERN = re.compile(r'\b[a-z]{5,}\b')
+ISBN_SEPARATORS = str.maketrans('', '', ' -')
+
+# Lines that start like this are never the title
+TITLE_SKIP = ('by', 'copyright', 'isbn', 'published')
+
+STOPWORDS = frozenset({
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our',
+    'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'new', 'now', 'old', 'see', 'two', 'way',
+    'who', 'boy', 'did', 'man', 'may', 'she', 'use', 'your', 'been', 'from', 'have', 'they', 'know',
+    'want', 'were', 'what', 'when', 'with', 'would', 'make', 'time', 'very', 'will', 'into', 'said',
+    'each', 'which', 'their', 'called', 'other', 'many', 'after', 'first', 'well', 'water',
+})
+
+MAX_KEYWORDS = 10
+
+
+def _line_at(text, pos):
+    """The stripped line of text containing position pos"""
+    start = text.rfind('\n', 0, pos) + 1
+    end = text.find('\n', pos)
+    return text[start:end if end != -1 else len(text)].strip()
+
+
+# Enhanced metadata extraction
+def extract_metadata(text, filename=None):
+    """Extract book metadata from OCR text
+
+    Every field is found by one scan that stops at its first hit: lines are
+    only walked until the title, the other fields are single searches with
+    precompiled patterns. Keywords are the first ten distinct non-stopwords
+    of five or more letters, in reading order.
+    """
+    metadata = {
+        'title': 'Unknown Title',
+        'author': 'Unknown Author',
+        'year': None,
+        'isbn': None,
+        'publisher': 'Unknown Publisher',
+        'keywords': ''
+    }
+    
+    if not text:
+        return metadata
+    lower = text.lower()
+    if len(lower) != len(text):
+        # A few non-ASCII letters lowercase to two characters; keep offsets aligned
+        lower = ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    
+    # Extract title (usually first meaningful line)
+    for match in LINE_PATTERN.finditer(text):
+        line = match.group().strip()
+        if len(line) > 3 and not line.lower().startswith(TITLE_SKIP):
+            metadata['title'] = line
+            break
+    
+    # Extract author
+    author_match = AUTHOR_PATTERN.search(lower)
+    if author_match:
+        metadata['author'] = text[author_match.start(1):author_match.end(1)].strip()
+    
+    # Extract year
+    year_match = YEAR_PATTERN.search(text)
+    if year_match:
+        metadata['year'] = int(year_match.group())
+    
+    # Extract ISBN
+    isbn_match = ISBN_PATTERN.search(lower)
+    if isbn_match:
+        metadata['isbn'] = text[isbn_match.start(1):isbn_match.end(1)].translate(ISBN_SEPARATORS)
+    
+    # Extract publisher: the line of the first publishing word
+    publisher_match = PUBLISHER_PATTERN.search(lower)
+    if publisher_match:
+        metadata['publisher'] = _line_at(text, publisher_match.start())
+    
+    # Generate keywords
+    keywords, seen = [], set()
+    for match in KEYWORD_PATTERN.finditer(lower):
+        word = match.group()
+        if word not in seen and word not in STOPWORDS:
+            keywords.append(word)
+            if len(keywords) == MAX_KEYWORDS:
+                break
+        seen.add(word)
+    metadata['keywords'] = ', '.join(keywords)
+    
+    return metadata
+
+
+def extract_many(texts):
+    """extract_metadata() of each OCR text, for bulk re-extraction of the catalog"""
+    return [extract_metadata(text) for text in texts]
@@ -0,0 +1,290 @@
+"""
+LIS Book Scanner - Request and stage metrics
+Counters and latency histograms kept in process memory and served on
+/metrics in the Prometheus text format. Every request gets a trace ID
+(X-Request-ID, generated unless the client sent one); the stages timed while
+it runs - and while the ingest job it queued runs on the worker threads -
+are logged with that ID as one line per request, file or job.
+
+Recording a sample is a lock, a bisect and a couple of additions, so the
+hooks stay on under load. Each process has its own registry: OCR worker
+processes send their stage timings back with their results and they are
+recorded here, but several gunicorn workers are scraped one by one.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import math
+import re
+import threading
+import time
+import uuid
+
+# Seconds; spans a cached OCR lookup up to a slow EasyOCR re-read
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+TRACE_HEADER = 'X-Request-ID'
+
+# Client-supplied trace IDs are echoed into logs and headers, so keep them tame
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in values]
+
+
+class Histogram:
+    """Observation counts in cumulative `le` buckets, with sum and count, per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = sorted((key, (list(counts), total, count))
+                              for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(round(total, 6))}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Registry:
+    """The metrics of this process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'lis_http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+http_latency = registry.histogram(
+    'lis_http_request_duration_seconds', 'Time to produce a response, by route and method', ('route', 'method'))
+stage_latency = registry.histogram(
+    'lis_stage_duration_seconds', 'Time spent per pipeline stage (save, ocr, store, openlibrary, ...)', ('stage',))
+stage_errors = registry.counter(
+    'lis_stage_errors_total', 'Stages that raised, by stage', ('stage',))
+
+
+class Trace:
+    """Stage timings of one request, file or job, logged under a trace ID"""
+
+    def __init__(self, trace_id=None, label=''):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.label = label
+        self.stages = []
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self.stages.append((stage, seconds))
+
+    def summary(self):
+        """One log line: total and per-stage milliseconds, repeated stages summed"""
+        totals, counts = {}, {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+            counts[stage] = counts.get(stage, 0) + 1
+        total = (time.perf_counter() - self.started) * 1000
+        return (f"⏱️ [{self.id}] {self.label} {total:.0f}ms: "
+                + ", ".join(f"{stage}={seconds * 1000:.0f}ms" + (f" x{counts[stage]}" if counts[stage] > 1 else '')
+                            for stage, seconds in totals.items()))
+
+    def log(self):
+        print(self.summary())
+
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace(label, trace_id=None):
+    """Make a new trace current; returns the token end_trace() needs
+
+    Without an ID the trace continues the current one's (a request's ingest
+    work logs under the request's ID).
+    """
+    parent = _current.get()
+    return _current.set(Trace(trace_id or (parent.id if parent else None), label))
+
+
+def end_trace(token, log=True):
+    """Restore the previous trace, logging this one if it timed any stage"""
+    trace = _current.get()
+    try:
+        _current.reset(token)
+    except ValueError:  # the token belongs to another context
+        _current.set(None)
+    if log and trace is not None and trace.stages:
+        trace.log()
+    return trace
+
+
+@contextlib.contextmanager
+def trace(label, trace_id=None, log=True):
+    token = start_trace(label, trace_id)
+    try:
+        yield _current.get()
+    finally:
+        end_trace(token, log)
+
+
+def record(stage, seconds):
+    """Count `seconds` of `stage` into the histogram and the current trace"""
+    stage_latency.observe(seconds, stage=stage)
+    current = _current.get()
+    if current is not None:
+        current.add(stage, seconds)
+
+
+def record_timings(timings_ms):
+    """Record {stage: milliseconds}, as timed by an OCR worker process"""
+    for stage, ms in timings_ms.items():
+        record(stage, ms / 1000)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as `name`; a block that raises also counts as an error"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=name)
+        raise
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def instrument(app, skip=('/metrics',)):
+    """Time every request of a Flask app and give it a trace ID
+
+    Routes are labelled by their rule (/jobs/<job_id>), so the number of
+    series stays bounded; `skip` routes are not counted.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        requested = request.headers.get(TRACE_HEADER, '')
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = start_trace(f"{request.method} {request.path}",
+                                      requested if TRACE_ID_PATTERN.match(requested) else None)
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        if route not in skip:
+            http_requests.inc(route=route, method=request.method, status=response.status_code)
+            http_latency.observe(time.perf_counter() - start, route=route, method=request.method)
+        current = current_trace()
+        if current is not None:
+            current.label = f"{current.label} {response.status_code}"
+            response.headers[TRACE_HEADER] = current.id
+        return response
+
+    @app.teardown_request
+    def _end_request(error=None):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            end_trace(token)
+
+    return app
@@ -0,0 +1,178 @@
+"""
+LIS Book Scanner - Content-addressed OCR result cache
+OCR output is stored in a SQLite side table keyed by a hash of the image bytes
+plus the engine and preprocessing config, so re-uploading the same photo skips
+OCR entirely. Least recently used entries are evicted once the cache grows
+past its byte budget. Lookups only read: hit/miss counts and last-used times
+are gathered in memory and written with the next store or every
+FLUSH_EVERY lookups, so a cache hit never waits for the write lock.
+"""
+
+import hashlib
+import threading
+import time
+
+import storage
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bumped whenever what goes into a key changes meaning; entries under an
+# older schema are never hit again and age out through LRU eviction
+KEY_VERSION = 2
+
+# Lookups counted in memory before their counters and last-used times are written
+FLUSH_EVERY = 64
+
+
+def cache_key(image_bytes, engine, config=''):
+    """Hash of the image content and everything that affects the OCR output"""
+    digest = hashlib.sha256(b'v%d\0' % KEY_VERSION)
+    digest.update(image_bytes)
+    digest.update(b'\0' + engine.encode('utf-8'))
+    digest.update(b'\0' + config.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_cache_key(filepath, engine, config=''):
+    with open(filepath, 'rb') as f:
+        return cache_key(f.read(), engine, config)
+
+
+class OCRCache:
+    """LRU OCR cache shared by every process that opens the same database"""
+
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._touched = {}  # key -> last hit time, not yet written
+        self._lock = threading.Lock()
+
+        with storage.transaction(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    engine TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used
+                ON ocr_cache (last_used)
+            ''')
+            # Counters live in the database so every worker process adds to them
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_cache_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    evictions INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('INSERT OR IGNORE INTO ocr_cache_stats (id) VALUES (1)')
+
+    def get(self, key):
+        """Cached OCR text for a key, or None on a miss"""
+        row = storage.connection(self.db_path).execute(
+            'SELECT text FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._touched[key] = time.time()
+            due = self._hits + self._misses >= FLUSH_EVERY
+        if due:
+            self.flush()
+        return row[0] if row else None
+
+    def flush(self, conn=None):
+        """Write the counters and last-used times gathered since the last flush"""
+        with self._lock:
+            hits, misses, touched = self._hits, self._misses, self._touched
+            self._hits, self._misses, self._touched = 0, 0, {}
+        if not (hits or misses):
+            return
+        if conn is None:
+            with storage.transaction(self.db_path) as conn:
+                self._write_counts(conn, hits, misses, touched)
+        else:
+            self._write_counts(conn, hits, misses, touched)
+
+    @staticmethod
+    def _write_counts(conn, hits, misses, touched):
+        conn.execute('UPDATE ocr_cache_stats SET hits = hits + ?, misses = misses + ? WHERE id = 1',
+                     (hits, misses))
+        conn.executemany('UPDATE ocr_cache SET last_used = MAX(last_used, ?) WHERE key = ?',
+                         [(used, key) for key, used in touched.items()])
+
+    def put(self, key, engine, text):
+        """Store OCR text and evict old entries if over budget"""
+        size = len(text.encode('utf-8'))
+        now = time.time()
+        with storage.transaction(self.db_path) as conn:
+            # Recent hits must count before eviction picks the least recently used
+            self.flush(conn)
+            old = conn.execute('SELECT size FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO ocr_cache (key, engine, text, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, engine, text, size, now, now))
+            conn.execute('UPDATE ocr_cache_stats SET bytes = bytes + ? WHERE id = 1',
+                         (size - (old[0] if old else 0),))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT bytes FROM ocr_cache_stats WHERE id = 1').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        evicted = []
+        for key, size in conn.execute('SELECT key, size FROM ocr_cache ORDER BY last_used'):
+            if total - freed <= self.max_bytes:
+                break
+            evicted.append((key,))
+            freed += size
+
+        conn.executemany('DELETE FROM ocr_cache WHERE key = ?', evicted)
+        conn.execute('''
+            UPDATE ocr_cache_stats SET bytes = bytes - ?, evictions = evictions + ?
+            WHERE id = 1
+        ''', (freed, len(evicted)))
+
+    def clear(self):
+        with self._lock:
+            self._hits, self._misses, self._touched = 0, 0, {}
+        with storage.transaction(self.db_path) as conn:
+            conn.execute('DELETE FROM ocr_cache')
+            conn.execute('UPDATE ocr_cache_stats SET hits = 0, misses = 0, evictions = 0, bytes = 0')
+
+    def stats(self):
+        """Hit/miss counters and size of the cache
+
+        Includes this process's pending lookups; other worker processes'
+        show up once they flush.
+        """
+        self.flush()
+        conn = storage.connection(self.db_path)
+        hits, misses, evictions, size = conn.execute(
+            'SELECT hits, misses, evictions, bytes FROM ocr_cache_stats WHERE id = 1'
+        ).fetchone()
+        entries = conn.execute('SELECT COUNT(*) FROM ocr_cache').fetchone()[0]
+
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'evictions': evictions,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,226 @@
+"""
+LIS Book Scanner - Shared OCR/NLP model registry
+Loads the EasyOCR reader, the spaCy pipeline, the Tesseract config and engine
+once per worker process and hands the same instances to every request.
+"""
+
+import os
+import threading
+import time
+
+# Default Windows install location used by the original app
+WINDOWS_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+
+def current_rss_bytes():
+    """Resident set size of this process in bytes (0 if it cannot be read)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, ValueError):
+        return 0
+
+
+def _load_easyocr_reader():
+    import easyocr
+    return easyocr.Reader(["en"], gpu=False)
+
+
+def _load_spacy_nlp():
+    """NER-only spaCy pipeline used for author detection"""
+    from authors import load_ner
+    try:
+        return load_ner()
+    except OSError:
+        print("⚠ Warning: spaCy English model not found. Please install it:")
+        print("  python -m spacy download en_core_web_sm")
+        return None
+
+
+def _load_nltk():
+    import nltk
+    # Tokenizer and tagger data; a network fetch the first time
+    nltk.download("punkt", quiet=True)
+    nltk.download("averaged_perceptron_tagger", quiet=True)
+    return nltk
+
+
+def _load_tesseract_config():
+    import pytesseract
+    cmd = os.environ.get('TESSERACT_CMD')
+    if not cmd and os.path.exists(WINDOWS_TESSERACT_CMD):
+        cmd = WINDOWS_TESSERACT_CMD
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return {
+        'cmd': pytesseract.pytesseract.tesseract_cmd,
+        'config': os.environ.get('TESSERACT_CONFIG', '--psm 6'),
+    }
+
+
+def _load_tesseract_engine():
+    """Long-lived Tesseract backend (see TESSERACT_BACKEND); None if not installed"""
+    from tesseract_engine import create_engine, PYTESSERACT_AVAILABLE
+    if PYTESSERACT_AVAILABLE:
+        _load_tesseract_config()  # applies TESSERACT_CMD for the subprocess backend
+    return create_engine()
+
+
+class ModelRegistry:
+    """Lazily initialised, thread-safe cache of heavy OCR/NLP models
+
+    Each model has its own load lock, so a request needing a cheap model is
+    not held up while warmup() loads a slow one.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    def _model_lock(self, name):
+        with self._lock:
+            return self._model_locks.setdefault(name, threading.Lock())
+
+    def register(self, name, loader):
+        """Register a zero-argument loader for a model name"""
+        self._loaders[name] = loader
+
+    def get(self, name):
+        """Return the model, loading it on first use"""
+        if name in self._models:
+            return self._models[name]
+
+        with self._model_lock(name):
+            # Another thread may have finished loading while we waited
+            if name in self._models:
+                return self._models[name]
+
+            loader = self._loaders[name]
+            self._loading.add(name)
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = loader()
+                error = None
+            except Exception as e:
+                print(f"⚠ Failed to load {name}: {e}")
+                model = None
+                error = str(e)
+            finally:
+                self._loading.discard(name)
+
+            self._stats[name] = {
+                'loaded': model is not None,
+                'load_seconds': round(time.perf_counter() - start, 4),
+                'rss_delta_bytes': max(current_rss_bytes() - rss_before, 0),
+                'loaded_at': time.time(),
+                'error': error,
+            }
+            self._models[name] = model
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def state(self, name):
+        """'warm', 'loading', 'cold' or 'failed' (loaded as None)"""
+        if name in self._models:
+            return 'warm' if self._models[name] is not None else 'failed'
+        return 'loading' if name in self._loading else 'cold'
+
+    def warmup(self, names, background=True):
+        """Load models (and warm their engines) ahead of the first request
+
+        Returns the daemon thread doing it, or None when run in the foreground.
+        """
+        def load():
+            for name in names:
+                model = self.get(name)
+                # Engines with per-call state (e.g. Tesseract API handles) prepare it too
+                if hasattr(model, 'warm'):
+                    try:
+                        model.warm()
+                    except Exception as e:
+                        print(f"⚠ Failed to warm {name}: {e}")
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def readiness(self, names):
+        """(True once none of `names` is still cold or loading, {name: state})"""
+        states = {name: self.state(name) for name in names}
+        return all(state in ('warm', 'failed') for state in states.values()), states
+
+    def reset(self, name=None):
+        """Drop one (or every) cached model so the next get() reloads it"""
+        with self._lock:
+            names = [name] if name else list(self._models)
+            for n in names:
+                self._models.pop(n, None)
+                self._stats.pop(n, None)
+
+    def stats(self):
+        """Load time and memory footprint of every registered model"""
+        models = {name: dict(self._stats.get(name, {'loaded': False})) for name in self._loaders}
+        for name, model in self._models.items():
+            # Engines that time their calls report it alongside the load cost
+            if hasattr(model, 'latency'):
+                models[name]['latency'] = model.latency()
+        return {
+            'process_rss_bytes': current_rss_bytes(),
+            'models': models,
+        }
+
+    @property
+    def easyocr_reader(self):
+        return self.get('easyocr')
+
+    @property
+    def nlp(self):
+        return self.get('spacy')
+
+    @property
+    def nltk(self):
+        return self.get('nltk')
+
+    @property
+    def tesseract(self):
+        return self.get('tesseract')
+
+    @property
+    def tesseract_engine(self):
+        return self.get('tesseract_engine')
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released
+        self._lock = threading.Lock()
+        self._model_locks = {}
+        self._loading = set()
+
+
+registry = ModelRegistry()
+registry.register('easyocr', _load_easyocr_reader)
+registry.register('spacy', _load_spacy_nlp)
+registry.register('nltk', _load_nltk)
+registry.register('tesseract', _load_tesseract_config)
+registry.register('tesseract_engine', _load_tesseract_engine)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._after_fork)
@@ -0,0 +1,149 @@
+"""
+LIS Book Scanner - Open Library enrichment client
+Looks up ISBNs through the Open Library Books API using a pooled HTTP session,
+batches many ISBNs into one `bibkeys=` request and remembers both hits and
+misses in a SQLite cache so repeat lookups never touch the network.
+"""
+
+import json
+import os
+import re
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import storage
+
+DEFAULT_BASE_URL = 'https://openlibrary.org'
+
+DAY = 24 * 60 * 60
+
+
+class EnrichmentError(Exception):
+    """Open Library could not be reached or returned an unusable response"""
+
+
+def normalize_isbn(isbn):
+    """Strip separators; returns None for values that can't be an ISBN"""
+    if not isbn:
+        return None
+    isbn = re.sub(r'[^0-9Xx]', '', str(isbn)).upper()
+    return isbn if len(isbn) in (10, 13) else None
+
+
+def to_metadata(record):
+    """Map an Open Library `jscmd=data` record onto catalog fields"""
+    metadata = {}
+    if record.get('title'):
+        metadata['title'] = record['title']
+    if record.get('authors'):
+        metadata['author'] = record['authors'][0].get('name')
+    year = re.search(r'\d{4}', record.get('publish_date', ''))
+    if year:
+        metadata['year'] = int(year.group())
+    if record.get('publishers'):
+        metadata['publisher'] = record['publishers'][0].get('name')
+    return {k: v for k, v in metadata.items() if v}
+
+
+class OpenLibraryClient:
+    """Pooled, batched and cached client for /api/books"""
+
+    def __init__(self, base_url=None, cache_db=None, timeout=5, batch_size=50,
+                 positive_ttl=30 * DAY, negative_ttl=DAY, pool_size=4):
+        self.base_url = (base_url or os.environ.get('OPENLIBRARY_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.cache_db = cache_db
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+
+        # One keep-alive connection pool reused for every lookup
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = 'LIS-Book-Scanner (+https://github.com/sgared/LIS-book-scanner)'
+
+        if cache_db:
+            with storage.transaction(cache_db) as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS enrichment_cache (
+                        isbn TEXT PRIMARY KEY,
+                        found INTEGER NOT NULL,
+                        data TEXT,
+                        fetched_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+
+    def _cached(self, isbns):
+        """{isbn: record or None} for ISBNs with a fresh cache entry"""
+        if not self.cache_db or not isbns:
+            return {}
+        placeholders = ','.join('?' * len(isbns))
+        rows = storage.connection(self.cache_db).execute(f'''
+            SELECT isbn, found, data FROM enrichment_cache
+            WHERE isbn IN ({placeholders}) AND expires_at > ?
+        ''', (*isbns, time.time())).fetchall()
+        return {isbn: json.loads(data) if found else None for isbn, found, data in rows}
+
+    def _store(self, results):
+        if not self.cache_db or not results:
+            return
+        now = time.time()
+        with storage.transaction(self.cache_db) as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO enrichment_cache (isbn, found, data, fetched_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (isbn, 1 if record else 0, json.dumps(record) if record else None, now,
+                 now + (self.positive_ttl if record else self.negative_ttl))
+                for isbn, record in results.items()
+            ])
+
+    def _fetch(self, isbns):
+        """One /api/books request for up to batch_size ISBNs"""
+        try:
+            with metrics.stage('openlibrary'):
+                resp = self.session.get(
+                    f'{self.base_url}/api/books',
+                    params={
+                        'bibkeys': ','.join(f'ISBN:{isbn}' for isbn in isbns),
+                        'format': 'json',
+                        'jscmd': 'data',
+                    },
+                    timeout=self.timeout
+                )
+                resp.raise_for_status()
+                data = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            raise EnrichmentError(str(e)) from e
+        return {isbn: data.get(f'ISBN:{isbn}') for isbn in isbns}
+
+    def lookup_many(self, isbns):
+        """{isbn: Open Library record or None}; raises EnrichmentError on failure
+
+        Keys are the normalised ISBNs; values that aren't ISBNs are skipped.
+        """
+        wanted = list(dict.fromkeys(filter(None, map(normalize_isbn, isbns))))
+        results = self._cached(wanted)
+
+        missing = [isbn for isbn in wanted if isbn not in results]
+        for start in range(0, len(missing), self.batch_size):
+            fetched = self._fetch(missing[start:start + self.batch_size])
+            self._store(fetched)
+            results.update(fetched)
+        return results
+
+    def lookup(self, isbn):
+        """Open Library record for one ISBN, or None if it isn't known"""
+        isbn = normalize_isbn(isbn)
+        if not isbn:
+            return None
+        return self.lookup_many([isbn]).get(isbn)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,490 @@
+"""
+LIS Book Scanner - Per-image OCR pipeline
+Preprocess -> OCR -> metadata extraction for one image, plus an executor that
+fans a batch of images out over worker processes and returns the results in
+upload order.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metadata import simulate_ocr, extract_metadata
+from ocr_cache import OCRCache, DEFAULT_MAX_BYTES, file_cache_key
+from ocr_models import registry
+import barcode
+
+# Try to import optional dependencies gracefully
+try:
+    from tesseract_engine import TESSERACT_AVAILABLE
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+try:
+    from preprocess import Preprocessor, parse_stages
+    import regions
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+EXECUTOR_MODES = ('process', 'thread', 'serial')
+
+# Everything that changes OCR output must be part of the cache key
+OCR_ENGINE = 'tesseract'
+
+# OCR result cache of this process, set up by configure_cache()
+_cache = None
+
+# Preprocessing stages of this process (OCR_PREPROCESS), see configure_preprocessing()
+_preprocessor = Preprocessor.from_env() if PIL_AVAILABLE else None
+
+# Text-region detection method (OCR_REGIONS), or None to OCR whole images
+_regions_method = regions.method_from_env() if PIL_AVAILABLE else None
+
+# Barcode ISBN fast path (OCR_BARCODE): 'off', 'hint' or 'skip'
+_barcode_mode = barcode.mode_from_env() if PIL_AVAILABLE else 'off'
+
+# Tesseract layout mode for a montage of text regions: one column of blocks
+MONTAGE_CONFIG = '--psm 4'
+
+
+def limit_native_threads(threads=1):
+    """Cap the thread pools inside Tesseract/OpenMP/OpenCV for this process
+
+    With N worker processes each running a multi-threaded Tesseract, the
+    machine would otherwise run N * cores threads and thrash.
+    """
+    threads = str(max(int(threads), 1))
+    # Inherited by the tesseract subprocess that pytesseract spawns, and read
+    # by libtesseract when the tesserocr backend first loads it
+    os.environ['OMP_THREAD_LIMIT'] = threads
+    os.environ['OMP_NUM_THREADS'] = threads
+    try:
+        import cv2
+        cv2.setNumThreads(int(threads))
+    except ImportError:
+        pass
+
+
+def configure_cache(cache_db=None, max_bytes=DEFAULT_MAX_BYTES):
+    """Enable (or with no path, disable) the OCR result cache in this process"""
+    global _cache
+    _cache = OCRCache(cache_db, max_bytes=max_bytes) if cache_db else None
+
+
+def configure_preprocessing(stages=None):
+    """Use these stages (a list or 'normalize,deskew' spec) in this process
+
+    None keeps the OCR_PREPROCESS configuration.
+    """
+    global _preprocessor
+    if PIL_AVAILABLE:
+        if stages is None:
+            _preprocessor = Preprocessor.from_env()
+        else:
+            if isinstance(stages, str):
+                stages = parse_stages(stages)
+            _preprocessor = Preprocessor(stages=stages,
+                                         target_dpi=_preprocessor.target_dpi,
+                                         page_inches=_preprocessor.page_inches)
+
+
+def configure_regions(method=None):
+    """Detect text regions with `method` in this process ('off' disables)
+
+    None keeps the OCR_REGIONS configuration.
+    """
+    global _regions_method
+    if PIL_AVAILABLE:
+        _regions_method = regions.method_from_env() if method is None else regions.parse_method(method)
+
+
+def configure_barcode(mode=None):
+    """Barcode mode of this process; None keeps the OCR_BARCODE configuration"""
+    global _barcode_mode
+    if PIL_AVAILABLE:
+        _barcode_mode = barcode.mode_from_env() if mode is None else barcode.parse_mode(mode)
+
+
+def configure_worker(ocr_threads=1, cache_db=None, cache_max_bytes=DEFAULT_MAX_BYTES, preprocess=None,
+                     text_regions=None, barcode_mode=None):
+    """Initializer for pool worker processes"""
+    limit_native_threads(ocr_threads)
+    configure_cache(cache_db, cache_max_bytes)
+    if preprocess is not None:
+        configure_preprocessing(preprocess)
+    if text_regions is not None:
+        configure_regions(text_regions)
+    if barcode_mode is not None:
+        configure_barcode(barcode_mode)
+    warm_worker()
+
+
+def warm_worker():
+    """Load this process's Tesseract engine (and its API handle) before the first image"""
+    engine = registry.tesseract_engine if TESSERACT_AVAILABLE else None
+    if hasattr(engine, 'warm'):
+        try:
+            engine.warm()
+        except Exception as e:
+            print(f"⚠️ Tesseract warmup failed: {e}")
+    return os.getpid()
+
+
+def ocr_config():
+    """Backend, preprocessing and region part of the OCR cache key
+
+    The Tesseract backend and version are included: tesserocr and the
+    subprocess, or two Tesseract releases, do not read an image identically.
+    """
+    engine = registry.tesseract_engine
+    backend = f'{engine.name}:{engine.version}' if engine is not None else 'none'
+    reading = f'regions:{_regions_method}|{MONTAGE_CONFIG}' if _regions_method else 'regions:off'
+    return f'{backend}|pil|{_preprocessor.signature}|{reading}'
+
+
+def preprocess_image(filepath, timings=None, image=None):
+    """Load and preprocess an image for OCR, adding stage times to `timings`
+
+    `image` skips loading when the file was already loaded for barcode scanning.
+    """
+    image, stage_times = _preprocessor.run(filepath, image)
+    if timings is not None:
+        timings.update(stage_times)
+    return image
+
+
+def tesseract_text(image, timings, layout=None):
+    """Tesseract text of a preprocessed image, reading only its text regions
+
+    The regions are cropped into one montage so Tesseract runs once over a
+    fraction of the pixels. Each region's place on the page, as fractions of
+    the image, is appended to `layout` with its text.
+    """
+    found = None
+    if _regions_method is not None:
+        start = time.perf_counter()
+        found = regions.find_regions(image, _regions_method)
+        timings['regions'] = time.perf_counter() - start
+
+    # This worker's long-lived engine (TESSERACT_BACKEND)
+    engine = registry.tesseract_engine
+    start = time.perf_counter()
+    if found is None:
+        text = engine.image_to_string(image)
+    else:
+        canvas, bands = regions.montage(image, found)
+        data = engine.image_to_data(canvas, config=MONTAGE_CONFIG)
+        regions.assign_words(data, found, bands)
+        text = '\n'.join(region.text for region in found if region.text)
+        if layout is not None:
+            layout.extend(region.to_dict(image.size) for region in found)
+    timings['ocr'] = time.perf_counter() - start
+    return text
+
+
+def read_barcode(filepath, timings):
+    """(loaded image, barcode ISBN or None); the image is reused for OCR"""
+    try:
+        start = time.perf_counter()
+        image = _preprocessor.load(filepath)
+        image.load()
+        timings['load'] = time.perf_counter() - start
+    except OSError as e:
+        print(f"Barcode scan error: {e}")
+        return None, None
+    start = time.perf_counter()
+    try:
+        isbn = barcode.find_isbn(image)
+    except Exception as e:
+        # The fast path is optional: a decoder failure is a miss and OCR goes ahead
+        print(f"Barcode scan error: {e}")
+        isbn = None
+    timings['barcode'] = time.perf_counter() - start
+    return image, isbn
+
+
+def ocr_image(filepath, filename, timings=None, layout=None, image=None):
+    """OCR one image, falling back to simulated text when OCR is unavailable
+
+    Returns (text, source) where source is 'cache', 'tesseract' or 'simulated'.
+    Seconds spent per stage are added to `timings` and the text regions read
+    to `layout` if given (cached results have no layout). `image` is the
+    file already loaded by read_barcode(), if it was.
+    """
+    timings = {} if timings is None else timings
+    if TESSERACT_AVAILABLE and PIL_AVAILABLE:
+        try:
+            key = None
+            if _cache is not None:
+                start = time.perf_counter()
+                key = file_cache_key(filepath, OCR_ENGINE, ocr_config())
+                cached = _cache.get(key)
+                timings['cache'] = time.perf_counter() - start
+                if cached is not None:
+                    return cached, 'cache'
+
+            image = preprocess_image(filepath, timings, image)
+            text = tesseract_text(image, timings, layout)
+            if key is not None:
+                _cache.put(key, OCR_ENGINE, text)
+            return text, OCR_ENGINE
+        except Exception as e:
+            print(f"OCR error: {e}")
+    return simulate_ocr(filename), 'simulated'
+
+
+def process_image(filepath, filename):
+    """Run the full per-image pipeline; safe to call in a worker process
+
+    `timings` in the result holds milliseconds per stage (load, barcode,
+    normalize, ..., regions, ocr, metadata) for this image and `regions` the
+    text regions OCR read, if it cropped any. A barcode ISBN wins over one
+    read by OCR; in 'skip' mode OCR does not run at all once one is found and
+    the record's other fields are left to enrichment.
+    """
+    timings = {}
+    layout = []
+    image, isbn = None, None
+    if _barcode_mode != 'off':
+        image, isbn = read_barcode(filepath, timings)
+
+    if isbn and _barcode_mode == 'skip':
+        ocr_text, ocr_source = '', 'barcode'
+    else:
+        ocr_text, ocr_source = ocr_image(filepath, filename, timings, layout, image)
+    start = time.perf_counter()
+    metadata = extract_metadata(ocr_text, filename)
+    if isbn:
+        metadata['isbn'] = isbn
+    timings['metadata'] = time.perf_counter() - start
+    return {
+        'filename': filename,
+        'ocr_text': ocr_text,
+        'ocr_source': ocr_source,
+        'isbn_source': 'barcode' if isbn else ('ocr' if metadata['isbn'] else None),
+        'metadata': metadata,
+        'timings': {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()},
+        'regions': layout,
+        'status': 'success'
+    }
+
+
+def _process_item(item):
+    filepath, filename = item
+    return process_image(filepath, filename)
+
+
+def default_workers():
+    """Number of cores this process may use (respects container CPU affinity)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return max(os.cpu_count() or 1, 1)
+
+
+class StageStats:
+    """Running per-stage totals over processed images, for /health
+
+    Shows where per-image time goes and how often the barcode fast path
+    found the ISBN (and, in 'skip' mode, saved the OCR run).
+    """
+
+    def __init__(self):
+        self.images = 0
+        self.stage_runs = {}
+        self.stage_ms = {}
+        self.ocr_sources = {}
+        self.isbn_sources = {'barcode': 0, 'ocr': 0, 'none': 0}
+        self._lock = threading.Lock()
+
+    def record(self, result):
+        with self._lock:
+            self.images += 1
+            for stage, ms in result.get('timings', {}).items():
+                self.stage_runs[stage] = self.stage_runs.get(stage, 0) + 1
+                self.stage_ms[stage] = self.stage_ms.get(stage, 0.0) + ms
+            source = result.get('ocr_source')
+            self.ocr_sources[source] = self.ocr_sources.get(source, 0) + 1
+            self.isbn_sources[result.get('isbn_source') or 'none'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            scanned = self.stage_runs.get('barcode', 0)
+            return {
+                'images': self.images,
+                'barcode_hits': self.isbn_sources['barcode'],
+                'barcode_hit_rate': round(self.isbn_sources['barcode'] / scanned, 3) if scanned else 0.0,
+                'ocr_skipped': self.ocr_sources.get('barcode', 0),
+                'ocr_sources': dict(self.ocr_sources),
+                'isbn_sources': dict(self.isbn_sources),
+                'stages': {stage: {'runs': runs, 'mean_ms': round(self.stage_ms[stage] / runs, 1)}
+                           for stage, runs in self.stage_runs.items()},
+            }
+
+
+class PipelineExecutor:
+    """Runs process_image() serially, in threads or in worker processes
+
+    `ocr_threads` is the number of threads each Tesseract call may use; keep
+    workers * ocr_threads at or below the number of cores.
+    """
+
+    def __init__(self, workers=None, mode='process', ocr_threads=1,
+                 cache_db=None, cache_max_bytes=DEFAULT_MAX_BYTES, preprocess=None, text_regions=None,
+                 barcode_mode=None):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.workers = workers or default_workers()
+        self.mode = 'serial' if self.workers == 1 and mode == 'process' else mode
+        self.ocr_threads = ocr_threads
+        self.cache_db = cache_db
+        self.cache_max_bytes = cache_max_bytes
+        self.preprocess = preprocess
+        self.text_regions = text_regions
+        self.barcode_mode = barcode_mode
+        self.stage_stats = StageStats()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._warm = threading.Event()
+
+        if self.mode != 'process':
+            configure_cache(cache_db, cache_max_bytes)
+            if preprocess is not None:
+                configure_preprocessing(preprocess)
+            if text_regions is not None:
+                configure_regions(text_regions)
+            if barcode_mode is not None:
+                configure_barcode(barcode_mode)
+
+    def _pool(self):
+        # Ingest job threads may submit the first images at the same time
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=configure_worker,
+                        initargs=(self.ocr_threads, self.cache_db, self.cache_max_bytes, self.preprocess,
+                                  self.text_regions, self.barcode_mode)
+                    )
+                elif self.mode == 'thread':
+                    limit_native_threads(self.ocr_threads)
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='ocr'
+                    )
+            return self._executor
+
+    def warmup(self, background=True):
+        """Start the workers and load their engines ahead of the first upload
+
+        Returns the thread doing it, or None when run in the foreground.
+        """
+        futures = []
+        if self.mode != 'serial':
+            # Workers are forked here rather than in the warmup thread: a fork
+            # taken while another thread is importing can deadlock the child.
+            # Every worker runs the initializer (which warms it) when it starts.
+            pool = self._pool()
+            futures = [pool.submit(warm_worker) for _ in range(self.workers)]
+
+        def start():
+            try:
+                if self.mode == 'serial':
+                    warm_worker()
+                for future in futures:
+                    future.result()
+            except Exception as e:
+                print(f"⚠️ OCR worker warmup failed: {e}")
+            self._warm.set()
+
+        if not background:
+            start()
+            return None
+        thread = threading.Thread(target=start, name='ocr-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def warm(self):
+        """True once warmup() has finished"""
+        return self._warm.is_set()
+
+    def run(self, filepath, filename):
+        """Process one image on the pool and wait for its result"""
+        if self.mode == 'serial':
+            result = process_image(filepath, filename)
+        else:
+            result = self._pool().submit(process_image, filepath, filename).result()
+        self.stage_stats.record(result)
+        return result
+
+    def map(self, items):
+        """Process [(filepath, filename), ...]; results keep the input order"""
+        items = list(items)
+        if self.mode == 'serial':
+            results = [_process_item(item) for item in items]
+        elif self.mode == 'process':
+            chunksize = max(len(items) // (self.workers * 4), 1)
+            results = list(self._pool().map(_process_item, items, chunksize=chunksize))
+        else:
+            results = list(self._pool().map(_process_item, items))
+        for result in results:
+            self.stage_stats.record(result)
+        return results
+
+    def imap(self, items, ahead=None, return_exceptions=False):
+        """Like map(), but yields each result as soon as it and the ones before it are done
+
+        At most `ahead` images (default 4 per worker) are queued on the pool,
+        so a long batch holds little in memory and stops promptly when the
+        caller does. With return_exceptions an image that raised yields its
+        exception instead of ending the iteration.
+        """
+        ahead = max(ahead or self.workers * 4, 1)
+        pending = deque()
+
+        def finish(future_or_item):
+            try:
+                if self.mode == 'serial':
+                    result = _process_item(future_or_item)
+                else:
+                    result = future_or_item.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+            self.stage_stats.record(result)
+            return result
+
+        try:
+            for item in items:
+                if self.mode == 'serial':
+                    yield finish(item)
+                    continue
+                pending.append(self._pool().submit(_process_item, item))
+                if len(pending) >= ahead:
+                    yield finish(pending.popleft())
+            while pending:
+                yield finish(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self):
+        """Per-stage timings and barcode fast-path counters so far"""
+        return self.stage_stats.snapshot()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,178 @@
+"""
+LIS Book Scanner - Image preprocessing for OCR
+A configurable chain of stages (normalize, denoise, deskew, threshold) that
+turns a phone photo into an image Tesseract reads quickly. Phone photos are
+first brought down to a target text resolution so every later stage works on
+a fraction of the pixels, and each stage's wall time is recorded.
+"""
+
+import os
+import time
+
+from PIL import Image, ImageOps
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+STAGES = ('normalize', 'denoise', 'deskew', 'threshold')
+
+# Stages that need OpenCV; they are skipped (with a warning) without it
+CV2_STAGES = {'denoise', 'deskew', 'threshold'}
+
+DEFAULT_STAGES = ('normalize',)
+
+# Long side of the copy deskew measures the text angle on
+SKEW_ESTIMATE_SIZE = 1000
+
+
+def parse_stages(spec):
+    """'normalize,deskew' -> ('normalize', 'deskew'); '' or 'none' -> ()"""
+    if spec is None:
+        return DEFAULT_STAGES
+    names = tuple(s.strip().lower() for s in spec.split(',') if s.strip())
+    if names in (('none',), ()):
+        return ()
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stage(s): {', '.join(unknown)}")
+    return names
+
+
+class Preprocessor:
+    """Runs the configured stages over one image file
+
+    `target_dpi` and `page_inches` set the normalised size: the long side of
+    the photo is assumed to span `page_inches` of a printed page, so a 9"
+    book at 300 DPI is scaled to 2700 px. Images are only ever shrunk.
+    """
+
+    def __init__(self, stages=DEFAULT_STAGES, target_dpi=300, page_inches=9.0,
+                 denoise_strength=3, max_skew=15.0, threshold='adaptive'):
+        self.stages = tuple(stages)
+        for name in self.stages:
+            if name not in STAGES:
+                raise ValueError(f"Unknown preprocessing stage: {name}")
+        if not CV2_AVAILABLE and CV2_STAGES.intersection(self.stages):
+            print(f"⚠️ OpenCV not available - skipping {', '.join(sorted(CV2_STAGES.intersection(self.stages)))}")
+            self.stages = tuple(name for name in self.stages if name not in CV2_STAGES)
+        self.target_dpi = target_dpi
+        self.page_inches = page_inches
+        self.denoise_strength = denoise_strength
+        self.max_skew = max_skew
+        self.threshold_method = threshold
+
+    @classmethod
+    def from_env(cls, default=None):
+        """Configured from OCR_PREPROCESS, OCR_TARGET_DPI and OCR_PAGE_INCHES"""
+        spec = os.environ.get('OCR_PREPROCESS', default)
+        return cls(stages=parse_stages(spec),
+                   target_dpi=int(os.environ.get('OCR_TARGET_DPI', '300')),
+                   page_inches=float(os.environ.get('OCR_PAGE_INCHES', '9.0')))
+
+    @property
+    def signature(self):
+        """Everything that changes the output image, for OCR cache keys"""
+        parts = []
+        for name in self.stages:
+            if name == 'normalize':
+                parts.append(f'normalize@{self.target_dpi}dpi/{self.page_inches}in')
+            elif name == 'denoise':
+                parts.append(f'denoise:h{self.denoise_strength}')
+            elif name == 'deskew':
+                parts.append(f'deskew<{self.max_skew}')
+            else:
+                parts.append(f'threshold:{self.threshold_method}')
+        return '|'.join(['upright'] + parts)
+
+    @property
+    def target_size(self):
+        return int(self.target_dpi * self.page_inches)
+
+    def _scaled_size(self, size):
+        scale = min(self.target_size / max(size), 1.0)
+        return max(int(size[0] * scale), 1), max(int(size[1] * scale), 1)
+
+    def load(self, filepath):
+        image = Image.open(filepath)
+        source_format = image.format
+        if 'normalize' in self.stages:
+            # JPEG can decode straight to 1/2, 1/4 or 1/8 scale (never below
+            # the requested size), much cheaper than decoding 12 MP and resizing
+            image.draft('RGB', self._scaled_size(image.size))
+        # Phone photos are stored sideways with an EXIF Orientation tag;
+        # Tesseract only reads upright text
+        image = ImageOps.exif_transpose(image)
+        # iPhone photos are MPO, which pytesseract rejects
+        if source_format not in ('JPEG', 'PNG', 'TIFF', 'BMP', 'GIF', 'WEBP', 'PPM', 'PGM', 'PBM'):
+            image = image.convert('RGB')
+        if CV2_STAGES.intersection(self.stages):
+            image = image.convert('L')
+        return image
+
+    def normalize(self, image):
+        size = self._scaled_size(image.size)
+        if size == image.size:
+            return image
+        return image.resize(size, Image.BOX)
+
+    def denoise(self, gray):
+        # h=3 is OpenCV's default, which the original app used
+        return cv2.fastNlMeansDenoising(gray, None, self.denoise_strength, 7, 21)
+
+    def deskew(self, gray):
+        """Rotate text lines level, as in the research notebook"""
+        # The angle is estimated on a small copy; the rotation is applied in full
+        h, w = gray.shape[:2]
+        scale = min(SKEW_ESTIMATE_SIZE / max(h, w), 1.0)
+        small = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        points = cv2.findNonZero(ink)
+        if points is None:
+            return gray
+        angle = cv2.minAreaRect(points)[-1]
+        # OpenCV reports angles in (0, 90] (>= 4.5) or [-90, 0) (older)
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if abs(angle) < 0.5 or abs(angle) > self.max_skew:
+            return gray
+        matrix = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+        return cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def threshold(self, gray):
+        if self.threshold_method == 'otsu':
+            return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 11, 2)
+
+    def run(self, filepath, image=None):
+        """(image ready for OCR, {stage: seconds})
+
+        `image` is the result of an earlier load() of the file, if any.
+        """
+        timings = {}
+        if image is None:
+            start = time.perf_counter()
+            image = self.load(filepath)
+            image.load()
+            timings['load'] = time.perf_counter() - start
+
+        for name in self.stages:
+            start = time.perf_counter()
+            if name == 'normalize':
+                image = self.normalize(image)
+            else:
+                if isinstance(image, Image.Image):
+                    image = np.asarray(image)
+                image = getattr(self, name)(image)
+            timings[name] = time.perf_counter() - start
+
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        return image, timings
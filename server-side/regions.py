@@ -0,0 +1,203 @@
+"""
+LIS Book Scanner - Text-region detection
+Finds likely text lines on a downscaled copy of a photo (morphological
+gradient or MSER), so OCR can skip the background, shelves and hands around
+a book. The regions are packed into one compact montage image, which costs a
+single Tesseract call, and each region keeps its position on the page for
+later field assignment.
+"""
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+import os
+
+from PIL import Image
+
+METHODS = ('gradient', 'mser')
+
+DEFAULT_METHOD = 'gradient'
+
+# Detection runs on a copy whose long side is this many pixels
+DETECT_SIZE = 1000
+
+# Above this share of the page, cropping saves too little to be worth it
+MAX_COVERAGE = 0.6
+
+MAX_REGIONS = 150
+
+
+def parse_method(spec):
+    """'gradient' or 'mser'; 'off', 'none' or '' disable region detection (None)"""
+    if spec is None:
+        return DEFAULT_METHOD
+    method = spec.strip().lower()
+    if method in ('', 'off', 'none', '0'):
+        return None
+    if method not in METHODS:
+        raise ValueError(f"Unknown region detection method: {spec}")
+    if not CV2_AVAILABLE:
+        print("⚠️ OpenCV not available - OCR runs on the whole image")
+        return None
+    return method
+
+
+def method_from_env():
+    """Detection method configured by OCR_REGIONS (default: gradient)"""
+    return parse_method(os.environ.get('OCR_REGIONS'))
+
+
+class TextRegion:
+    """A candidate text line; `box` is (x, y, w, h) in image pixels"""
+
+    __slots__ = ('box', 'text')
+
+    def __init__(self, box, text=''):
+        self.box = box
+        self.text = text
+
+    def relative(self, size):
+        """Box as fractions of the image (x, y, w, h), independent of scale"""
+        width, height = size
+        x, y, w, h = self.box
+        return [round(x / width, 4), round(y / height, 4), round(w / width, 4), round(h / height, 4)]
+
+    def to_dict(self, size):
+        return {'box': self.relative(size), 'text': self.text}
+
+
+def _candidate_mask(small, method):
+    """Binary mask where characters of one line have been joined together"""
+    if method == 'mser':
+        mser = cv2.MSER_create(min_area=20, max_area=int(small.size * 0.02))
+        _, boxes = mser.detectRegions(small)
+        mask = np.zeros(small.shape, np.uint8)
+        for x, y, w, h in boxes:
+            if w < small.shape[1] // 4 and h < small.shape[0] // 8:
+                mask[y:y + h, x:x + w] = 255
+        ink = mask
+    else:
+        # Letters are mostly vertical strokes: a strong horizontal gradient
+        blurred = cv2.GaussianBlur(small, (3, 3), 0)
+        gradient = cv2.convertScaleAbs(cv2.Sobel(blurred, cv2.CV_32F, 1, 0, ksize=3))
+        _, ink = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Close the gaps between letters and words, but not between lines
+    joined = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 1)))
+    joined = cv2.morphologyEx(joined, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+    return ink, joined
+
+
+def _merge(boxes):
+    """Union overlapping boxes until none overlap"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            x, y, w, h = boxes.pop()
+            for i, (ox, oy, ow, oh) in enumerate(boxes):
+                if x < ox + ow and ox < x + w and y < oy + oh and oy < y + h:
+                    nx, ny = min(x, ox), min(y, oy)
+                    boxes[i] = (nx, ny, max(x + w, ox + ow) - nx, max(y + h, oy + oh) - ny)
+                    merged = True
+                    break
+            else:
+                result.append((x, y, w, h))
+        boxes = result
+    return boxes
+
+
+def detect_text_regions(gray, method='gradient', min_fill=0.3):
+    """Text-line regions of a grayscale image (numpy array), in reading order
+
+    Returns [] when nothing text-like was found.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown region detection method: {method}")
+    height, width = gray.shape[:2]
+    scale = min(DETECT_SIZE / max(height, width), 1.0)
+    small = cv2.resize(gray, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                       interpolation=cv2.INTER_AREA)
+    ink, joined = _candidate_mask(small, method)
+
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < 12 or h < 6 or h > small.shape[0] * 0.1 or w / h < 1.5:
+            continue
+        # Text lines are dense with strokes; textures and edges are not.
+        # Density is measured in the rotated rectangle so slanted lines pass.
+        (_, _), (rw, rh), _ = cv2.minAreaRect(contour)
+        if cv2.countNonZero(ink[y:y + h, x:x + w]) / max(rw * rh, 1.0) < min_fill:
+            continue
+        pad = max(h // 4, 2)
+        boxes.append((max(x - pad, 0), max(y - pad, 0), w + 2 * pad, h + 2 * pad))
+
+    regions = []
+    for x, y, w, h in _merge(boxes):
+        box = (int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+        x0, y0 = min(box[0], width - 1), min(box[1], height - 1)
+        regions.append(TextRegion((x0, y0, min(box[2], width - x0), min(box[3], height - y0))))
+    # Reading order: top to bottom, then left to right within a line
+    regions.sort(key=lambda r: (r.box[1], r.box[0]))
+    return regions
+
+
+def coverage(regions, size):
+    """Share of the image covered by the regions"""
+    width, height = size
+    return sum(r.box[2] * r.box[3] for r in regions) / float(width * height)
+
+
+def find_regions(image, method=DEFAULT_METHOD):
+    """Regions worth OCRing in a PIL image, or None to OCR the whole image
+
+    The whole image is the better choice when nothing text-like was found
+    (detection may have missed faint print) or when the regions cover most
+    of it anyway.
+    """
+    gray = np.asarray(image if image.mode == 'L' else image.convert('L'))
+    regions = detect_text_regions(gray, method)
+    if not regions or len(regions) > MAX_REGIONS or coverage(regions, image.size) > MAX_COVERAGE:
+        return None
+    return regions
+
+
+def montage(image, regions, gap=16):
+    """Stack region crops of a PIL image vertically on a white canvas
+
+    Returns (canvas, bands) where bands[i] is the (top, bottom) of region i.
+    """
+    crops = [image.crop((x, y, x + w, y + h)) for x, y, w, h in (r.box for r in regions)]
+    width = max(crop.width for crop in crops) + 2 * gap
+    height = sum(crop.height + gap for crop in crops) + gap
+    canvas = Image.new(image.mode, (width, height), 'white')
+    bands = []
+    top = gap
+    for crop in crops:
+        canvas.paste(crop, (gap, top))
+        bands.append((top, top + crop.height))
+        top += crop.height + gap
+    return canvas, bands
+
+
+def assign_words(data, regions, bands):
+    """Fill region.text from pytesseract image_to_data output of a montage"""
+    words = [[] for _ in regions]
+    for text, top, height in zip(data['text'], data['top'], data['height']):
+        if not text.strip():
+            continue
+        middle = top + height / 2
+        for i, (band_top, band_bottom) in enumerate(bands):
+            if band_top <= middle <= band_bottom:
+                words[i].append(text)
+                break
+    for region, region_words in zip(regions, words):
+        region.text = ' '.join(region_words)
+    return regions
@@ -0,0 +1,158 @@
+"""
+LIS Book Scanner - Full-text catalog search
+An FTS5 index over the text columns of `books`, kept in sync by triggers, and
+the ranked, paginated query behind /search. Falls back to a LIKE scan on
+SQLite builds compiled without FTS5.
+"""
+
+import re
+import sqlite3
+
+# Indexed columns, in order, with their bm25 weights (a title hit outranks
+# the same word buried in the OCR text)
+FTS_COLUMNS = (
+    ('title', 10.0),
+    ('author', 5.0),
+    ('publisher', 2.0),
+    ('keywords', 3.0),
+    ('ocr_text', 1.0),
+)
+
+MAX_PER_PAGE = 100
+
+_columns = ', '.join(name for name, _ in FTS_COLUMNS)
+_new_values = ', '.join(f'new.{name}' for name, _ in FTS_COLUMNS)
+_old_values = ', '.join(f'old.{name}' for name, _ in FTS_COLUMNS)
+
+# External-content table: the text lives only in `books`, the index stores
+# just the postings
+FTS_SCHEMA = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        {_columns},
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts (rowid, {_columns}) VALUES (new.id, {_new_values});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END
+    ''',
+    # Only fires for the indexed columns, so enrichment bookkeeping is free
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF {_columns} ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO books_fts (rowid, {_columns}) VALUES (new.id, {_new_values});
+    END
+    ''',
+]
+
+
+def fts5_available(conn):
+    return bool(conn.execute(
+        "SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'"
+    ).fetchone())
+
+
+def has_index(conn):
+    return bool(conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    ).fetchone())
+
+
+def init_search_index(conn):
+    """Create the FTS index and triggers; returns False without FTS5
+
+    A newly created index is built from the rows already in `books`.
+    """
+    if not fts5_available(conn):
+        return False
+    existed = has_index(conn)
+    for statement in FTS_SCHEMA:
+        conn.execute(statement)
+    if not existed:
+        conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+    return True
+
+
+def to_fts_query(q):
+    """Turn free text into a safe FTS5 query
+
+    Every word must match; the last one is a prefix so partial input finds
+    results. Operators and quotes in the input are treated as plain text.
+    """
+    terms = re.findall(r'\w+', q or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _page(page, per_page):
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    page = max(1, int(page))
+    return page, per_page
+
+
+def search(conn, q, page=1, per_page=20, highlight=('<mark>', '</mark>')):
+    """Ranked catalog hits for q
+
+    Returns {'query', 'total', 'page', 'per_page', 'results': [...]}, each
+    result carrying the catalog fields, a bm25 `score` (lower is better) and
+    a highlighted `snippet` of the best matching column.
+    """
+    page, per_page = _page(page, per_page)
+    response = {'query': q, 'total': 0, 'page': page, 'per_page': per_page, 'results': []}
+
+    match = to_fts_query(q)
+    if match is None:
+        return response
+    if not has_index(conn):
+        return _search_like(conn, q, response)
+
+    weights = ', '.join(str(weight) for _, weight in FTS_COLUMNS)
+    try:
+        response['total'] = conn.execute(
+            'SELECT COUNT(*) FROM books_fts WHERE books_fts MATCH ?', (match,)
+        ).fetchone()[0]
+        rows = conn.execute(f'''
+            SELECT b.id, b.filename, b.title, b.author, b.year, b.isbn, b.publisher,
+                   b.processing_date, b.api_enriched,
+                   bm25(books_fts, {weights}) AS score,
+                   snippet(books_fts, -1, ?, ?, '…', 16) AS snippet
+            FROM books_fts JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        ''', (*highlight, match, per_page, (page - 1) * per_page)).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"Search error: {e}")
+        return response
+
+    response['results'] = [dict(row) for row in rows]
+    return response
+
+
+def _search_like(conn, q, response):
+    """Unranked substring search for SQLite builds without FTS5"""
+    terms = re.findall(r'\w+', q)
+    where = ' AND '.join(
+        '(' + ' OR '.join(f'{name} LIKE ?' for name, _ in FTS_COLUMNS) + ')' for _ in terms
+    )
+    params = [f'%{term}%' for term in terms for _ in FTS_COLUMNS]
+
+    response['total'] = conn.execute(f'SELECT COUNT(*) FROM books WHERE {where}', params).fetchone()[0]
+    rows = conn.execute(f'''
+        SELECT id, filename, title, author, year, isbn, publisher, processing_date, api_enriched
+        FROM books WHERE {where}
+        ORDER BY id DESC LIMIT ? OFFSET ?
+    ''', (*params, response['per_page'], (response['page'] - 1) * response['per_page'])).fetchall()
+    response['results'] = [dict(row, score=None, snippet=None) for row in rows]
+    return response
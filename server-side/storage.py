@@ -0,0 +1,424 @@
+"""
+LIS Book Scanner - Catalog storage
+Owns the `books` schema shared by app.py and app_production.py, including the
+small migrations needed to bring older catalog.db files up to date, and hands
+out pooled per-thread SQLite connections in WAL mode so readers never block
+the upload path.
+"""
+
+import base64
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import aggregates
+import keywords
+import search
+
+# Applied to every pooled connection. WAL lets readers run alongside the
+# single writer; synchronous=NORMAL is durable across application crashes in
+# WAL mode and only fsyncs at checkpoints.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', '30000'),
+    ('cache_size', '-16000'),  # 16 MB page cache
+    ('temp_store', 'MEMORY'),
+    ('foreign_keys', 'ON'),
+)
+
+BOOKS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        title TEXT,
+        author TEXT,
+        year INTEGER,
+        isbn TEXT,
+        publisher TEXT,
+        keywords TEXT,
+        ocr_text TEXT,
+        processing_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        api_enriched BOOLEAN DEFAULT FALSE,
+        enrich_attempts INTEGER NOT NULL DEFAULT 0,
+        enrich_after TIMESTAMP,
+        keywords_corpus INTEGER,
+        keyword_terms TEXT
+    )
+'''
+
+# Columns added after the first release; (name, definition)
+ADDED_COLUMNS = [
+    ('enrich_attempts', 'INTEGER NOT NULL DEFAULT 0'),
+    ('enrich_after', 'TIMESTAMP'),
+    ('keywords_corpus', 'INTEGER'),  # catalog size when the keywords were TF-IDF ranked
+    ('legacy_book_id', 'TEXT'),  # book_id of a record migrated from the original app.py schema
+    ('keyword_terms', 'TEXT'),  # JSON array of the terms counted into term_df, NULL until counted
+]
+
+
+def connect(db_path, pragmas=PRAGMAS, check_same_thread=True):
+    """Open a new, unpooled connection (the caller closes it)"""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    for name, value in pragmas:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """One long-lived connection per thread for a database file"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conns = {}  # thread ident -> connection
+        self._lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only ever used by this thread; close_all() may close it from another
+            conn = connect(self.db_path, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._reap()
+                old = self._conns.get(threading.get_ident())
+                if old is not None:
+                    old.close()
+                self._conns[threading.get_ident()] = conn
+        return conn
+
+    def _reap(self):
+        """Close connections whose threads have exited"""
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._conns if i not in alive]:
+            self._conns.pop(ident).close()
+
+    def size(self):
+        with self._lock:
+            return len(self._conns)
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns = {}
+        self._local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(db_path):
+    """The process-wide connection pool for a database file"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_path)
+        return _pools[key]
+
+
+def connection(db_path):
+    """This thread's pooled connection; don't close it"""
+    return pool(db_path).connection()
+
+
+@contextmanager
+def transaction(db_path):
+    """Pooled connection wrapped in a transaction that commits on success"""
+    conn = connection(db_path)
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def close_all():
+    with _pools_lock:
+        for p in _pools.values():
+            p.close_all()
+        _pools.clear()
+
+
+# Open lock files of the catalogs whose background work this process runs
+_owner_locks = {}
+
+
+def claim_background(db_path):
+    """True if this process should run the catalog's background work
+
+    Resuming queued jobs, enrichment and keyword re-ranking must run in one
+    process per database, not in every gunicorn worker. The first process to
+    take an exclusive lock on <database>.background.lock holds it until it
+    exits; others (and later calls in the same process) get False. Without
+    fcntl (Windows, single-process dev server) the first call claims it.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        if key in _owner_locks:
+            return False
+        try:
+            import fcntl
+        except ImportError:
+            _owner_locks[key] = None
+            return True
+        handle = open(key + '.background.lock', 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        _owner_locks[key] = handle
+        return True
+
+
+def _after_fork():
+    # SQLite connections must never be shared with a forked child, and a
+    # background lock inherited from the parent is still the parent's
+    global _pools, _pools_lock, _owner_locks
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _owner_locks = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _migrate_legacy_books(conn):
+    """Convert the original app.py schema (book_id/full_text/enriched) in place
+
+    book_id is kept as legacy_book_id. Timestamps were local-time ISO strings
+    (2024-05-01T14:03:22.123456); they become UTC 'YYYY-MM-DD HH:MM:SS' like
+    CURRENT_TIMESTAMP, so old and new rows sort and paginate together.
+    confidence is dropped: the original app wrote the constant 0.95 for every
+    record, so it says nothing about the OCR.
+    """
+    columns = _columns(conn, 'books')
+    if 'full_text' not in columns or 'ocr_text' in columns:
+        return
+
+    conn.execute('ALTER TABLE books RENAME TO books_legacy')
+    conn.execute(BOOKS_TABLE)
+    for name, definition in ADDED_COLUMNS:
+        if name not in _columns(conn, 'books'):
+            conn.execute(f'ALTER TABLE books ADD COLUMN {name} {definition}')
+    conn.execute('''
+        INSERT INTO books (filename, title, author, year, isbn, publisher, keywords,
+                           ocr_text, processing_date, api_enriched, legacy_book_id)
+        SELECT COALESCE(NULLIF(cover_path, ''), book_id, 'unknown'), title, author,
+               CASE WHEN year GLOB '[0-9][0-9][0-9][0-9]' THEN CAST(year AS INTEGER) END,
+               NULLIF(NULLIF(isbn, 'N/A'), ''), publisher, keywords, full_text,
+               COALESCE(datetime(timestamp, 'utc'), CURRENT_TIMESTAMP), enriched LIKE 'Yes%',
+               NULLIF(book_id, '')
+        FROM books_legacy ORDER BY id
+    ''')
+    conn.execute('DROP TABLE books_legacy')
+
+
+def init_database(db_path):
+    """Create or upgrade the catalog schema"""
+    conn = connect(db_path)
+    try:
+        conn.execute(BOOKS_TABLE)
+        _migrate_legacy_books(conn)
+
+        existing = _columns(conn, 'books')
+        for name, definition in ADDED_COLUMNS:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE books ADD COLUMN {name} {definition}')
+
+        # Lets the enricher find its backlog without scanning the catalog
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_books_unenriched
+            ON books (id) WHERE api_enriched = 0 AND isbn IS NOT NULL
+        ''')
+        # Keyset pagination of the /database listing, newest first
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_books_processing_date
+            ON books (processing_date, id)
+        ''')
+        _init_counts(conn)
+        # Catalogs counted before records kept their terms are counted again
+        keywords.init_keyword_tables(conn, recount='keyword_terms' not in existing)
+        aggregates.init_aggregates(conn)
+        search.init_search_index(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# Row counts maintained by triggers so views never need COUNT(*) over books.
+# `version` goes up with every change to catalog data; caches of derived
+# data (charts, aggregates) compare it to decide whether they are stale.
+COUNTS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_counts (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        books INTEGER NOT NULL DEFAULT 0,
+        enriched INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS catalog_counts_insert AFTER INSERT ON books BEGIN
+        UPDATE catalog_counts SET books = books + 1, enriched = enriched + (new.api_enriched = 1),
+                                  version = version + 1
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS catalog_counts_delete AFTER DELETE ON books BEGIN
+        UPDATE catalog_counts SET books = books - 1, enriched = enriched - (old.api_enriched = 1),
+                                  version = version + 1
+        WHERE id = 1;
+    END
+    ''',
+    # Enrichment bookkeeping (attempts, retry time) is not catalog data
+    '''
+    CREATE TRIGGER IF NOT EXISTS catalog_counts_update
+    AFTER UPDATE OF filename, title, author, year, isbn, publisher, keywords, ocr_text, api_enriched
+    ON books BEGIN
+        UPDATE catalog_counts SET enriched = enriched + (new.api_enriched = 1) - (old.api_enriched = 1),
+                                  version = version + 1
+        WHERE id = 1;
+    END
+    ''',
+]
+
+
+def _init_counts(conn):
+    for statement in COUNTS_SCHEMA:
+        conn.execute(statement)
+    # Seeds the counters the first time; a no-op once the row exists
+    conn.execute('''
+        INSERT OR IGNORE INTO catalog_counts (id, books, enriched, version)
+        SELECT 1, COUNT(*), COALESCE(SUM(api_enriched = 1), 0), COUNT(*) FROM books
+    ''')
+
+
+def catalog_counts(conn):
+    """{'books': total records, 'enriched': records enriched from Open Library}"""
+    row = conn.execute('SELECT books, enriched FROM catalog_counts WHERE id = 1').fetchone()
+    return {'books': row[0], 'enriched': row[1]} if row else {'books': 0, 'enriched': 0}
+
+
+def catalog_version(conn):
+    """Number that increases whenever catalog data is inserted, changed or deleted"""
+    row = conn.execute('SELECT version FROM catalog_counts WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+# Everything but ocr_text; the listing never needs the full OCR output
+LISTING_COLUMNS = ('id, filename, title, author, year, isbn, publisher, keywords, '
+                   'processing_date, api_enriched')
+
+
+def encode_cursor(row):
+    """Opaque page cursor for a listing row's (processing_date, id)"""
+    raw = f"{row['processing_date']}|{row['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(processing_date, id); raises ValueError for a malformed cursor"""
+    try:
+        processing_date, book_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return processing_date, int(book_id)
+    except (UnicodeError, ValueError, base64.binascii.Error) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def list_books(conn, after=None, before=None, limit=50):
+    """One page of the catalog, newest first, using keyset pagination
+
+    `after` returns the page following that cursor (older records), `before`
+    the page preceding it (newer records). Returns {'records', 'next',
+    'prev'} where next/prev are cursors, or None at either end.
+    """
+    if before is not None:
+        processing_date, book_id = decode_cursor(before)
+        rows = conn.execute(f'''
+            SELECT {LISTING_COLUMNS} FROM books
+            WHERE (processing_date, id) > (?, ?)
+            ORDER BY processing_date, id LIMIT ?
+        ''', (processing_date, book_id, limit + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        return {
+            'records': [dict(row) for row in rows],
+            'next': encode_cursor(rows[-1]) if rows else None,
+            'prev': encode_cursor(rows[0]) if rows and more else None,
+        }
+
+    if after is not None:
+        processing_date, book_id = decode_cursor(after)
+        rows = conn.execute(f'''
+            SELECT {LISTING_COLUMNS} FROM books
+            WHERE (processing_date, id) < (?, ?)
+            ORDER BY processing_date DESC, id DESC LIMIT ?
+        ''', (processing_date, book_id, limit + 1)).fetchall()
+    else:
+        rows = conn.execute(f'''
+            SELECT {LISTING_COLUMNS} FROM books
+            ORDER BY processing_date DESC, id DESC LIMIT ?
+        ''', (limit + 1,)).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'records': [dict(row) for row in rows],
+        'next': encode_cursor(rows[-1]) if rows and more else None,
+        'prev': encode_cursor(rows[0]) if rows and after is not None else None,
+    }
+
+
+def get_book(conn, book_id):
+    """Full record including OCR text, or None"""
+    row = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    return dict(row) if row else None
+
+
+INSERT_BOOK = '''
+    INSERT INTO books (filename, title, author, year, isbn, publisher, keywords, ocr_text, keywords_corpus,
+                       keyword_terms, api_enriched)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, FALSE)
+'''
+
+
+def _book_params(filename, metadata, ocr_text):
+    return (
+        filename,
+        metadata.get('title'),
+        metadata.get('author'),
+        metadata.get('year'),
+        metadata.get('isbn'),
+        metadata.get('publisher'),
+        metadata.get('keywords'),
+        ocr_text,
+        metadata.get('keywords_corpus'),
+        metadata.get('keyword_terms')
+    )
+
+
+def insert_book(conn, filename, metadata, ocr_text):
+    """Insert one catalog record (not yet enriched); returns its id"""
+    return conn.execute(INSERT_BOOK, _book_params(filename, metadata, ocr_text)).lastrowid
+
+
+def insert_books(conn, records):
+    """Insert [(filename, metadata, ocr_text), ...] with a single executemany
+
+    Run inside one transaction so a whole upload costs one commit.
+    """
+    rows = [_book_params(*record) for record in records]
+    conn.executemany(INSERT_BOOK, rows)
+    return len(rows)
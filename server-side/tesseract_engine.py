@@ -0,0 +1,321 @@
+"""
+LIS Book Scanner - Tesseract engine backends
+pytesseract starts a `tesseract` process per call, writes the image to a temp
+file and reloads the language model every time. The tesserocr backend keeps
+initialised Tesseract API handles for the life of the worker and hands them
+images in memory. Both backends record per-call latency so they can be
+compared.
+"""
+
+import importlib.util
+import os
+import shlex
+import threading
+import time
+from collections import deque
+
+from PIL import Image
+
+# pytesseract is imported on first use: it pulls in pandas when that is installed
+PYTESSERACT_AVAILABLE = importlib.util.find_spec('pytesseract') is not None
+pytesseract = None
+
+# Imported on first use, after a worker has set OMP_THREAD_LIMIT: the OpenMP
+# runtime inside libtesseract reads it once, when the library is loaded
+TESSEROCR_AVAILABLE = importlib.util.find_spec('tesserocr') is not None
+tesserocr = None
+
+TESSERACT_AVAILABLE = PYTESSERACT_AVAILABLE or TESSEROCR_AVAILABLE
+
+BACKENDS = ('tesserocr', 'subprocess')
+
+# Calls kept for latency percentiles
+LATENCY_WINDOW = 1000
+
+
+def parse_backend(spec):
+    """'auto' (tesserocr when installed), 'tesserocr' or 'subprocess'"""
+    backend = (spec or 'auto').strip().lower()
+    if backend == 'auto':
+        return 'tesserocr' if TESSEROCR_AVAILABLE else 'subprocess'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown Tesseract backend: {spec}")
+    if backend == 'tesserocr' and not TESSEROCR_AVAILABLE:
+        print("⚠️ tesserocr not installed - using the tesseract subprocess")
+        return 'subprocess'
+    return backend
+
+
+def _as_image(image):
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(image)
+
+
+class _Engine:
+    """Latency bookkeeping shared by the backends"""
+
+    name = None
+
+    def __init__(self, config=''):
+        self.config = config
+        self.calls = 0
+        self.total_seconds = 0.0
+        self._recent = deque(maxlen=LATENCY_WINDOW)
+        self._stats_lock = threading.Lock()
+        self._version = None
+
+    @property
+    def version(self):
+        """Tesseract version behind this backend ('unknown' if it cannot be read), looked up once"""
+        if self._version is None:
+            try:
+                self._version = self._tesseract_version()
+            except Exception:
+                self._version = 'unknown'
+        return self._version
+
+    def _record(self, start):
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            self._recent.append(elapsed)
+
+    def reset_latency(self):
+        with self._stats_lock:
+            self.calls = 0
+            self.total_seconds = 0.0
+            self._recent.clear()
+
+    def latency(self):
+        """Calls so far and per-call milliseconds (mean, p50, p95 of recent calls)"""
+        with self._stats_lock:
+            recent = sorted(self._recent)
+            calls, total = self.calls, self.total_seconds
+        stats = {'backend': self.name, 'calls': calls}
+        if recent:
+            stats.update(
+                mean_ms=round(total / calls * 1000, 1),
+                p50_ms=round(recent[len(recent) // 2] * 1000, 1),
+                p95_ms=round(recent[min(int(len(recent) * 0.95), len(recent) - 1)] * 1000, 1),
+            )
+        return stats
+
+    def image_to_string(self, image, config=None):
+        start = time.perf_counter()
+        try:
+            return self._image_to_string(_as_image(image), self.config if config is None else config)
+        finally:
+            self._record(start)
+
+    def image_to_data(self, image, config=None):
+        """Words with boxes and confidences, as pytesseract's Output.DICT
+
+        Keys: text, left, top, width, height, conf (-1 for non-words).
+        """
+        start = time.perf_counter()
+        try:
+            return self._image_to_data(_as_image(image), self.config if config is None else config)
+        finally:
+            self._record(start)
+
+    def close(self):
+        pass
+
+
+def load_pytesseract():
+    """The pytesseract module, imported on the first call"""
+    global pytesseract
+    if pytesseract is None:
+        import pytesseract
+    return pytesseract
+
+
+class SubprocessEngine(_Engine):
+    """pytesseract: one tesseract process (and model load) per call"""
+
+    name = 'subprocess'
+
+    def _image_to_string(self, image, config):
+        return load_pytesseract().image_to_string(image, config=config)
+
+    def _tesseract_version(self):
+        return str(load_pytesseract().get_tesseract_version())
+
+    def _image_to_data(self, image, config):
+        pytesseract = load_pytesseract()
+        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+        data['conf'] = [float(c) for c in data['conf']]
+        return data
+
+
+class TesserocrEngine(_Engine):
+    """Long-lived Tesseract API handles, fed PIL images in memory
+
+    A handle is not thread-safe, so each call borrows one from a pool and
+    concurrent calls get their own; a worker process needs just one.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, config='', lang='eng', tessdata=None):
+        super().__init__(config)
+        self.lang = lang
+        self.tessdata = tessdata or os.environ.get('TESSDATA_PREFIX')
+        self.init_seconds = 0.0
+        self._apis = []  # every handle created
+        self._idle = {}  # (lang, oem) -> handles not in use
+        self._apis_lock = threading.Lock()
+
+    def _handle_key(self, init):
+        """(lang, oem) a handle must be created with for a config's init options"""
+        return init.get('lang', self.lang), init.get('oem')
+
+    def _create_api(self, key):
+        global tesserocr
+        start = time.perf_counter()
+        if tesserocr is None:
+            import tesserocr
+        lang, oem = key
+        kwargs = {'lang': lang}
+        if oem is not None:
+            kwargs['oem'] = tesserocr.OEM(oem)
+        if self.tessdata:
+            kwargs['path'] = self.tessdata
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        with self._apis_lock:
+            self.init_seconds += time.perf_counter() - start
+            self._apis.append(api)
+        return api
+
+    def _tesseract_version(self):
+        global tesserocr
+        if tesserocr is None:
+            import tesserocr
+        return tesserocr.tesseract_version().splitlines()[0]
+
+    def _acquire(self, key):
+        with self._apis_lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return self._create_api(key)
+
+    def _release(self, key, api):
+        with self._apis_lock:
+            self._idle.setdefault(key, []).append(api)
+
+    def warm(self, handles=1):
+        """Load the language model into `handles` idle API handles now"""
+        key = self._handle_key(self._parse_config(self.config)[2])
+        with self._apis_lock:
+            missing = handles - len(self._idle.get(key, ()))
+        for _ in range(missing):
+            self._release(key, self._create_api(key))
+
+    @staticmethod
+    def _parse_config(config):
+        """(page segmentation mode or None, {variable: value}, {init option: value}) of a CLI config
+
+        `--oem` and `-l` can only be set when a handle is created, so they
+        come back as init options and pick the pool of handles a call uses.
+        """
+        psm, variables, init = None, {}, {}
+        tokens = iter(shlex.split(config or ''))
+        for token in tokens:
+            if token == '--psm':
+                psm = int(next(tokens))
+            elif token == '--oem':
+                init['oem'] = int(next(tokens))
+            elif token == '-l':
+                init['lang'] = next(tokens)
+            elif token == '-c':
+                name, _, value = next(tokens).partition('=')
+                variables[name] = value
+            else:
+                raise ValueError(f"Tesseract option not supported by the tesserocr backend: {token}")
+        return psm, variables, init
+
+    def _prepare(self, api, image, psm, variables):
+        api.SetPageSegMode(tesserocr.PSM.AUTO if psm is None else psm)
+        # Variables stick to the API; put back the previous values afterwards
+        previous = {name: api.GetVariableAsString(name) for name in variables}
+        for name, value in variables.items():
+            api.SetVariable(name, value)
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            image = image.convert('L')
+        api.SetImage(image)
+        return previous
+
+    @staticmethod
+    def _restore(api, previous):
+        for name, value in previous.items():
+            if value is not None:
+                api.SetVariable(name, value)
+
+    def _image_to_string(self, image, config):
+        psm, variables, init = self._parse_config(config)
+        key = self._handle_key(init)
+        api = self._acquire(key)
+        try:
+            previous = self._prepare(api, image, psm, variables)
+            try:
+                return api.GetUTF8Text()
+            finally:
+                self._restore(api, previous)
+        finally:
+            self._release(key, api)
+
+    def _image_to_data(self, image, config):
+        psm, variables, init = self._parse_config(config)
+        key = self._handle_key(init)
+        api = self._acquire(key)
+        try:
+            previous = self._prepare(api, image, psm, variables)
+            try:
+                return self._words(api)
+            finally:
+                self._restore(api, previous)
+        finally:
+            self._release(key, api)
+
+    @staticmethod
+    def _words(api):
+        data = {'text': [], 'left': [], 'top': [], 'width': [], 'height': [], 'conf': []}
+        api.Recognize()
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(api.GetIterator(), level):
+            box = word.BoundingBox(level)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            data['text'].append(word.GetUTF8Text(level) or '')
+            data['left'].append(x1)
+            data['top'].append(y1)
+            data['width'].append(x2 - x1)
+            data['height'].append(y2 - y1)
+            data['conf'].append(float(word.Confidence(level)))
+        return data
+
+    def latency(self):
+        stats = super().latency()
+        stats['init_ms'] = round(self.init_seconds * 1000, 1)
+        return stats
+
+    def close(self):
+        with self._apis_lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+            self._idle = {}
+
+
+def create_engine(backend=None, config=''):
+    """Engine for TESSERACT_BACKEND (or `backend`), None without Tesseract"""
+    if not TESSERACT_AVAILABLE:
+        return None
+    backend = parse_backend(backend or os.environ.get('TESSERACT_BACKEND'))
+    if backend == 'tesserocr':
+        return TesserocrEngine(config=config)
+    return SubprocessEngine(config=config)
@@ -5,8 +5,16 @@ Simple tests for LIS Book Scanner production version
 
 import sys
 import os
+import tempfile
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'web_app'))
 
+# Keep test runs away from the real catalog
+TEST_DIR = tempfile.mkdtemp(prefix='lis-tests-')
+os.environ.setdefault('CATALOG_DB', os.path.join(TEST_DIR, 'catalog.db'))
+os.environ.setdefault('ENRICHMENT', '0')
+os.environ.setdefault('KEYWORD_RANKING', '0')
+os.environ.setdefault('WARMUP', '0')  # no import threads racing the forking tests
+
 def test_app_import():
     """Test that the production app can be imported"""
     try:
@@ -73,13 +81,1498 @@ def test_metadata_extraction():
         print(f"❌ Metadata extraction test failed: {e}")
         return False
 
+def test_model_registry():
+    """Test that models are loaded once and shared across threads"""
+    try:
+        import threading
+        from ocr_models import ModelRegistry
+
+        calls = []
+        models = ModelRegistry()
+        models.register('dummy', lambda: calls.append(1) or object())
+
+        loaded = []
+        threads = [threading.Thread(target=lambda: loaded.append(models.get('dummy')))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1, f"Loader ran {len(calls)} times"
+        assert all(m is loaded[0] for m in loaded), "Threads got different instances"
+        stats = models.stats()['models']['dummy']
+        assert stats['loaded'] and stats['load_seconds'] >= 0, "Missing load stats"
+
+        print("✅ Model registry loads once and reuses the instance")
+        return True
+    except Exception as e:
+        print(f"❌ Model registry test failed: {e}")
+        return False
+
+def test_job_queue():
+    """Test that queued files are processed, reported in order and resumed"""
+    try:
+        import sqlite3
+        from jobs import JobQueue
+
+        db_path = os.path.join(TEST_DIR, 'jobs.db')
+        queue = JobQueue(db_path, lambda path, name: {'title': name.upper()}, max_workers=2)
+        job_id = queue.submit([('a.jpg', '/tmp/a.jpg'), ('b.jpg', '/tmp/b.jpg'), ('c.jpg', '/tmp/c.jpg')])
+        job = queue.wait(job_id, timeout=10)
+
+        assert job['status'] == 'done', f"Unexpected job status: {job['status']}"
+        assert [f['result']['title'] for f in job['files']] == ['A.JPG', 'B.JPG', 'C.JPG'], "Results out of order"
+        queue.shutdown()
+
+        # Simulate a restart with an item that was still running
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO ingest_jobs (id, status, total_files) VALUES ('stale', 'running', 1)")
+        conn.execute("INSERT INTO ingest_job_files (job_id, position, filename, filepath, status) "
+                     "VALUES ('stale', 0, 'd.jpg', '/tmp/d.jpg', 'running')")
+        conn.commit()
+        conn.close()
+
+        restarted = JobQueue(db_path, lambda path, name: {'title': name}, max_workers=1)
+        assert restarted.resume() == 1, "Pending work was not resumed"
+        job = restarted.wait('stale', timeout=10)
+        assert job['files'][0]['status'] == 'done', "Resumed item did not finish"
+        restarted.shutdown()
+
+        print("✅ Job queue processes and resumes uploads")
+        return True
+    except Exception as e:
+        print(f"❌ Job queue test failed: {e}")
+        return False
+
+def test_upload_returns_job():
+    """Test that an upload is queued and its job can be polled"""
+    try:
+        import io
+        from app_production import app, job_queue
+
+        app.config['UPLOAD_FOLDER'] = TEST_DIR
+        with app.test_client() as client:
+            response = client.post('/', data={'files': (io.BytesIO(b'not an image'), 'sample.jpg')},
+                                   headers={'Accept': 'application/json'},
+                                   content_type='multipart/form-data')
+            assert response.status_code == 202, f"Upload failed: {response.status_code}"
+            job_id = response.get_json()['job_id']
+
+            job_queue.wait(job_id, timeout=10)
+            response = client.get(f'/jobs/{job_id}', headers={'Accept': 'application/json'})
+            job = response.get_json()
+            assert job['finished'] and job['files'][0]['status'] == 'done', "Job did not complete"
+
+            import storage
+            conn = storage.connection(app.config['DATABASE'])
+            count = conn.execute('SELECT COUNT(*) FROM books WHERE filename = ?', ('sample.jpg',)).fetchone()[0]
+            assert count >= 1, "Finished upload was not stored"
+
+        print("✅ Uploads are queued as background jobs")
+        return True
+    except Exception as e:
+        print(f"❌ Upload job test failed: {e}")
+        return False
+
+def test_parallel_pipeline():
+    """Test that the process pool returns results in upload order"""
+    try:
+        from pipeline import PipelineExecutor
+
+        items = []
+        for i in range(6):
+            path = os.path.join(TEST_DIR, f'page_{i}.txt')
+            with open(path, 'w') as f:
+                f.write('not an image')
+            items.append((path, f'page_{i}.jpg'))
+
+        with PipelineExecutor(workers=2, mode='process') as executor:
+            results = executor.map(items)
+
+        assert [r['filename'] for r in results] == [name for _, name in items], "Results out of order"
+        assert all(r['metadata']['title'] for r in results), "Metadata missing"
+        assert all('metadata' in r['timings'] for r in results), "Stage timings missing"
+
+        # Concurrent first submits share one pool
+        import threading
+        with PipelineExecutor(workers=2, mode='thread') as executor:
+            start, pools = threading.Barrier(8), []
+            def first_submit():
+                start.wait()
+                pools.append(executor._pool())
+            threads = [threading.Thread(target=first_submit) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert len({id(pool) for pool in pools}) == 1, "More than one worker pool created"
+
+        print("✅ Parallel pipeline keeps upload order")
+        return True
+    except Exception as e:
+        print(f"❌ Parallel pipeline test failed: {e}")
+        return False
+
+def test_ocr_cache():
+    """Test OCR cache hits, misses and LRU eviction"""
+    try:
+        from ocr_cache import OCRCache, cache_key
+
+        cache = OCRCache(os.path.join(TEST_DIR, 'cache.db'), max_bytes=100)
+        first = cache_key(b'image-1', 'tesseract', 'psm6')
+        second = cache_key(b'image-2', 'tesseract', 'psm6')
+        assert first != cache_key(b'image-1', 'easyocr', 'psm6'), "Engine not part of the key"
+
+        import pipeline
+        from ocr_models import registry
+        if registry.tesseract_engine is not None:
+            engine = registry.tesseract_engine
+            assert pipeline.ocr_config().startswith(f'{engine.name}:{engine.version}|'), \
+                f"Tesseract backend not part of the key: {pipeline.ocr_config()}"
+
+        assert cache.get(first) is None, "Unexpected hit on empty cache"
+        cache.put(first, 'tesseract', 'a' * 60)
+        assert cache.get(first) == 'a' * 60, "Cached text not returned"
+
+        # Going over budget evicts the least recently used entry
+        cache.put(second, 'tesseract', 'b' * 60)
+        assert cache.get(first) is None, "LRU entry was not evicted"
+        assert cache.get(second) == 'b' * 60, "Newest entry was evicted"
+
+        # Lookups only read: they go ahead while another connection holds the write lock
+        import sqlite3
+        import time
+        writer = sqlite3.connect(os.path.join(TEST_DIR, 'cache.db'))
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.perf_counter()
+            assert cache.get(second) == 'b' * 60, "Hit lost under a held write lock"
+            assert time.perf_counter() - started < 1, "Lookup waited for the write lock"
+        finally:
+            writer.rollback()
+            writer.close()
+
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions']) == (3, 2, 1), f"Bad stats: {stats}"
+        assert stats['bytes'] == 60, f"Byte count drifted: {stats['bytes']}"
+
+        print("✅ OCR cache hits, misses and evicts correctly")
+        return True
+    except Exception as e:
+        print(f"❌ OCR cache test failed: {e}")
+        return False
+
+def start_stub_openlibrary(missing=()):
+    """Serve a fake /api/books on localhost; returns (server, bibkeys seen)"""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    requests_seen = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            keys = parse_qs(urlparse(self.path).query)['bibkeys'][0].split(',')
+            requests_seen.append(keys)
+            body = {k: {'title': 'Stub Title', 'authors': [{'name': 'Stub Author'}],
+                        'publish_date': 'May 1999', 'publishers': [{'name': 'Stub Press'}]}
+                    for k in keys if k not in missing}
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests_seen
+
+def test_openlibrary_client():
+    """Test batched, cached Open Library lookups against a local stub server"""
+    try:
+        from openlibrary import OpenLibraryClient, to_metadata
+
+        server, requests_seen = start_stub_openlibrary(missing={'ISBN:9780000000002'})
+        try:
+            client = OpenLibraryClient(base_url=f'http://127.0.0.1:{server.server_port}',
+                                       cache_db=os.path.join(TEST_DIR, 'enrichment.db'),
+                                       batch_size=2)
+            isbns = ['978-0-00-000000-1', '9780000000002', '9780000000003']
+            results = client.lookup_many(isbns)
+            assert len(requests_seen) == 2, f"Expected 2 batched requests, saw {len(requests_seen)}"
+            assert results['9780000000002'] is None, "Unknown ISBN should be a miss"
+            assert to_metadata(results['9780000000001'])['year'] == 1999, "Year not parsed"
+
+            # Hits and misses are both answered from the cache
+            client.lookup_many(isbns)
+            assert len(requests_seen) == 2, "Cached ISBNs were fetched again"
+            client.close()
+        finally:
+            server.shutdown()
+
+        print("✅ Open Library client batches and caches lookups")
+        return True
+    except Exception as e:
+        print(f"❌ Open Library client test failed: {e}")
+        return False
+
+def test_background_enrichment():
+    """Test that un-enriched records are drained and updated in place"""
+    try:
+        import storage
+        from enricher import Enricher
+        from openlibrary import OpenLibraryClient
+
+        db_path = os.path.join(TEST_DIR, 'enrich.db')
+        storage.init_database(db_path)
+        conn = storage.connect(db_path)
+        known = storage.insert_book(conn, 'a.jpg', {'title': 'OCR title', 'isbn': '9780000000001'}, 'text')
+        unknown = storage.insert_book(conn, 'b.jpg', {'title': 'Other', 'isbn': '9780000000002'}, 'text')
+        storage.insert_book(conn, 'c.jpg', {'title': 'No ISBN'}, 'text')
+        conn.commit()
+
+        server, requests_seen = start_stub_openlibrary(missing={'ISBN:9780000000002'})
+        try:
+            client = OpenLibraryClient(base_url=f'http://127.0.0.1:{server.server_port}')
+            enricher = Enricher(db_path, client)
+            assert enricher.run_once() == 2, "Expected both ISBN records in one batch"
+            assert len(requests_seen) == 1, "Batch was not sent as one request"
+            assert enricher.run_once() == 0, "Records were retried immediately"
+        finally:
+            server.shutdown()
+
+        rows = {row['id']: row for row in conn.execute('SELECT * FROM books')}
+        conn.close()
+        assert rows[known]['api_enriched'] and rows[known]['title'] == 'Stub Title', "Record not enriched"
+        assert rows[known]['year'] == 1999 and rows[known]['publisher'] == 'Stub Press', "Fields not updated"
+        assert not rows[unknown]['api_enriched'] and rows[unknown]['title'] == 'Other', "Miss overwrote OCR data"
+
+        print("✅ Background enrichment updates records in place")
+        return True
+    except Exception as e:
+        print(f"❌ Background enrichment test failed: {e}")
+        return False
+
+def test_legacy_schema_migration():
+    """Test that a catalog.db from the original app.py is upgraded"""
+    try:
+        import sqlite3
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'legacy.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('''CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, book_id TEXT UNIQUE,
+                        title TEXT, author TEXT, year TEXT, isbn TEXT, publisher TEXT, keywords TEXT,
+                        enriched TEXT, full_text TEXT, cover_path TEXT, timestamp TEXT, confidence REAL)''')
+        conn.execute("INSERT INTO books (book_id, title, year, isbn, enriched, full_text, cover_path, timestamp, "
+                     "confidence) VALUES ('book_1', 'Old Book', '1987', 'N/A', 'Yes (Open Library)', 'ocr', "
+                     "'uploads/x.jpg', '2024-05-01T14:03:22.123456', 0.95)")
+        conn.commit()
+        conn.close()
+
+        storage.init_database(db_path)
+        conn = storage.connect(db_path)
+        row = conn.execute('SELECT * FROM books').fetchone()
+        conn.close()
+        assert row['title'] == 'Old Book' and row['ocr_text'] == 'ocr', "Row not carried over"
+        assert row['year'] == 1987 and row['isbn'] is None and row['api_enriched'] == 1, "Columns not mapped"
+        assert row['legacy_book_id'] == 'book_1', "Legacy book_id lost"
+        import re
+        assert re.fullmatch(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d', row['processing_date']), \
+            f"Timestamp not normalised: {row['processing_date']}"
+
+        print("✅ Legacy catalog schema is migrated")
+        return True
+    except Exception as e:
+        print(f"❌ Legacy schema migration test failed: {e}")
+        return False
+
+def test_storage_pool():
+    """Test pooled WAL connections and batched inserts"""
+    try:
+        import threading
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'pool.db')
+        storage.init_database(db_path)
+        conn = storage.connection(db_path)
+        assert conn is storage.connection(db_path), "Same thread got a new connection"
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal', "WAL not enabled"
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(storage.connection(db_path)))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn, "Threads share a connection"
+
+        records = [(f'b{i}.jpg', {'title': f'Book {i}'}, 'text') for i in range(50)]
+        with storage.transaction(db_path) as conn:
+            assert storage.insert_books(conn, records) == 50, "Batch insert count wrong"
+        assert conn.execute('SELECT COUNT(*) FROM books').fetchone()[0] == 50, "Rows not committed"
+
+        print("✅ Storage pool and batched inserts work")
+        return True
+    except Exception as e:
+        print(f"❌ Storage pool test failed: {e}")
+        return False
+
+def test_fulltext_search():
+    """Test the FTS5 index stays in sync and /search ranks hits"""
+    try:
+        import search
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'search.db')
+        storage.init_database(db_path)
+        with storage.transaction(db_path) as conn:
+            storage.insert_books(conn, [
+                ('a.jpg', {'title': 'The Great Gatsby', 'author': 'F. Scott Fitzgerald'}, 'Chapter 1 ...'),
+                ('b.jpg', {'title': 'Tender Is the Night'}, 'a novel by Fitzgerald about Gatsby-like excess'),
+                ('c.jpg', {'title': 'Moby Dick', 'author': 'Herman Melville'}, 'Call me Ishmael and')
+            ])
+
+        conn = storage.connection(db_path)
+        hits = search.search(conn, 'gatsby')
+        assert hits['total'] == 2, f"Expected 2 hits, got {hits['total']}"
+        assert hits['results'][0]['title'] == 'The Great Gatsby', "Title match not ranked first"
+        assert '<mark>' in hits['results'][1]['snippet'], "Snippet not highlighted"
+        assert search.search(conn, 'fitz')['total'] == 2, "Prefix search failed"
+        assert search.search(conn, 'herman "melville AND')['total'] == 1, "Query syntax not neutralised"
+
+        with storage.transaction(db_path) as conn:
+            conn.execute("UPDATE books SET title = 'Billy Budd' WHERE filename = 'c.jpg'")
+            conn.execute("DELETE FROM books WHERE filename = 'a.jpg'")
+        assert search.search(conn, 'budd')['total'] == 1, "Update not indexed"
+        assert search.search(conn, 'moby')['total'] == 0, "Stale title still indexed"
+        assert search.search(conn, 'gatsby')['total'] == 1, "Delete not indexed"
+
+        from app_production import app
+        with app.test_client() as client:
+            response = client.get('/search?q=gatsby&per_page=5')
+            assert response.status_code == 200, f"Search failed: {response.status_code}"
+            assert response.get_json()['per_page'] == 5, "Pagination not applied"
+            assert client.get('/search?q=x&page=abc').status_code == 400, "Bad page accepted"
+
+        print("✅ Full-text search works")
+        return True
+    except Exception as e:
+        print(f"❌ Full-text search test failed: {e}")
+        return False
+
+def test_database_pagination():
+    """Test keyset pagination, the record counter and the detail view"""
+    try:
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'pages.db')
+        storage.init_database(db_path)
+        with storage.transaction(db_path) as conn:
+            storage.insert_books(conn, [(f'p{i}.jpg', {'title': f'Book {i}'}, f'text {i}') for i in range(25)])
+            conn.execute('UPDATE books SET api_enriched = TRUE WHERE id <= 3')
+
+        conn = storage.connection(db_path)
+        assert storage.catalog_counts(conn) == {'books': 25, 'enriched': 3}, "Counters out of sync"
+
+        seen = []
+        page = storage.list_books(conn, limit=10)
+        assert page['prev'] is None, "First page has a previous page"
+        assert 'ocr_text' not in page['records'][0], "Listing loads OCR text"
+        while True:
+            seen.extend(r['id'] for r in page['records'])
+            if not page['next']:
+                break
+            page = storage.list_books(conn, after=page['next'], limit=10)
+        assert seen == list(range(25, 0, -1)), f"Pages skipped or repeated rows: {seen}"
+
+        back = storage.list_books(conn, before=page['prev'], limit=10)
+        assert [r['id'] for r in back['records']] == list(range(15, 5, -1)), "Previous page wrong"
+
+        with storage.transaction(db_path) as conn:
+            conn.execute('DELETE FROM books WHERE id = 1')
+        assert storage.catalog_counts(conn) == {'books': 24, 'enriched': 2}, "Delete not counted"
+
+        from app_production import app
+        with app.test_client() as client:
+            response = client.get('/database')
+            assert response.status_code == 200, f"Database view failed: {response.status_code}"
+            assert client.get('/database?after=not-a-cursor').status_code == 302, "Bad cursor accepted"
+            assert client.get('/database/999999', headers={'Accept': 'application/json'}).status_code == 404, \
+                "Missing book not 404"
+
+        print("✅ Database pagination works")
+        return True
+    except Exception as e:
+        print(f"❌ Database pagination test failed: {e}")
+        return False
+
+def test_streaming_export():
+    """Test every export format streams the whole catalog"""
+    try:
+        import csv
+        import io
+        import json
+        import xml.etree.ElementTree as ET
+        from app_production import app
+        import storage
+
+        with storage.transaction(app.config['DATABASE']) as conn:
+            storage.insert_book(conn, 'export.jpg', {'title': 'Fish & Chips <2nd ed.>', 'year': 1999,
+                                                       'publisher': 'Penguin'}, 'a, "quoted"\nline')
+            total = storage.catalog_counts(conn)['books']
+
+        with app.test_client() as client:
+            responses = {}
+            for format in ('csv', 'jsonl', 'json', 'marcxml'):
+                response = client.get(f'/download/{format}')
+                assert response.status_code == 200, f"{format} export failed: {response.status_code}"
+                assert response.is_streamed, f"{format} export is not streamed"
+                assert 'attachment' in response.headers['Content-Disposition'], "Not sent as a download"
+                responses[format] = response.get_data(as_text=True)
+            assert client.get('/download/xls').status_code == 302, "Unknown format accepted"
+
+        rows = list(csv.DictReader(io.StringIO(responses['csv'])))
+        assert len(rows) == total and rows[-1]['ocr_text'] == 'a, "quoted"\nline', "CSV rows wrong"
+        assert len(responses['jsonl'].splitlines()) == total, "JSON lines count wrong"
+        assert json.loads(responses['json'])[-1]['title'] == 'Fish & Chips <2nd ed.>', "JSON rows wrong"
+        records = ET.fromstring(responses['marcxml']).findall('record')
+        assert len(records) == total, "MARCXML record count wrong"
+        assert records[-1].find("datafield[@tag='245']/subfield").text == 'Fish & Chips <2nd ed.>', "MARC 245 wrong"
+        imprint = records[-1].findall("datafield[@tag='260']")
+        assert [[(s.get('code'), s.text) for s in field] for field in imprint] == \
+            [[('b', 'Penguin'), ('c', '1999')]], "MARC 260 not one field with $b and $c"
+
+        print("✅ Streaming export works")
+        return True
+    except Exception as e:
+        print(f"❌ Streaming export test failed: {e}")
+        return False
+
+def test_chart_cache():
+    """Test charts are rendered once per catalog version and served with ETags"""
+    try:
+        from charts import ChartCache
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'charts.db')
+        storage.init_database(db_path)
+        conn = storage.connection(db_path)
+        cache = ChartCache(db_path, os.path.join(TEST_DIR, 'charts'))
+        renders = []
+        def render():
+            renders.append(1)
+            return b'png-%d' % storage.catalog_counts(conn)['books']
+
+        version = storage.catalog_version(conn)
+        first = cache.get('years', version, render)
+        assert cache.get('years', version, render) == first and len(renders) == 1, "Chart re-rendered"
+
+        with storage.transaction(db_path) as conn:
+            book_id = storage.insert_book(conn, 'c.jpg', {'title': 'A'}, 'text')
+        assert storage.catalog_version(conn) > version, "Insert did not bump the version"
+        second = cache.get('years', storage.catalog_version(conn), render)
+        assert second != first and len(renders) == 2, "Stale chart served"
+
+        # Another app's chart of the same name is cached separately
+        other = ChartCache(db_path, os.path.join(TEST_DIR, 'charts'), namespace='other')
+        assert other.get('years', storage.catalog_version(conn), lambda: b'other-png') != second, \
+            "Namespaces share a chart"
+        assert cache.get('years', storage.catalog_version(conn), render) == second, "Namespaced chart replaced"
+
+        version = storage.catalog_version(conn)
+        with storage.transaction(db_path) as conn:
+            conn.execute('UPDATE books SET enrich_attempts = 1 WHERE id = ?', (book_id,))
+        assert storage.catalog_version(conn) == version, "Bookkeeping update bumped the version"
+
+        from app_production import app
+        import app_production
+        with app.test_client() as client:
+            digest = app_production.chart_cache.get('test', 1, lambda: b'\x89PNG test')
+            response = client.get(f'/charts/{digest}.png')
+            assert response.status_code == 200 and response.headers['ETag'] == f'"{digest}"', "ETag missing"
+            response = client.get(f'/charts/{digest}.png', headers={'If-None-Match': f'"{digest}"'})
+            assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+            assert client.get('/charts/../../etc.png').status_code == 404, "Bad digest served"
+            assert client.get('/analytics').status_code == 200, "Analytics page failed"
+
+        print("✅ Chart cache works")
+        return True
+    except Exception as e:
+        print(f"❌ Chart cache test failed: {e}")
+        return False
+
+def test_analytics_aggregates():
+    """Test the summary tables track inserts, updates and deletes"""
+    try:
+        import aggregates
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'aggregates.db')
+        storage.init_database(db_path)
+        with storage.transaction(db_path) as conn:
+            storage.insert_books(conn, [
+                ('a.jpg', {'author': 'Ann Lee', 'year': 1990, 'keywords': 'gatsby, Novel'}, ''),
+                ('b.jpg', {'author': 'Ann Lee', 'year': 2000, 'keywords': 'novel, "jazz"'}, ''),
+                ('c.jpg', {'author': 'Bo', 'keywords': 'jazz\nage'}, ''),
+            ])
+            conn.execute("UPDATE books SET year = 1990, keywords = 'gatsby' WHERE filename = 'b.jpg'")
+            conn.execute("DELETE FROM books WHERE filename = 'c.jpg'")
+
+        conn = storage.connection(db_path)
+        stats = aggregates.summary(conn)
+        assert stats['total_books'] == 2 and stats['unique_authors'] == 1, f"Counts wrong: {stats}"
+        assert stats['years'] == [{'year': 1990, 'books': 2}], f"Years wrong: {stats['years']}"
+        assert stats['avg_year'] == 1990, "Average year wrong"
+        assert stats['top_keywords'] == [{'keyword': 'gatsby', 'books': 2}, {'keyword': 'novel', 'books': 1}], \
+            f"Keywords wrong: {stats['top_keywords']}"
+
+        # Rebuilding from scratch must agree with the triggers
+        for table in ('stats_years', 'stats_authors', 'stats_keywords'):
+            conn.execute(f'DROP TABLE {table}')
+        conn.commit()
+        storage.init_database(db_path)
+        assert aggregates.summary(conn) == stats, "Seeded aggregates differ from incremental ones"
+
+        from app_production import app
+        with app.test_client() as client:
+            response = client.get('/api/analytics?limit=5')
+            assert response.status_code == 200, f"Analytics API failed: {response.status_code}"
+            assert 'top_keywords' in response.get_json(), "Aggregates missing"
+
+        print("✅ Analytics aggregates work")
+        return True
+    except Exception as e:
+        print(f"❌ Analytics aggregates test failed: {e}")
+        return False
+
+def test_preprocessing_pipeline():
+    """Test preprocessing stages, downscaling and per-stage timings"""
+    try:
+        from PIL import Image
+        from preprocess import Preprocessor, parse_stages, CV2_AVAILABLE
+
+        path = os.path.join(TEST_DIR, 'large.jpg')
+        Image.new('RGB', (4000, 3000), 'white').save(path)
+
+        assert parse_stages('none') == () and parse_stages('normalize, deskew') == ('normalize', 'deskew'), \
+            "Stage spec not parsed"
+        try:
+            parse_stages('normalize,sharpen')
+            assert False, "Unknown stage accepted"
+        except ValueError:
+            pass
+
+        image, timings = Preprocessor(stages=('normalize',), target_dpi=200, page_inches=9).run(path)
+        assert max(image.size) == 1800, f"Not normalised: {image.size}"
+        assert set(timings) == {'load', 'normalize'}, f"Timings missing: {timings}"
+
+        small = os.path.join(TEST_DIR, 'small.png')
+        Image.new('RGB', (600, 400), 'white').save(small)
+        image, _ = Preprocessor(stages=('normalize',)).run(small)
+        assert image.size == (600, 400), "Small image was upscaled"
+
+        if CV2_AVAILABLE:
+            image, timings = Preprocessor(stages=('normalize', 'deskew', 'threshold'), target_dpi=100).run(path)
+            assert image.mode == 'L' and list(timings) == ['load', 'normalize', 'deskew', 'threshold'], \
+                f"cv2 stages not run: {timings}"
+
+        assert Preprocessor(stages=()).signature != Preprocessor(stages=('normalize',)).signature, \
+            "Cache signature ignores stages"
+
+        print("✅ Preprocessing pipeline works")
+        return True
+    except Exception as e:
+        print(f"❌ Preprocessing pipeline test failed: {e}")
+        return False
+
+def test_text_regions():
+    """Test text-region detection, the OCR montage and word assignment"""
+    try:
+        from PIL import Image, ImageDraw
+        import regions
+
+        assert regions.parse_method('off') is None, "Region detection not disabled"
+        try:
+            regions.parse_method('east')
+            assert False, "Unknown method accepted"
+        except ValueError:
+            pass
+
+        if regions.CV2_AVAILABLE:
+            import numpy as np
+            page = Image.new('L', (1200, 1600), 'white')
+            draw = ImageDraw.Draw(page)
+            for top in (200, 600, 1000):
+                for left in range(150, 900, 40):
+                    draw.rectangle((left, top, left + 24, top + 40), fill='black')
+
+            found = regions.detect_text_regions(np.asarray(page))
+            assert len(found) == 3, f"Expected 3 lines, got {[r.box for r in found]}"
+            assert [r.box[1] < r2.box[1] for r, r2 in zip(found, found[1:])] == [True, True], \
+                "Regions not in reading order"
+            assert regions.coverage(found, page.size) < 0.1, "Regions cover the background"
+            assert regions.find_regions(Image.new('L', (800, 800), 'white')) is None, \
+                "Blank page did not fall back to the whole image"
+
+            canvas, bands = regions.montage(page, found)
+            assert canvas.height < page.height and len(bands) == 3, "Montage not compact"
+            data = {'text': ['Moby', 'Dick', '', 'Herman'],
+                    'top': [bands[0][0] + 5, bands[0][0] + 5, 0, bands[2][0] + 2],
+                    'height': [20, 20, 0, 20]}
+            regions.assign_words(data, found, bands)
+            assert [r.text for r in found] == ['Moby Dick', '', 'Herman'], \
+                f"Words assigned wrongly: {[r.text for r in found]}"
+            box = found[0].to_dict(page.size)['box']
+            assert all(0 <= v <= 1 for v in box), f"Box not relative: {box}"
+
+        print("✅ Text-region detection works")
+        return True
+    except Exception as e:
+        print(f"❌ Text-region detection test failed: {e}")
+        return False
+
+def _ean13_image(code, module=3):
+    """Render an EAN-13 barcode (for barcode tests)"""
+    from PIL import Image, ImageDraw
+    left = ['0001101', '0011001', '0010011', '0111101', '0100011',
+            '0110001', '0101111', '0111011', '0110111', '0001011']
+    right = [''.join('1' if b == '0' else '0' for b in bits) for bits in left]
+    even = [bits[::-1] for bits in right]
+    parity = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG',
+              'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL']
+    bits = '101' + ''.join((left if p == 'L' else even)[int(d)]
+                           for p, d in zip(parity[int(code[0])], code[1:7]))
+    bits += '01010' + ''.join(right[int(d)] for d in code[7:]) + '101'
+    image = Image.new('RGB', ((len(bits) + 20) * module, 160), 'white')
+    draw = ImageDraw.Draw(image)
+    for i, bit in enumerate(bits):
+        if bit == '1':
+            draw.rectangle(((i + 10) * module, 20, (i + 11) * module - 1, 140), fill='black')
+    return image
+
+def test_barcode_fast_path():
+    """Test barcode ISBN detection and the OCR skip fast path"""
+    try:
+        from PIL import Image
+        import barcode
+        from pipeline import PipelineExecutor, configure_barcode
+
+        assert barcode.is_isbn13('9780743273565'), "Valid ISBN-13 rejected"
+        assert not barcode.is_isbn13('9780743273566'), "Bad check digit accepted"
+        assert not barcode.is_isbn13('4006381333931'), "Non-book EAN accepted"
+
+        if barcode.BARCODE_AVAILABLE:
+            cover = Image.new('RGB', (1200, 1600), 'white')
+            cover.paste(_ean13_image('9780743273565'), (700, 1300))
+            cover_path = os.path.join(TEST_DIR, 'back_cover.jpg')
+            cover.save(cover_path, quality=90)
+            assert barcode.find_isbn(cover) == '9780743273565', "Barcode not decoded"
+            assert barcode.find_isbn(Image.new('L', (800, 800), 'white')) is None, "Blank page decoded"
+
+            try:
+                with PipelineExecutor(workers=1, mode='serial', barcode_mode='skip') as executor:
+                    result = executor.run(cover_path, 'back_cover.jpg')
+                    stats = executor.stats()
+            finally:
+                configure_barcode()
+            assert result['ocr_source'] == 'barcode' and result['isbn_source'] == 'barcode', \
+                f"Fast path not taken: {result['ocr_source']}"
+            assert result['metadata']['isbn'] == '9780743273565', "Barcode ISBN not recorded"
+            assert 'barcode' in result['timings'] and 'ocr' not in result['timings'], \
+                f"Stage timings wrong: {result['timings']}"
+            assert stats['barcode_hits'] == 1 and stats['ocr_skipped'] == 1, f"Stats wrong: {stats}"
+
+        # A decoder that raises is a miss, not a failed image
+        import pipeline
+        page_path = os.path.join(TEST_DIR, 'odd_page.png')
+        Image.new('L', (200, 200), 'white').save(page_path)
+        def broken(image):
+            raise ValueError('decoder choked')
+        find_isbn, barcode.find_isbn = barcode.find_isbn, broken
+        try:
+            timings = {}
+            image, isbn = pipeline.read_barcode(page_path, timings)
+        finally:
+            barcode.find_isbn = find_isbn
+        assert image is not None and isbn is None and 'barcode' in timings, "Decoder error not a miss"
+
+        print("✅ Barcode fast path works")
+        return True
+    except Exception as e:
+        print(f"❌ Barcode fast path test failed: {e}")
+        return False
+
+def test_tesseract_engine():
+    """Test Tesseract backend selection, config parsing and latency stats"""
+    try:
+        from PIL import Image
+        import tesseract_engine
+        from tesseract_engine import SubprocessEngine, TesserocrEngine, parse_backend
+
+        assert parse_backend('subprocess') == 'subprocess', "Backend not honoured"
+        assert parse_backend('auto') == ('tesserocr' if tesseract_engine.TESSEROCR_AVAILABLE else 'subprocess'), \
+            "Auto did not prefer the in-process backend"
+        try:
+            parse_backend('cuneiform')
+            assert False, "Unknown backend accepted"
+        except ValueError:
+            pass
+
+        assert TesserocrEngine._parse_config('--psm 4 -c preserve_interword_spaces=1') == \
+            (4, {'preserve_interword_spaces': '1'}, {}), "CLI config not translated"
+        assert TesserocrEngine._parse_config('--oem 1 -l deu --psm 6') == (6, {}, {'oem': 1, 'lang': 'deu'}), \
+            "Init options not translated"
+        tesserocr_engine = TesserocrEngine(lang='eng')
+        assert tesserocr_engine._handle_key({}) == ('eng', None), "Default handle key wrong"
+        assert tesserocr_engine._handle_key({'oem': 1, 'lang': 'deu'}) == ('deu', 1), "Init options not keyed"
+        try:
+            TesserocrEngine._parse_config('--dpi 300')
+            assert False, "Unsupported option accepted"
+        except ValueError:
+            pass
+
+        engine = SubprocessEngine()
+        engine._image_to_string = lambda image, config: 'Moby Dick'
+        image = Image.new('L', (50, 20), 'white')
+        assert all(engine.image_to_string(image) == 'Moby Dick' for _ in range(3)), "Engine call failed"
+        latency = engine.latency()
+        assert latency['calls'] == 3 and latency['backend'] == 'subprocess', f"Calls not counted: {latency}"
+        assert 0 <= latency['p50_ms'] <= latency['p95_ms'], f"Percentiles wrong: {latency}"
+        engine.reset_latency()
+        assert engine.latency() == {'backend': 'subprocess', 'calls': 0}, "Latency not reset"
+
+        print("✅ Tesseract engine backends work")
+        return True
+    except Exception as e:
+        print(f"❌ Tesseract engine test failed: {e}")
+        return False
+
+def test_ocr_cascade():
+    """Test the confidence cascade's early exit, line escalation and budget"""
+    try:
+        import numpy as np
+        from cascade import Cascade
+
+        class FakeTesseract:
+            def image_to_data(self, image, config=''):
+                return {'text': ['Moby', 'Dick', 'Hrman', 'Mlvle', ''],
+                        'conf': [95, 91, 30, 20, -1],
+                        'left': [10, 60, 10, 70, 0], 'top': [10, 12, 50, 52, 0],
+                        'width': [40, 40, 50, 50, 0], 'height': [20, 20, 20, 20, 0]}
+
+        class FakeReader:
+            crops = []
+
+            def readtext(self, image, detail=1):
+                self.crops.append(image.shape)
+                return [([[0, 0], [40, 0], [40, 10], [0, 10]], 'Herman Melville', 0.93)]
+
+        image = np.zeros((100, 200), np.uint8)
+        reader = FakeReader()
+
+        text, report = Cascade(FakeTesseract(), lambda: reader).run(image)
+        assert text == 'Moby Dick\nHerman Melville', f"Unsure line not replaced: {text!r}"
+        assert [step['engine'] for step in report['engines']] == ['tesseract', 'easyocr'], \
+            f"Engines not recorded: {report}"
+        assert report['stopped'] == 'escalated' and report['engines'][1]['lines'] == 1, \
+            "Confident line was escalated too"
+        assert reader.crops and reader.crops[0][0] < image.shape[0], "EasyOCR did not get a crop"
+
+        reader.crops.clear()
+        text, report = Cascade(FakeTesseract(), lambda: reader, min_confidence=50).run(image)
+        assert report['stopped'] == 'confident' and not reader.crops, "No early exit when confident"
+
+        _, report = Cascade(FakeTesseract(), lambda: reader, budget=0).run(image)
+        assert report['stopped'] == 'budget' and not reader.crops, "Time budget ignored"
+
+        _, report = Cascade(FakeTesseract(), None).run(image)
+        assert report['stopped'] == 'no fallback engine', f"Missing fallback not reported: {report}"
+
+        print("✅ OCR engine cascade works")
+        return True
+    except Exception as e:
+        print(f"❌ OCR engine cascade test failed: {e}")
+        return False
+
+def test_fast_startup():
+    """Test lazy imports, background model warmup and the liveness/readiness split"""
+    try:
+        import subprocess
+        import threading
+        from ocr_models import ModelRegistry
+
+        # Charting and heavy OCR/NLP libraries wait for the first request needing them
+        probe = ("import sys, app_production; "
+                 "print('heavy:' + ','.join(m for m in ('matplotlib', 'pandas', 'easyocr', 'spacy', 'torch', 'nltk') "
+                 "if m in sys.modules))")
+        env = dict(os.environ, WARMUP='none')
+        proc = subprocess.run([sys.executable, '-c', probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env, capture_output=True, text=True, timeout=120)
+        assert proc.returncode == 0, f"Import failed: {proc.stderr[-500:]}"
+        heavy = [line for line in proc.stdout.splitlines() if line.startswith('heavy:')][-1][len('heavy:'):]
+        assert not heavy, f"Imported at startup: {heavy}"
+
+        release = threading.Event()
+        registry = ModelRegistry()
+        registry.register('slow', lambda: release.wait(5) and 'model')
+        registry.register('broken', lambda: None)
+        assert registry.readiness(['slow'])[1] == {'slow': 'cold'}, "Unloaded model not cold"
+        thread = registry.warmup(['slow', 'broken'])
+        ready, states = registry.readiness(['slow'])
+        assert not ready and states['slow'] in ('cold', 'loading'), f"Ready while loading: {states}"
+        release.set()
+        thread.join(5)
+        ready, states = registry.readiness(['slow', 'broken'])
+        assert ready and states == {'slow': 'warm', 'broken': 'failed'}, f"Warmup states wrong: {states}"
+
+        import app_production
+        app_production.ocr_executor.warmup(background=False)
+        with app_production.app.test_client() as client:
+            assert client.get('/health/live').status_code == 200, "Liveness probe failed"
+            response = client.get('/health/ready')
+            assert response.status_code == 200, f"Not ready after warmup: {response.get_json()}"
+            assert response.get_json()['database'] == 'ok', "Database not checked"
+
+        print("✅ Fast startup and health probes work")
+        return True
+    except Exception as e:
+        print(f"❌ Fast startup test failed: {e}")
+        return False
+
+def test_batched_easyocr():
+    """Test that unsure lines of several images are re-read together and scattered back"""
+    try:
+        import numpy as np
+        from cascade import Cascade
+        from easyocr_batch import can_batch, recognize_crops
+
+        class FakeTesseract:
+            def image_to_data(self, image, config=''):
+                return {'text': ['Title', 'blurry'], 'conf': [92, 20],
+                        'left': [10, 10], 'top': [10, 50], 'width': [80, 80], 'height': [20, 20]}
+
+        class FakeReader:
+            calls = 0
+
+            def readtext(self, image, detail=1):
+                # Each test image is filled with its own grey level
+                self.calls += 1
+                return [([[0, 0], [1, 0], [1, 1], [0, 1]], f'line {int(image.max())}', 0.9)]
+
+        reader = FakeReader()
+        assert not can_batch(reader), "Fake reader taken for an EasyOCR Reader"
+        crops = [np.full((8, 30), 1, np.uint8), np.zeros((0, 5), np.uint8), np.full((8, 30), 3, np.uint8)]
+        assert recognize_crops(reader, crops)[0] == ('line 1', 0.9), "Crop reading not returned"
+
+        images = [np.full((100, 200), level, np.uint8) for level in (7, 8, 9)]
+        results = Cascade(FakeTesseract(), lambda: reader, batch_size=4).run_many(images)
+        assert [text for text, _ in results] == [f'Title\nline {level}' for level in (7, 8, 9)], \
+            f"Readings not scattered back to their images: {[text for text, _ in results]}"
+        steps = [report['engines'][1] for _, report in results]
+        assert all(step['batch'] == 3 and step['replaced'] == 1 for step in steps), \
+            f"Lines not batched across images: {steps}"
+
+        # Images OCRed on their own threads meet in the escalation batcher
+        import threading
+        cascade = Cascade(FakeTesseract(), lambda: reader, batch_size=4, batch_window=5, batch_images=3)
+        start = threading.Barrier(3)
+        threaded = {}
+
+        def ocr(level):
+            start.wait()
+            threaded[level] = cascade.run(np.full((100, 200), level, np.uint8))
+
+        threads = [threading.Thread(target=ocr, args=(level,)) for level in (7, 8, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert {level: text for level, (text, _) in threaded.items()} == \
+            {level: f'Title\nline {level}' for level in (7, 8, 9)}, f"Batched readings mixed up: {threaded}"
+        assert cascade.batcher.batches == 1 and cascade.batcher.images == 3, \
+            f"Threads not batched together: {cascade.batcher.batches} batches"
+        assert all(report['engines'][1]['batch'] == 3 and report['stopped'] == 'escalated'
+                   for _, report in threaded.values()), "Batched escalation not reported"
+
+        print("✅ Batched EasyOCR recognition works")
+        return True
+    except Exception as e:
+        print(f"❌ Batched EasyOCR test failed: {e}")
+        return False
+
+def test_author_ner():
+    """Test that author NER reads only name lines and batches documents through nlp.pipe"""
+    try:
+        import authors
+
+        page = ("THE WHALE\nby Herman Melville\n"
+                + "call me ishmael and some years ago never mind how long precisely\n" * 200
+                + "Harper & Brothers New York 1851")
+        snippet = authors.candidate_lines(page)
+        assert snippet.splitlines()[0] == 'by Herman Melville', f"Byline not first: {snippet!r}"
+        assert 'ishmael' not in snippet and len(snippet) < 100, f"Body text sent to NER: {snippet!r}"
+
+        class Ent:
+            def __init__(self, text, label):
+                self.text, self.label_ = text, label
+
+        class Doc:
+            def __init__(self, text):
+                names = [n for n in ('Herman Melville', 'Toni Morrison') if n in text]
+                self.ents = [Ent('Harper', 'ORG')] + [Ent(n, 'PERSON') for n in names]
+
+        class FakeNLP:
+            calls, seen = 0, []
+
+            def pipe(self, texts, batch_size=64, n_process=1):
+                self.calls += 1
+                texts = list(texts)
+                self.seen.extend(texts)
+                return [Doc(text) for text in texts]
+
+        nlp = FakeNLP()
+        found = authors.find_authors(nlp, [page, '', 'Beloved\nToni Morrison\nvintage'])
+        assert found == ['Herman Melville', None, 'Toni Morrison'], f"Wrong authors: {found}"
+        assert nlp.calls == 1 and len(nlp.seen) == 2, "Documents not batched in one pipe() call"
+
+        print("✅ Author NER works")
+        return True
+    except Exception as e:
+        print(f"❌ Author NER test failed: {e}")
+        return False
+
+def test_single_pass_extractor():
+    """Test the precompiled extractor's field rules and the extract_many batch API"""
+    try:
+        from metadata import extract_metadata, extract_many
+
+        text = ("İstanbul Memories\n  BY Orhan Pamuk  \nRef A1999 printed 2003\n"
+                "isbn: 0-375-70788 X\nFaber Press, London\nmemories memories istanbul winter")
+        result = extract_metadata(text, "cover.jpg")
+        assert result['title'] == 'İstanbul Memories', f"Title wrong: {result['title']}"
+        assert result['author'] == 'Orhan Pamuk', f"Author wrong: {result['author']}"
+        assert result['year'] == 2003, f"Year inside a word matched: {result['year']}"
+        assert result['isbn'] == '037570788X', f"ISBN wrong: {result['isbn']}"
+        assert result['publisher'] == 'Faber Press, London', f"Publisher wrong: {result['publisher']}"
+        assert result['keywords'].split(', ')[:3] == ['memories', 'orhan', 'pamuk'], \
+            f"Keywords not distinct in reading order: {result['keywords']}"
+
+        results = extract_many(["The Hobbit\nBy J. R. R. Tolkien\n1937", "", None])
+        assert [r['author'] for r in results] == ['J. R. R. Tolkien', 'Unknown Author', 'Unknown Author']
+        assert results[0]['year'] == 1937 and results[1]['title'] == 'Unknown Title'
+
+        # app.py's job page record comes from the same extractor
+        import app
+        meta = app.enhanced_extract_metadata(text, "cover.jpg")
+        assert (meta['title'], meta['author'], meta['year'], meta['isbn']) == \
+            ('İstanbul Memories', 'Orhan Pamuk', 2003, '037570788X'), f"app.py fields differ: {meta}"
+        meta = app.enhanced_extract_metadata("", "blank.jpg")
+        assert (meta['year'], meta['isbn'], meta['enriched']) == ('Unknown', 'N/A', 'No'), \
+            f"Missing fields not shown as such: {meta}"
+
+        print("✅ Single-pass metadata extractor works")
+        return True
+    except Exception as e:
+        print(f"❌ Single-pass extractor test failed: {e}")
+        return False
+
+def test_tfidf_keywords():
+    """Test TF-IDF keyword ranking, incremental document frequencies and re-ranking"""
+    try:
+        import keywords
+        import storage
+
+        db_path = os.path.join(TEST_DIR, 'keywords.db')
+        storage.init_database(db_path)
+        common = "catalog library edition volume "
+        with storage.transaction(db_path) as conn:
+            # Stored before ranking existed: counted in by the background ranker
+            storage.insert_books(conn, [(f'old{i}.jpg', {'keywords': 'legacy'}, common * 3 + rare)
+                                        for i, rare in enumerate(['whaling', 'sailing', 'rowing', 'rowing'])])
+        ranker = keywords.KeywordRanker(db_path, batch_size=3)
+        assert ranker.run_once() == 3 and ranker.run_once() == 1, "Unranked records not counted in batches"
+        conn = storage.connection(db_path)
+        assert keywords.corpus_size(conn) == 4, "Corpus size wrong"
+        assert dict(conn.execute("SELECT term, docs FROM term_df WHERE term IN ('catalog', 'whaling', 'rowing')")) == \
+            {'catalog': 4, 'whaling': 1, 'rowing': 2}, "Document frequencies wrong"
+
+        with storage.transaction(db_path) as conn:
+            records = keywords.rank_records(conn, [
+                ('new.jpg', {'keywords': 'extracted'}, common + 'harpoon harpoon'),
+                ('blank.jpg', {'keywords': 'extracted'}, ''),
+            ])
+            storage.insert_books(conn, records)
+        new = dict(conn.execute("SELECT keywords, keywords_corpus FROM books WHERE filename = 'new.jpg'").fetchone())
+        assert new['keywords'].split(', ')[0] == 'harpoon', f"Rare term not ranked first: {new}"
+        assert new['keywords_corpus'] == 6, f"Corpus size not recorded: {new}"
+        blank = conn.execute("SELECT keywords FROM books WHERE filename = 'blank.jpg'").fetchone()[0]
+        assert blank == 'extracted', "Record without OCR text lost its keywords"
+
+        # Ranked at 4 documents; 6 >= 4 * 1.25, so the first batch is stale now
+        assert ranker.run_once() == 3, "Stale records not re-ranked"
+        ranks = [row[0] for row in conn.execute("SELECT keywords_corpus FROM books ORDER BY id")]
+        assert ranks.count(6) == 5, f"Re-ranked records not marked: {ranks}"
+
+        # Re-ranking to the same keywords leaves the catalog version (and cached charts) alone
+        with storage.transaction(db_path) as conn:
+            conn.execute('UPDATE books SET keywords_corpus = 1 WHERE keywords_corpus = 6')
+        before = [row[0] for row in conn.execute("SELECT keywords FROM books ORDER BY id")]
+        version = storage.catalog_version(conn)
+        assert ranker.run_once() == 3, "Stale records not re-ranked"
+        assert [row[0] for row in conn.execute("SELECT keywords FROM books ORDER BY id")] == before, \
+            "Keywords changed without the corpus changing"
+        assert storage.catalog_version(conn) == version, "Unchanged keywords bumped the catalog version"
+
+        assert keywords.terms('ISBN 978-0 Copyright 1851, all rights reserved. Harpoon') == {'harpoon': 1}, \
+            "Front-matter boilerplate counted as terms"
+
+        def df(term):
+            row = conn.execute('SELECT docs FROM term_df WHERE term = ?', (term,)).fetchone()
+            return row[0] if row else 0
+
+        # Deleted records and replaced OCR text are taken back out of the frequencies
+        with storage.transaction(db_path) as conn:
+            conn.execute("DELETE FROM books WHERE filename = 'new.jpg'")
+        assert df('harpoon') == 0 and keywords.corpus_size(conn) == 5, "Deleted record still counted"
+        with storage.transaction(db_path) as conn:
+            conn.execute("UPDATE books SET ocr_text = 'narwhal' WHERE filename = 'old0.jpg'")
+        assert df('whaling') == 0 and keywords.corpus_size(conn) == 4, "Replaced OCR text still counted"
+        assert ranker.run_once() == 1 and df('narwhal') == 1 and keywords.corpus_size(conn) == 5, \
+            "New OCR text not counted again"
+
+        # A record whose terms are counted is never counted twice
+        with storage.transaction(db_path) as conn:
+            conn.execute("UPDATE books SET keywords_corpus = NULL WHERE filename = 'old1.jpg'")
+        assert ranker.run_once() == 1 and keywords.corpus_size(conn) == 5 and df('sailing') == 1, \
+            "Counted record counted again"
+
+        # Catalogs counted before records kept their terms start over
+        with storage.transaction(db_path) as conn:
+            keywords.init_keyword_tables(conn, recount=True)
+        assert keywords.corpus_size(conn) == 0 and df('catalog') == 0, "Frequencies not reset"
+        assert ranker.run_once() == 3 and ranker.run_once() == 2, "Records not counted again"
+        assert keywords.corpus_size(conn) == 5 and df('catalog') == 3 and df('rowing') == 2, "Recount wrong"
+
+        print("✅ TF-IDF keywords work")
+        return True
+    except Exception as e:
+        print(f"❌ TF-IDF keywords test failed: {e}")
+        return False
+
+def test_pipeline_benchmark():
+    """Test the pipeline benchmark's JSON report and field scoring"""
+    try:
+        import glob
+        import json
+        import subprocess
+
+        here = os.path.dirname(os.path.abspath(__file__))
+        sys.path.insert(0, os.path.join(here, 'benchmarks'))
+        import bench_pipeline
+
+        truth = {'a.jpg': {'title': 'The Silent River', 'isbn': '978-0-14-143951-8', 'year': '1958'}}
+        scores = bench_pipeline.score([{'filename': 'a.jpg', 'metadata': {
+            'title': 'the silent  river.', 'isbn': '9780141439518', 'year': 1957}}], truth)
+        assert scores['title']['accuracy'] == 1.0 and scores['isbn']['accuracy'] == 1.0, f"Scoring wrong: {scores}"
+        assert scores['year']['accuracy'] == 0.0 and scores['author']['accuracy'] is None, f"Scoring wrong: {scores}"
+        assert bench_pipeline.percentile(list(range(1, 101)), 0.95) == 96, "Percentile wrong"
+
+        results_dir = os.path.join(TEST_DIR, 'bench_results')
+        no_samples = tempfile.mkdtemp(dir=TEST_DIR)
+        proc = subprocess.run([sys.executable, 'benchmarks/bench_pipeline.py', '--samples', no_samples,
+                               '--fixtures', '2', '--output-dir', results_dir, '--json'],
+                              cwd=here, capture_output=True, text=True, timeout=120)
+        assert proc.returncode == 0, f"Benchmark failed: {proc.stderr[-500:]}"
+        report = json.loads(proc.stdout[proc.stdout.index('{'):])
+        assert report['images'] == 2 and report['images_per_sec'] > 0, f"Bad report: {report}"
+        assert report['stages']['total']['p95_ms'] >= report['stages']['total']['p50_ms'], "Percentiles unordered"
+        assert report['peak_rss_mb'] > 0 and report['accuracy']['isbn']['labelled'] == 2, f"Bad report: {report}"
+        written = glob.glob(os.path.join(results_dir, 'pipeline-*.json'))
+        assert len(written) == 1 and json.load(open(written[0]))['stages'] == report['stages'], "JSON not written"
+
+        print("✅ Pipeline benchmark works")
+        return True
+    except Exception as e:
+        print(f"❌ Pipeline benchmark test failed: {e}")
+        return False
+
+def test_metrics_and_tracing():
+    """Test /metrics exposition, trace IDs and stage timings of an upload and its job"""
+    try:
+        import contextlib
+        import io
+        import metrics
+        from app_production import app, job_queue
+
+        histogram = metrics.Histogram('t_seconds', 'test', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, stage='a"b')
+        lines = histogram.samples()
+        assert 't_seconds_bucket{stage="a\\"b",le="0.1"} 1' in lines, f"Bad buckets: {lines}"
+        assert 't_seconds_bucket{stage="a\\"b",le="+Inf"} 3' in lines, f"Buckets not cumulative: {lines}"
+        assert 't_seconds_count{stage="a\\"b"} 3' in lines, f"Bad count: {lines}"
+
+        before = metrics.stage_latency.count(stage='store')
+        app.config['UPLOAD_FOLDER'] = TEST_DIR
+        log = io.StringIO()
+        with app.test_client() as client, contextlib.redirect_stdout(log):
+            response = client.post('/', data={'files': (io.BytesIO(b'not an image'), 'traced.jpg')},
+                                   headers={'Accept': 'application/json', 'X-Request-ID': 'trace-42'},
+                                   content_type='multipart/form-data')
+            assert response.headers.get('X-Request-ID') == 'trace-42', "Trace ID not echoed"
+            job_queue.wait(response.get_json()['job_id'], timeout=10)
+            generated = client.get('/health/live', headers={'X-Request-ID': 'bad id!'}).headers['X-Request-ID']
+            assert generated != 'bad id!' and len(generated) == 16, "Unsafe trace ID accepted"
+
+            response = client.get('/metrics')
+            assert response.status_code == 200 and response.content_type == metrics.CONTENT_TYPE
+            text = response.get_data(as_text=True)
+        assert '# TYPE lis_http_request_duration_seconds histogram' in text, "Request histogram missing"
+        assert 'lis_http_requests_total{route="/",method="POST",status="202"}' in text, "Upload not counted"
+        assert 'lis_stage_duration_seconds_count{stage="save"}' in text, "Save stage missing"
+        assert 'route="/metrics"' not in text, "/metrics counts itself"
+        assert metrics.stage_latency.count(stage='store') == before + 1, "Job store stage not recorded"
+
+        # The request and the work it queued log under the same trace ID
+        traced = [line for line in log.getvalue().splitlines() if line.startswith('⏱️ [trace-42]')]
+        assert any('POST /' in line and 'save=' in line for line in traced), f"Request not logged: {traced}"
+        assert any('ocr traced.jpg' in line and 'metadata=' in line for line in traced), f"OCR not logged: {traced}"
+        assert any('store job' in line for line in traced), f"Store not logged: {traced}"
+
+        print("✅ Metrics and request tracing work")
+        return True
+    except Exception as e:
+        print(f"❌ Metrics and tracing test failed: {e}")
+        return False
+
+def test_bulk_ingest():
+    """Test folder grouping, batched commits and resuming of the bulk ingester"""
+    try:
+        import ingest
+        import storage
+        from pipeline import PipelineExecutor
+
+        root = tempfile.mkdtemp(dir=TEST_DIR)
+        os.makedirs(os.path.join(root, 'shelf'))
+        for name in ('shelf/book_01_copyright.jpg', 'shelf/book_01_title.jpg', 'shelf/book_01_cover.jpg',
+                     'shelf/book_02_title.jpg', 'loose_scan.jpg', 'notes.txt'):
+            with open(os.path.join(root, name), 'w') as f:
+                f.write('not an image')
+
+        records = ingest.find_records(root)
+        pages = {os.path.basename(r.key): [page_type for page_type, _ in r.pages] for r in records}
+        assert pages == {'loose_scan.jpg': ['page'], 'book_01': ['cover', 'title', 'copyright'],
+                         'book_02': ['title']}, f"Grouping wrong: {pages}"
+
+        page = lambda text, **fields: {'ocr_text': text, 'isbn_source': fields.pop('isbn_source', None),
+                                       'metadata': dict(ingest.UNKNOWN, **fields)}
+        _, metadata, text = ingest.merge_pages(records[1], [
+            page('Cover Blurb Line\nCopyright 1950', isbn_source='barcode', isbn='9780140449136'),
+            page('Real Title', title='Real Title'),
+            page('Copyright 1999', year=1999)])
+        assert (metadata['title'], metadata['year'], metadata['isbn']) == ('Real Title', 1999, '9780140449136'), \
+            f"Pages merged wrong: {metadata}"
+        assert text.startswith('Cover Blurb Line'), "Page text not in reading order"
+
+        db_path = os.path.join(TEST_DIR, 'ingest.db')
+        with PipelineExecutor(workers=1, mode='serial') as executor:
+            # Simulated OCR is not stored by default; the records are retried later
+            summary = ingest.ingest(root, db_path, executor, batch_size=2)
+            assert summary['stored'] == 0 and summary['failed'] == 3, f"Simulated OCR stored: {summary}"
+            # An interrupted run: only the first record was committed
+            summary = ingest.ingest(root, db_path, executor, batch_size=2, limit=1, allow_simulated=True)
+            assert summary['stored'] == 1, f"Limited run wrong: {summary}"
+            summary = ingest.ingest(root, db_path, executor, batch_size=1, allow_simulated=True)
+            assert summary['skipped'] == 1 and summary['stored'] == 2, f"Resume wrong: {summary}"
+
+        conn = storage.connection(db_path)
+        assert conn.execute('SELECT COUNT(*) FROM books').fetchone()[0] == 3, "Records duplicated or lost"
+        statuses = dict(conn.execute('SELECT status, COUNT(*) FROM bulk_ingest_records GROUP BY status'))
+        assert statuses == {'done': 3}, f"Checkpoints wrong: {statuses}"
+        assert conn.execute('SELECT filename FROM books WHERE filename LIKE ?', ('book_01%',)).fetchone()[0] == \
+            'book_01_cover.jpg', "Multi-page record not stored under its first page"
+
+        print("✅ Bulk ingest groups, commits and resumes")
+        return True
+    except Exception as e:
+        print(f"❌ Bulk ingest test failed: {e}")
+        return False
+
+def test_chart_failure_skipped():
+    """Test a chart that fails to render is skipped rather than failing /analytics"""
+    try:
+        import app
+        import storage
+
+        with storage.transaction(app.app.config['DATABASE']) as conn:
+            storage.insert_book(conn, 'chart.jpg', {'title': 'Chart Book', 'year': 1999}, 'chart text')
+        def broken():
+            raise RuntimeError('renderer broke')
+        renderer = app.CHARTS['wordcloud']
+        app.CHARTS['wordcloud'] = broken
+        try:
+            with app.app.test_client() as client:
+                response = client.get('/analytics')
+        finally:
+            app.CHARTS['wordcloud'] = renderer
+        assert response.status_code == 200, f"Analytics failed: {response.status_code} {response.data[:200]}"
+
+        print("✅ Failing chart is skipped")
+        return True
+    except Exception as e:
+        print(f"❌ Chart failure test failed: {e}")
+        return False
+
+def test_cascade_budget():
+    """Test the time budget bounds batched line re-reads and the reader load"""
+    try:
+        import time
+        import numpy as np
+        from cascade import Cascade
+
+        class UnsureTesseract:
+            def image_to_data(self, image, config=''):
+                rows = range(40)
+                return {'text': [f'Lne{i}' for i in rows], 'conf': [20] * 40, 'left': [10] * 40,
+                        'top': [i * 20 for i in rows], 'width': [60] * 40, 'height': [15] * 40}
+
+        class SlowReader:
+            def __init__(self):
+                self.crops = 0
+
+            def readtext(self, image, detail=1):
+                self.crops += 1
+                time.sleep(0.01)
+                return [([[0, 0], [40, 0], [40, 10], [0, 10]], 'Line', 0.9)]
+
+        image = np.zeros((820, 200), np.uint8)
+        reader = SlowReader()
+        _, report = Cascade(UnsureTesseract(), lambda: reader, budget=0.05).run(image)
+        step = report['engines'][1]
+        assert report['stopped'] == 'budget', f"Budget not reported: {report['stopped']}"
+        assert 0 < reader.crops < 40 and step['lines'] == reader.crops, f"{reader.crops} lines re-read"
+        assert step['skipped'] == 40 - reader.crops, f"Skipped lines not reported: {step}"
+        assert report['ms'] < 100, f"Ran {report['ms']}ms on a 50ms budget"
+
+        # Loading the reader used up the budget: nothing is re-read
+        def slow_load():
+            time.sleep(0.06)
+            return reader
+        reader.crops = 0
+        _, report = Cascade(UnsureTesseract(), slow_load, budget=0.05).run(image)
+        assert report['stopped'] == 'budget' and reader.crops == 0, "Re-read after the budget ran out"
+
+        print("✅ Cascade budget bounds line re-reads")
+        return True
+    except Exception as e:
+        print(f"❌ Cascade budget test failed: {e}")
+        return False
+
+def test_job_completion_failure():
+    """Test a job whose completion step raises is marked failed, not left running"""
+    try:
+        import sqlite3
+        from jobs import JobQueue
+
+        # A job table from before jobs recorded their own error
+        db_path = os.path.join(TEST_DIR, 'jobs-failing.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE ingest_jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', "
+                     "total_files INTEGER NOT NULL DEFAULT 0, created_at TIMESTAMP, updated_at TIMESTAMP)")
+        conn.close()
+
+        def store(conn, job_id, results):
+            conn.execute("UPDATE ingest_jobs SET total_files = 0 WHERE id = ?", (job_id,))
+            raise sqlite3.IntegrityError('UNIQUE constraint failed: books.id')
+
+        queue = JobQueue(db_path, lambda path, name: {'title': name}, max_workers=2, on_complete=store)
+        job = queue.wait(queue.submit([('a.jpg', '/tmp/a.jpg'), ('b.jpg', '/tmp/b.jpg')]), timeout=10)
+        queue.shutdown()
+
+        assert job['finished'] and job['status'] == 'failed', f"Job not terminal: {job['status']}"
+        assert 'UNIQUE constraint' in job['error'], f"Error not reported: {job['error']}"
+        assert job['total_files'] == 2, "Failed completion step was not rolled back"
+        assert [f['status'] for f in job['files']] == ['done', 'done'], "Item results lost"
+
+        print("✅ Failing job completion is reported")
+        return True
+    except Exception as e:
+        print(f"❌ Job completion failure test failed: {e}")
+        return False
+
+def test_background_claim():
+    """Test only one process per catalog claims the background work"""
+    try:
+        import subprocess
+        import storage
+
+        claim = "import sys, storage; print(storage.claim_background(sys.argv[1]))"
+        def claim_elsewhere(db_path):
+            proc = subprocess.run([sys.executable, '-c', claim, db_path], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True, timeout=60)
+            return proc.stdout.strip()
+
+        db_path = os.path.join(TEST_DIR, 'claim.db')
+        assert storage.claim_background(db_path), "First claim refused"
+        assert not storage.claim_background(db_path), "Claimed twice in one process"
+        assert claim_elsewhere(db_path) == 'False', "A second process claimed a held catalog"
+
+        # The lock goes with the process holding it
+        released = os.path.join(TEST_DIR, 'claim-released.db')
+        assert claim_elsewhere(released) == 'True', "Free catalog not claimed"
+        assert storage.claim_background(released), "Lock outlived its process"
+
+        print("✅ Background work is claimed by one process")
+        return True
+    except Exception as e:
+        print(f"❌ Background claim test failed: {e}")
+        return False
+
+def test_job_view_shows_failures():
+    """Test the job page lists failed files with their error next to the results"""
+    try:
+        import app
+        from jobs import JobQueue
+
+        def process(path, name):
+            if name == 'bad.jpg':
+                raise ValueError('unreadable image')
+            return {'title': 'Good Book', 'author': 'Someone', 'cover_path': path}
+
+        queue = JobQueue(app.app.config['DATABASE'], process, max_workers=1)
+        job_id = queue.submit([('good.jpg', '/nonexistent/good.jpg'), ('bad.jpg', '/nonexistent/bad.jpg')])
+        queue.wait(job_id, timeout=10)
+        queue.shutdown()
+
+        with app.app.test_client() as client:
+            page = client.get(f'/jobs/{job_id}', headers={'Accept': 'text/html'}).get_data(as_text=True)
+        assert 'Good Book' in page, "Processed file missing"
+        assert 'bad.jpg' in page and 'unreadable image' in page, "Failed file hidden"
+        assert '1 book successfully processed' in ' '.join(page.split()), "Failed file counted as processed"
+
+        print("✅ Job page shows failed files")
+        return True
+    except Exception as e:
+        print(f"❌ Job view test failed: {e}")
+        return False
+
+def test_upload_authors():
+    """Test an upload's authors are named in one NER call and kept in the job's results"""
+    try:
+        import app
+        from jobs import JobQueue
+
+        calls = []
+
+        def find_authors(nlp, texts):
+            calls.append(list(texts))
+            return ['Toni Morrison' if 'Morrison' in text else None for text in texts]
+
+        class Models:
+            nlp = object()
+
+        saved = app.registry, app.authors.find_authors
+        app.registry, app.authors.find_authors = Models(), find_authors
+        try:
+            results = [{'author': 'Unknown Author', 'full_text': 'Beloved\nToni Morrison'},
+                       {'author': 'Chinua Achebe', 'full_text': 'Things Fall Apart'},
+                       {'author': 'Unknown Author', 'full_text': 'no byline here'}]
+            app.name_authors(results)
+        finally:
+            app.registry, app.authors.find_authors = saved
+        assert calls == [['Beloved\nToni Morrison', 'no byline here']], f"NER not run once per upload: {calls}"
+        assert [r['author'] for r in results] == ['Toni Morrison', 'Chinua Achebe', 'Unknown Author'], \
+            f"Authors not filled in: {results}"
+
+        def complete(conn, job_id, results):
+            for result in results:
+                result['author'] = 'Named Later'
+
+        queue = JobQueue(os.path.join(TEST_DIR, 'jobs-authors.db'), lambda path, name: {'title': name},
+                         max_workers=2, on_complete=complete)
+        job = queue.wait(queue.submit([('a.jpg', '/tmp/a.jpg'), ('b.jpg', '/tmp/b.jpg')]), timeout=10)
+        queue.shutdown()
+        assert [f['result'] for f in job['files']] == [{'title': 'a.jpg', 'author': 'Named Later'},
+                                                       {'title': 'b.jpg', 'author': 'Named Later'}], \
+            f"Completion changes not stored: {job['files']}"
+
+        print("✅ Upload authors are named per upload")
+        return True
+    except Exception as e:
+        print(f"❌ Upload authors test failed: {e}")
+        return False
+
+def test_cascade_ocr_cache():
+    """Test app.py answers a repeat upload from the OCR cache and reports its stats"""
+    try:
+        from PIL import Image
+        import app
+
+        path = os.path.join(TEST_DIR, 'cascade_cover.png')
+        Image.new('L', (400, 600), 'white').save(path)
+        before = app.processor.cache.stats()
+        text, report = app.processor.process_book_image(path)
+        assert report['stopped'] != 'cache', "First read came from the cache"
+        again, report = app.processor.process_book_image(path)
+        assert report['stopped'] == 'cache' and again == text, f"Repeat not cached: {report}"
+
+        with app.app.test_client() as client:
+            stats = client.get('/health').get_json()['ocr_cache']
+        assert stats['hits'] == before['hits'] + 1 and stats['misses'] == before['misses'] + 1, \
+            f"Cache stats wrong: {stats}"
+
+        print("✅ Cascade results are cached")
+        return True
+    except Exception as e:
+        print(f"❌ Cascade OCR cache test failed: {e}")
+        return False
+
 def run_tests():
     """Run all tests"""
     tests = [
         test_app_import,
         test_flask_app,
         test_database,
-        test_metadata_extraction
+        test_metadata_extraction,
+        test_model_registry,
+        test_job_queue,
+        test_upload_returns_job,
+        test_parallel_pipeline,
+        test_ocr_cache,
+        test_openlibrary_client,
+        test_background_enrichment,
+        test_legacy_schema_migration,
+        test_storage_pool,
+        test_fulltext_search,
+        test_database_pagination,
+        test_streaming_export,
+        test_chart_cache,
+        test_analytics_aggregates,
+        test_preprocessing_pipeline,
+        test_text_regions,
+        test_barcode_fast_path,
+        test_tesseract_engine,
+        test_ocr_cascade,
+        test_fast_startup,
+        test_batched_easyocr,
+        test_author_ner,
+        test_single_pass_extractor,
+        test_tfidf_keywords,
+        test_pipeline_benchmark,
+        test_metrics_and_tracing,
+        test_bulk_ingest,
+        test_chart_failure_skipped,
+        test_cascade_budget,
+        test_job_completion_failure,
+        test_background_claim,
+        test_job_view_shows_failures,
+        test_upload_authors,
+        test_cascade_ocr_cache
     ]
     
     passed = 0